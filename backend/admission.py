@@ -0,0 +1,187 @@
+# backend/admission.py - GPT-2 generatsiyasiga kirishni boshqarish: navbat, foydalanuvchi cheklovi va SLO
+
+import heapq
+import itertools
+import threading
+import time
+
+SHED_REASONS = ('queue_full', 'user_limit', 'slo', 'deadline')
+
+
+class AdmissionRejected(Exception):
+    """So'rov generatsiyaga qo'yilmadi (sabab: SHED_REASONS dan biri yoki 'cancelled')"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Waiter:
+    """Navbatdagi so'rov: eng yaqin muddatli birinchi chiqadi"""
+    __slots__ = ('deadline', 'seq', 'user_key', 'enqueued_at', 'event', 'granted')
+
+    def __init__(self, deadline, seq, user_key):
+        self.deadline = deadline
+        self.seq = seq
+        self.user_key = user_key
+        self.enqueued_at = time.perf_counter()
+        self.event = threading.Event()
+        self.granted = False
+
+    def __lt__(self, other):
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+
+class AdmissionController:
+    """Bir vaqtda generatsiya qilayotgan so'rovlar sonini cheklash.
+
+    Bo'sh joy bo'lmasa, so'rov chegaralangan navbatda muddati (deadline) bo'yicha
+    kutadi. Kutish SLO'dan oshishi aniq bo'lsa (o'rtacha xizmat vaqti bo'yicha
+    bashorat), so'rov darhol rad etiladi - chaqiruvchi arzonroq javob beradi.
+    """
+
+    def __init__(self, max_active=8, max_queue=32, per_user=2, slo_s=10.0, ewma_alpha=0.2):
+        self.max_active = max(int(max_active), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.per_user = max(int(per_user), 1)
+        self.slo_s = slo_s
+        self.ewma_alpha = ewma_alpha
+
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._per_user = {}
+        self._service_s = 0.0
+
+        # Metrikalar
+        self.admitted = 0
+        self.queued = 0
+        self.shed = dict.fromkeys(SHED_REASONS, 0)
+        self.cancelled = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    @staticmethod
+    def _user_key(user_id):
+        # Anonim foydalanuvchilar umumiy kalitga tushmasligi uchun cheklanmaydi
+        return None if user_id in (None, '', 'anonymous') else user_id
+
+    def acquire(self, user_id=None, deadline_s=None, cancel=None):
+        """Generatsiyaga ruxsat olish (kerak bo'lsa kutib). Ticket qaytaradi yoki AdmissionRejected.
+
+        cancel - CancelToken: bekor qilinsa, so'rov navbatdan chiqariladi ('cancelled').
+        """
+        budget = self.slo_s if deadline_s is None else min(max(deadline_s, 0.0), self.slo_s)
+        key = self._user_key(user_id)
+        now = time.perf_counter()
+
+        with self._lock:
+            if cancel is not None and cancel.cancelled:
+                self.cancelled += 1
+                raise AdmissionRejected('cancelled')
+            if key is not None and self._per_user.get(key, 0) >= self.per_user:
+                self._reject('user_limit')
+            if self._active < self.max_active:
+                # Navbatda faqat muddati o'tganlar qolgan bo'lishi mumkin
+                self._dispatch()
+            if self._active < self.max_active and not self._queue:
+                self._active += 1
+                self._add_user(key, 1)
+                self.admitted += 1
+                return key, now
+            if len(self._queue) >= self.max_queue:
+                self._reject('queue_full')
+
+            # Navbatda oldinda turadiganlar (muddati ertaroq) va o'rtacha xizmat vaqti bo'yicha bashorat
+            deadline = now + budget
+            ahead = sum(1 for waiter in self._queue if waiter.deadline <= deadline)
+            predicted_s = self._service_s * (ahead // self.max_active + 1)
+            if predicted_s > budget:
+                self._reject('slo')
+
+            waiter = _Waiter(deadline, next(self._seq), key)
+            heapq.heappush(self._queue, waiter)
+            self._add_user(key, 1)
+            self.queued += 1
+
+        if cancel is not None:
+            cancel.add_callback(waiter.event.set)
+        try:
+            waiter.event.wait(budget)
+        finally:
+            if cancel is not None:
+                cancel.remove_callback(waiter.event.set)
+
+        with self._lock:
+            waited_s = time.perf_counter() - waiter.enqueued_at
+            self.total_wait_s += waited_s
+            self.max_wait_s = max(self.max_wait_s, waited_s)
+            if not waiter.granted:
+                # Muddat o'tdi: navbatdan chiqarish (dispatcher allaqachon olib tashlagan bo'lishi mumkin)
+                if waiter in self._queue:
+                    self._queue.remove(waiter)
+                    heapq.heapify(self._queue)
+                self._add_user(key, -1)
+                if cancel is not None and cancel.cancelled:
+                    self.cancelled += 1
+                    raise AdmissionRejected('cancelled')
+                self._reject('deadline')
+            self.admitted += 1
+            return key, time.perf_counter()
+
+    def release(self, ticket):
+        """Generatsiya tugadi: joyni navbatdagi eng yaqin muddatli so'rovga berish"""
+        key, granted_at = ticket
+        held_s = time.perf_counter() - granted_at
+        with self._lock:
+            self._active -= 1
+            self._add_user(key, -1)
+            if self._service_s:
+                self._service_s += self.ewma_alpha * (held_s - self._service_s)
+            else:
+                self._service_s = held_s
+            self._dispatch()
+
+    def _dispatch(self):
+        now = time.perf_counter()
+        while self._active < self.max_active and self._queue:
+            waiter = heapq.heappop(self._queue)
+            if waiter.deadline <= now:
+                # Muddati o'tgan: o'zi uyg'onib, rad etiladi
+                continue
+            waiter.granted = True
+            self._active += 1
+            waiter.event.set()
+
+    def _add_user(self, key, delta):
+        if key is None:
+            return
+        count = self._per_user.get(key, 0) + delta
+        if count > 0:
+            self._per_user[key] = count
+        else:
+            self._per_user.pop(key, None)
+
+    def _reject(self, reason):
+        self.shed[reason] += 1
+        raise AdmissionRejected(reason)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': self._active,
+                'max_active': self.max_active,
+                'queue_depth': len(self._queue),
+                'max_queue': self.max_queue,
+                'per_user_limit': self.per_user,
+                'slo_ms': self.slo_s * 1000.0,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'shed': dict(self.shed),
+                'shed_total': sum(self.shed.values()),
+                'cancelled': self.cancelled,
+                'avg_queue_wait_ms': round(self.total_wait_s / self.queued * 1000.0, 3) if self.queued else 0.0,
+                'max_queue_wait_ms': round(self.max_wait_s * 1000.0, 3),
+                'service_ewma_ms': round(self._service_s * 1000.0, 3),
+            }
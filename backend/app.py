@@ -1,9 +1,22 @@
 # backend/app.py - Yangilangi asosiy fayl
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
+import hmac
 import json
 import os
 import sys
+import time
+
+import config
+import math_engine
+from cancellation import CancelRegistry, client_socket
+from intent_router import create_router
+from metrics import metrics
+from model_server import ModelServerError
+from profiling import ProfilerBusy, profiler
+from structured_log import setup_logging, elapsed_ms
+
+log = setup_logging(config.LOG_LEVEL).getChild('app')
 
 # Enhanced AI model'ni import qilish
 try:
@@ -20,6 +33,7 @@ app = Flask(__name__, template_folder='../frontend/templates', static_folder='..
 # AI model instance
 if AI_MODEL_AVAILABLE:
     try:
+        # Model sozlamaga ko'ra fonda yuklanadi; bilimlar bazasi darhol ishlaydi
         ai_tutor = EnhancedAITutor()
         print("🚀 Kengaytirilgan AI yordamchi tayyor!")
     except Exception as e:
@@ -37,6 +51,10 @@ fallback_knowledge = {
     "matematik": "Men murakkab matematik masalalarni yecha olaman: integral, differensial, matrisa...",
     "kuchli": "Endi men ancha kuchliman! GPT-2 model + web search + keng bilimlar bazasi!"
 }
+fallback_router = create_router({'fallback': list(fallback_knowledge)})
+
+# Faol chat so'rovlari: /api/chat/cancel va mijoz uzilganda generatsiyani to'xtatish
+cancel_registry = CancelRegistry()
 
 @app.route('/')
 def index():
@@ -44,55 +62,148 @@ def index():
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
+    started = time.perf_counter()
     try:
-        data = request.get_json()
-        user_message = data.get('message', '')
-        user_id = data.get('user_id', 'anonymous')
-        
-        print(f"📝 Savol: {user_message}")  # Debug
-        
-        # Enhanced AI bilan javob
-        if ai_tutor:
-            response = ai_tutor.generate_response(user_message, user_id)
-            confidence = 0.9
-        else:
-            # Fallback mode
-            response = search_fallback_knowledge(user_message)
-            confidence = 0.7
+        with metrics.request('chat') as trace, \
+                profiler.request('chat', force=debug_profile_requested()) as profile:
+            data = request.get_json()
+            user_message = data.get('message', '')
+            user_id = data.get('user_id', 'anonymous')
+            # Mijoz javobni shuncha kutadi: navbatda kutish undan oshsa, tezkor javob beriladi
+            deadline_ms = data.get('deadline_ms')
+            deadline_s = float(deadline_ms) / 1000.0 if deadline_ms is not None else None
+            
+            # Enhanced AI bilan javob
+            if ai_tutor:
+                with cancel_registry.track(user_id, data.get('request_id'), client_socket(request.environ)):
+                    response = ai_tutor.generate_response(user_message, user_id, deadline_s)
+                confidence = 0.9
+            else:
+                # Fallback mode
+                response = search_fallback_knowledge(user_message)
+                confidence = 0.7
         
-        print(f"✅ Javob: {response[:100]}...")  # Debug
+        log.info('chat', extra=chat_log_fields(user_id, user_message, response, started, trace))
         
-        return jsonify({
+        payload = {
             'response': response,
             'confidence': confidence,
-            'ai_model': 'Enhanced GPT-2' if ai_tutor else 'Basic'
-        })
+            'ai_model': 'Enhanced GPT-2' if ai_tutor else 'Basic',
+            'cache_ttl_s': client_cache_ttl(metrics.current_route())
+        }
+        if profile is not None:
+            # X-Debug-Profile: funksiyalar bo'yicha vaqt shu so'rov uchun
+            payload['profile'] = profile
+        return jsonify(payload)
         
     except Exception as e:
-        print(f"❌ Chat xatolik: {e}")
+        log.exception('chat_failed', extra={'duration_ms': elapsed_ms(started)})
         return jsonify({
             'response': f'Kechirasiz, xatolik yuz berdi: {str(e)}. Qayta urinib ko\'ring.',
             'error': str(e)
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Javobni Server-Sent Events orqali token-token yuborish"""
+    data = request.get_json() or {}
+    user_message = data.get('message', '')
+    user_id = data.get('user_id', 'anonymous')
+    sock = client_socket(request.environ)
+    # Sarlavhalar generator ichida (so'rov konteksti tashqarisida) o'qilmaydi
+    debug_profile = debug_profile_requested()
+    
+    def events():
+        response = ''
+        started = time.perf_counter()
+        try:
+            # Generator javob yuborilayotganda ishlaydi: so'rov shu yerda o'lchanadi
+            with profiler.request('chat_stream', force=debug_profile) as profile:
+                with metrics.request('chat_stream') as trace, \
+                        cancel_registry.track(user_id, data.get('request_id'), sock):
+                    if ai_tutor:
+                        chunks = ai_tutor.stream_response(user_message, user_id)
+                    else:
+                        chunks = [search_fallback_knowledge(user_message)]
+                    
+                    for chunk in chunks:
+                        response += chunk
+                        yield sse_event({'token': chunk})
+                    
+                    yield sse_event({
+                        'response': response,
+                        'confidence': 0.9 if ai_tutor else 0.7,
+                        'ai_model': 'Enhanced GPT-2' if ai_tutor else 'Basic',
+                        'cache_ttl_s': client_cache_ttl(metrics.current_route())
+                    }, event='done')
+            
+            log.info('chat_stream', extra=chat_log_fields(user_id, user_message, response, started, trace))
+            if profile is not None and debug_profile:
+                # X-Debug-Profile: profil faqat so'rov tugagach tayyor - 'done'dan keyin alohida hodisa
+                yield sse_event(profile, event='profile')
+            
+        except Exception as e:
+            log.exception('chat_stream_failed', extra={'duration_ms': elapsed_ms(started)})
+            yield sse_event({'error': str(e)}, event='error')
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/chat/cancel', methods=['POST'])
+def chat_cancel():
+    """Mijoz yangi savol yubordi yoki kutishni to'xtatdi: shu request_id generatsiyasini to'xtatish"""
+    # sendBeacon Content-Type'ni har doim ham o'rnatmaydi
+    data = request.get_json(force=True, silent=True) or {}
+    cancelled = cancel_registry.cancel(data.get('user_id', 'anonymous'), data.get('request_id'))
+    return jsonify({'cancelled': cancelled})
+
+def client_cache_ttl(route):
+    """Brauzer javobni necha soniya saqlashi mumkin: faqat deterministik yo'llar (0 - saqlanmaydi)"""
+    if route == 'cache':
+        # Keshlangan javob deterministik yo'llardan biridan: eng qisqa TTL olinadi
+        ttls = [ttl for name, ttl in config.RESPONSE_CACHE_TTLS.items() if ttl > 0 and name != 'ai_fallback']
+        ttl = min(ttls, default=0.0)
+    elif route == 'precomputed':
+        ttl = config.CLIENT_CACHE_TTL_S
+    else:
+        ttl = config.RESPONSE_CACHE_TTLS.get(route, 0.0) if route != 'ai_fallback' else 0.0
+    return max(min(ttl, config.CLIENT_CACHE_TTL_S), 0.0)
+
+def chat_log_fields(user_id, user_message, response, started, trace):
+    """Chat so'rovi logi; savol matni faqat LOG_QUESTIONS yoqilganda (precompute.py uchun)"""
+    fields = {
+        'user_id': user_id,
+        'question_chars': len(user_message),
+        'response_chars': len(response),
+        'duration_ms': elapsed_ms(started),
+        'stages_ms': {name: round(seconds * 1000.0, 3) for name, seconds in trace.items()}
+    }
+    if config.LOG_QUESTIONS:
+        fields['question'] = user_message
+    return fields
+
+def sse_event(payload, event=None):
+    """Bitta SSE xabarini formatlash"""
+    message = f"event: {event}\n" if event else ''
+    return message + f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
 def search_fallback_knowledge(user_message):
     """Fallback bilimlar qidirish"""
-    message_lower = user_message.lower()
+    intent = fallback_router.route(user_message)
     
-    # To'liq mos kelish
-    for keyword, answer in fallback_knowledge.items():
-        if keyword in message_lower:
-            return answer
+    # To'liq mos kelish (lug'atdagi tartib bo'yicha birinchi kalit so'z)
+    keyword = intent.first('fallback')
+    if keyword:
+        return fallback_knowledge[keyword]
     
     # Matematik amallar
-    if '+' in user_message or 'plus' in message_lower:
+    if intent.is_math:
         try:
-            import re
-            numbers = re.findall(r'\d+', user_message)
-            if len(numbers) >= 2:
-                result = sum(int(n) for n in numbers)
-                return f"Javob: {' + '.join(numbers)} = {result}"
-        except:
+            return math_engine.format_answer(*math_engine.solve(user_message))
+        except math_engine.MathError:
             pass
     
     return "AI model yuklanmadi. Asosiy savollarni javob bera olaman: salom, test, matematik amallar."
@@ -114,7 +225,44 @@ def generate_quiz():
         return jsonify(quiz)
         
     except Exception as e:
-        print(f"❌ Quiz xatolik: {e}")
+        log.exception('quiz_failed')
+        return jsonify({
+            'error': str(e),
+            'message': 'Quiz yaratishda xatolik'
+        }), 500
+
+@app.route('/api/quiz/batch', methods=['POST'])
+def generate_quiz_batch():
+    """Butun sinf uchun bir nechta test bitta so'rovda"""
+    try:
+        data = request.get_json() or {}
+        topic = data.get('topic', 'matematika')
+        difficulty = data.get('difficulty', 'medium')
+        count = int(data.get('count', 1))
+        num_questions = int(data.get('num_questions', config.QUIZ_QUESTIONS))
+        
+        if not 1 <= count <= config.QUIZ_BATCH_MAX or num_questions < 1:
+            return jsonify({
+                'error': f"count 1 dan {config.QUIZ_BATCH_MAX} gacha bo'lishi kerak",
+                'message': 'Noto\'g\'ri so\'rov'
+            }), 400
+        
+        if ai_tutor:
+            quizzes = ai_tutor.generate_quiz_batch(topic, difficulty, num_questions, count)
+        else:
+            quizzes = [generate_simple_quiz(topic) for _ in range(count)]
+        
+        return jsonify({
+            'topic': quizzes[0]['topic'],
+            'difficulty': difficulty,
+            'count': len(quizzes),
+            'quizzes': quizzes
+        })
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e), 'message': 'Noto\'g\'ri so\'rov'}), 400
+    except Exception as e:
+        log.exception('quiz_failed')
         return jsonify({
             'error': str(e),
             'message': 'Quiz yaratishda xatolik'
@@ -141,7 +289,8 @@ def generate_simple_quiz(topic):
         quiz_questions.append({
             'question': q_data['q'],
             'answer': q_data['a'],
-            'options': q_data['options']
+            'options': q_data['options'],
+            'correct': q_data['options'].index(q_data['a'])
         })
     
     return {
@@ -153,7 +302,11 @@ def generate_simple_quiz(topic):
 @app.route('/api/status')
 def status():
     """Tizim holatini tekshirish"""
-    return jsonify({
+    return jsonify(status_payload())
+
+def status_payload():
+    """Tizim holati (WSGI va ASGI ilovalari uchun umumiy)"""
+    return {
         'ai_model_loaded': ai_tutor is not None,
         'features': {
             'basic_chat': True,
@@ -162,8 +315,45 @@ def status():
             'advanced_quiz': ai_tutor is not None,
             'math_solver': True
         },
-        'model_type': 'Enhanced GPT-2' if ai_tutor else 'Basic Fallback'
-    })
+        'model_type': 'Enhanced GPT-2' if ai_tutor else 'Basic Fallback',
+        'startup': ai_tutor.startup_stats() if ai_tutor else None,
+        'admission': ai_tutor.admission.stats() if ai_tutor else None,
+        'batching': ai_tutor.batcher.stats() if ai_tutor and ai_tutor.batcher else None,
+        'model_server': ai_tutor.model_client.stats() if ai_tutor and ai_tutor.model_client else None,
+        'generation': ai_tutor.generation_stats.stats() if ai_tutor else None,
+        'kv_cache': ai_tutor.kv_cache.stats() if ai_tutor and ai_tutor.kv_cache else None,
+        'tokenizer': ai_tutor.tokenizer_stats() if ai_tutor else None,
+        'knowledge_base': ai_tutor.kb_store.stats() if ai_tutor else None,
+        'semantic_search': ai_tutor.semantic_index.stats() if ai_tutor and ai_tutor.semantic_index else None,
+        'quiz_pool': ai_tutor.quiz_pool.stats() if ai_tutor else None,
+        'sessions': ai_tutor.sessions.stats() if ai_tutor else None,
+        'response_cache': ai_tutor.response_cache.stats() if ai_tutor and ai_tutor.response_cache else None,
+        'precomputed': ai_tutor.precomputed.stats() if ai_tutor and ai_tutor.precomputed else None,
+        'web_search_client': ai_tutor.web_search.stats() if ai_tutor else None,
+        'cancellation': cancel_registry.stats(),
+        'profiling': profiler.stats(),
+        'metrics': metrics.snapshot()
+    }
+
+@app.route('/api/metrics')
+def prometheus_metrics():
+    """Prometheus text formatidagi metrikalar (shu worker jarayoni bo'yicha)"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/ready')
+def ready():
+    """Readiness tekshiruvi: model yuklangan va warm-up tugagan bo'lsa 200, aks holda 503"""
+    payload, status_code = readiness_payload()
+    return jsonify(payload), status_code
+
+def readiness_payload():
+    is_ready = ai_tutor is None or ai_tutor.ready.is_set()
+    return {
+        'ready': is_ready,
+        'ai_model_loaded': ai_tutor is not None,
+        'warmup_ms': round(ai_tutor.warmup_s * 1000.0, 1) if ai_tutor and ai_tutor.warmup_s is not None else None,
+        'pid': os.getpid()
+    }, 200 if is_ready else 503
 
 @app.route('/api/settings', methods=['POST'])
 def update_settings():
@@ -184,6 +374,59 @@ def update_settings():
             'error': str(e)
         }), 500
 
+def admin_authorized():
+    """Admin so'rovi tokenini tekshirish"""
+    token = request.headers.get('X-Admin-Token', '')
+    # Doimiy vaqtli taqqoslash: javob vaqtidan token belgilarini taxmin qilib bo'lmaydi
+    return bool(config.ADMIN_TOKEN) and hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode())
+
+def debug_profile_requested():
+    """X-Debug-Profile: 1 va admin tokeni bo'lsa, so'rov profili javobga qo'shiladi"""
+    return request.headers.get('X-Debug-Profile', '') not in ('', '0') and admin_authorized()
+
+@app.route('/api/admin/profile', methods=['POST'])
+def capture_profile():
+    """N soniyalik profil (shu worker yoki target=model - model server jarayoni).
+    
+    ?seconds=5&mode=stack|torch&format=collapsed|chrome. Yozib olish davomida so'rov band bo'ladi.
+    """
+    if not admin_authorized():
+        return jsonify({'error': 'Ruxsat yo\'q'}), 403
+    
+    seconds = request.args.get('seconds', 5.0, type=float)
+    mode = request.args.get('mode', 'stack')
+    fmt = request.args.get('format', 'collapsed')
+    try:
+        if request.args.get('target') == 'model':
+            if not (ai_tutor and ai_tutor.model_client):
+                return jsonify({'error': 'Model server ishlatilmayapti'}), 400
+            body = ai_tutor.model_client.call('profile', seconds, mode, fmt)
+        else:
+            body = profiler.capture(seconds, mode, fmt)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ProfilerBusy as e:
+        return jsonify({'error': str(e)}), 409
+    except ModelServerError as e:
+        return jsonify({'error': str(e)}), 502
+    
+    mimetype = 'application/json' if fmt == 'chrome' else 'text/plain; charset=utf-8'
+    return Response(body, mimetype=mimetype)
+
+@app.route('/api/admin/kb/reload', methods=['POST'])
+def reload_knowledge_base():
+    """Bilimlar bazasini qayta yuklash (Flask va model qayta ishga tushmaydi)"""
+    if not admin_authorized():
+        return jsonify({'error': 'Ruxsat yo\'q'}), 403
+    if not ai_tutor:
+        return jsonify({'error': 'AI model yuklanmagan'}), 503
+    
+    success = ai_tutor.kb_store.reload()
+    return jsonify({
+        'success': success,
+        'knowledge_base': ai_tutor.kb_store.stats()
+    }), 200 if success else 500
+
 if __name__ == '__main__':
     print("="*50)
     print("🚀 AI Ta'lim Yordamchisi ishga tushmoqda...")
@@ -193,4 +436,5 @@ if __name__ == '__main__':
     print("📊 Features: Chat, Quiz, Math Solver, Web Search")
     print("="*50)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Rivojlantirish serveri; production uchun: gunicorn -c gunicorn.conf.py app:app
+    app.run(debug=config.DEBUG, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,332 @@
+# backend/asgi.py - ASGI varianti: og'ir so'rovlar (GPT-2, web qidiruv) arzon so'rovlarni bloklamaydi
+#
+# Ishga tushirish (backend papkasidan):
+#     uvicorn asgi:app --host 0.0.0.0 --port 5000 [--workers 2]
+#
+# /api/chat, /api/chat/stream, /api/status, /api/ready va /api/metrics shu yerda asinxron
+# bajariladi: bilimlar bazasi/matematika/ma'noviy qidiruv kichik alohida executor'da (SQLite,
+# qayta yuklash va gpt2 embedder event loop'ni to'xtatmaydi), web qidiruv httpx orqali, GPT-2
+# esa thread'lari soni cheklangan o'z executor'ida. Qolgan yo'llar (sahifa, quiz,
+# sozlamalar, admin) Flask ilovasiga asgiref orqali uzatiladi.
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+
+import cancellation
+import config
+from app import (
+    app as flask_app, ai_tutor, cancel_registry, chat_log_fields, client_cache_ttl, log, readiness_payload,
+    search_fallback_knowledge, sse_event, status_payload
+)
+from metrics import metrics
+from structured_log import elapsed_ms
+
+MAX_BODY_BYTES = 1024 * 1024
+
+# GPT-2 uchun alohida executor: admission navbatidagi so'rovlar ham thread band qiladi,
+# shuning uchun standart qiymat faol + navbatdagi so'rovlar soni
+model_executor = ThreadPoolExecutor(max_workers=config.ASGI_MODEL_THREADS, thread_name_prefix='model')
+# Model'siz yo'llar uchun: band GPT-2 thread'larini kutmaydi va /api/status, /api/ready tez qoladi
+local_executor = ThreadPoolExecutor(max_workers=config.ASGI_LOCAL_THREADS, thread_name_prefix='local')
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+
+async def run_in_executor(executor, func, *args):
+    """Funksiyani executor'da bajarish (metrikalar trace'i va CancelToken ham o'tadi)"""
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(context.run, func, *args))
+
+
+async def run_in_model_executor(func, *args):
+    """Funksiyani model executor'ida bajarish"""
+    return await run_in_executor(model_executor, func, *args)
+
+
+async def answer_without_model_async(user_message, intent):
+    """Bilimlar bazasi, matematika va web qidiruv: (yo'l, javob) yoki (None, None)"""
+    route, response = await run_in_executor(local_executor, ai_tutor.answer_locally, user_message, intent)
+    if response:
+        return route, response
+
+    if ai_tutor.wants_web_search(intent):
+        with metrics.stage('web'):
+            web_info = await ai_tutor.web_search.search_async(user_message, ai_tutor.max_search_results)
+        if web_info:
+            return 'web', ai_tutor.create_response_with_web_data(user_message, web_info)
+    return None, None
+
+
+async def generate_response_async(user_message, user_id, deadline_s=None):
+    """EnhancedAITutor.generate_response ning asinxron varianti"""
+    with metrics.stage('cache_lookup'):
+        cached = ai_tutor.get_cached_response(user_message)
+    if cached:
+        metrics.count_route('cache')
+        return cached
+
+    intent = ai_tutor.route_message(user_message)
+    route, response = await answer_without_model_async(user_message, intent)
+    if not response:
+        route, response = await run_in_model_executor(
+            ai_tutor.answer_with_model, user_message, user_id, deadline_s, intent
+        )
+    metrics.count_route(route)
+    ai_tutor.cache_response(user_message, route, response)
+    return response
+
+
+async def stream_response_async(user_message, user_id):
+    """Javob qismlari: tezkor yo'llar bitta qism, GPT-2 esa executor'da token-token"""
+    with metrics.stage('cache_lookup'):
+        cached = ai_tutor.get_cached_response(user_message)
+    if cached:
+        metrics.count_route('cache')
+        yield cached
+        return
+
+    intent = ai_tutor.route_message(user_message)
+    route, response = await answer_without_model_async(user_message, intent)
+    if response:
+        metrics.count_route(route)
+        ai_tutor.cache_response(user_message, route, response)
+        yield response
+        return
+
+    chunks = ai_tutor.stream_with_model(user_message, user_id, intent)
+    try:
+        while True:
+            chunk = await run_in_model_executor(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Mijoz uzilsa: generatsiya to'xtaydi va admission joyi bo'shaydi
+        await run_in_model_executor(chunks.close)
+
+
+@contextlib.asynccontextmanager
+async def track_request(receive, user_id, request_id=None):
+    """So'rov davomida CancelToken: mijoz uzilsa ('http.disconnect') generatsiya to'xtaydi"""
+    token = cancel_registry.register(user_id, request_id)
+
+    async def watch():
+        # So'rov tanasi o'qib bo'lingan: keyingi xabar faqat uzilish bo'lishi mumkin
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        cancel_registry.cancel_token(token, 'disconnect')
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        with cancellation.bind(token):
+            yield token
+    finally:
+        watcher.cancel()
+        cancel_registry.unregister(token)
+
+
+async def read_json(receive):
+    """So'rov tanasi (JSON obyekt). Buzilgan yoki obyekt bo'lmagan tana - {} (Flask'dagi
+    get_json(silent=True) kabi); juda katta tana - ValueError, mijoz uzilsa - ConnectionError"""
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError("Mijoz uzildi")
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("So'rov juda katta")
+        if not message.get('more_body'):
+            break
+    if not body:
+        return {}
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def read_request_json(receive, send):
+    """read_json + xatoliklarga javob: tana yoki None (javob allaqachon yuborilgan/mijoz uzilgan)"""
+    try:
+        return await read_json(receive)
+    except ConnectionError:
+        return None
+    except ValueError as e:
+        await send_json(send, {'error': str(e)}, 413)
+        return None
+
+
+async def send_response(send, body, status=200, content_type='application/json', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())]
+                   + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200):
+    await send_response(send, json.dumps(payload, ensure_ascii=False).encode(), status)
+
+
+async def chat(scope, receive, send):
+    started = time.perf_counter()
+    try:
+        with metrics.request('chat') as trace:
+            data = await read_json(receive)
+            user_message = data.get('message', '')
+            user_id = data.get('user_id', 'anonymous')
+            deadline_ms = data.get('deadline_ms')
+            deadline_s = float(deadline_ms) / 1000.0 if deadline_ms is not None else None
+
+            if ai_tutor:
+                async with track_request(receive, user_id, data.get('request_id')):
+                    response = await generate_response_async(user_message, user_id, deadline_s)
+                confidence = 0.9
+            else:
+                response = search_fallback_knowledge(user_message)
+                confidence = 0.7
+
+        log.info('chat', extra=chat_log_fields(user_id, user_message, response, started, trace))
+        await send_json(send, {
+            'response': response,
+            'confidence': confidence,
+            'ai_model': 'Enhanced GPT-2' if ai_tutor else 'Basic',
+            'cache_ttl_s': client_cache_ttl(metrics.current_route())
+        })
+
+    except Exception as e:
+        log.exception('chat_failed', extra={'duration_ms': elapsed_ms(started)})
+        await send_json(send, {
+            'response': f'Kechirasiz, xatolik yuz berdi: {str(e)}. Qayta urinib ko\'ring.',
+            'error': str(e)
+        }, 500)
+
+
+async def chat_stream(scope, receive, send):
+    data = await read_request_json(receive, send)
+    if data is None:
+        return
+    user_message = data.get('message', '')
+    user_id = data.get('user_id', 'anonymous')
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    async def send_event(payload, event=None):
+        await send({'type': 'http.response.body', 'body': sse_event(payload, event).encode(), 'more_body': True})
+
+    response = ''
+    started = time.perf_counter()
+    try:
+        with metrics.request('chat_stream') as trace:
+            async with track_request(receive, user_id, data.get('request_id')):
+                if ai_tutor:
+                    chunks = stream_response_async(user_message, user_id)
+                else:
+                    chunks = _single(search_fallback_knowledge(user_message))
+                try:
+                    async for chunk in chunks:
+                        response += chunk
+                        await send_event({'token': chunk})
+                finally:
+                    await chunks.aclose()
+
+                await send_event({
+                    'response': response,
+                    'confidence': 0.9 if ai_tutor else 0.7,
+                    'ai_model': 'Enhanced GPT-2' if ai_tutor else 'Basic',
+                    'cache_ttl_s': client_cache_ttl(metrics.current_route())
+                }, event='done')
+
+        log.info('chat_stream', extra=chat_log_fields(user_id, user_message, response, started, trace))
+
+    except Exception as e:
+        log.exception('chat_stream_failed', extra={'duration_ms': elapsed_ms(started)})
+        try:
+            await send_event({'error': str(e)}, event='error')
+        except Exception:
+            # Mijoz allaqachon uzilgan
+            pass
+    finally:
+        try:
+            await send({'type': 'http.response.body', 'body': b''})
+        except Exception:
+            pass
+
+
+async def chat_cancel(scope, receive, send):
+    # sendBeacon tanasi buzilgan bo'lishi mumkin: Flask yo'li kabi bo'sh deb olinadi
+    data = await read_request_json(receive, send)
+    if data is None:
+        return
+    cancelled = cancel_registry.cancel(data.get('user_id', 'anonymous'), data.get('request_id'))
+    await send_json(send, {'cancelled': cancelled})
+
+
+async def _single(chunk):
+    yield chunk
+
+
+async def status(scope, receive, send):
+    await send_json(send, status_payload())
+
+
+async def ready(scope, receive, send):
+    payload, status_code = readiness_payload()
+    await send_json(send, payload, status_code)
+
+
+async def prometheus_metrics(scope, receive, send):
+    await send_response(send, metrics.render_prometheus().encode(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+ROUTES = {
+    ('POST', '/api/chat'): chat,
+    ('POST', '/api/chat/stream'): chat_stream,
+    ('POST', '/api/chat/cancel'): chat_cancel,
+    ('GET', '/api/status'): status,
+    ('GET', '/api/ready'): ready,
+    ('GET', '/api/metrics'): prometheus_metrics,
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            model_executor.shutdown(wait=False, cancel_futures=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] == 'http':
+        handler = ROUTES.get((scope['method'], scope['path']))
+        if handler is not None:
+            await handler(scope, receive, send)
+            return
+    await wsgi_app(scope, receive, send)
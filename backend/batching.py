@@ -0,0 +1,165 @@
+# backend/batching.py - Generatsiya so'rovlarini micro-batch'larga yig'ish
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+
+from profiling import profiler
+
+
+class _BatchItem:
+    """Navbatdagi bitta so'rov"""
+    __slots__ = ('prompt', 'future', 'enqueued_at', 'profile')
+
+    def __init__(self, prompt):
+        self.prompt = prompt
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        # Profillanayotgan so'rov hisoboti: batch shu so'rov nomidan profillanadi
+        self.profile = profiler.current()
+
+
+class MicroBatcher:
+    """Bir vaqtda kelgan promptlarni yig'ib, bitta generate chaqiruvida ishlatish.
+
+    `run_batch(prompts)` promptlar ro'yxatini qabul qilib, har biri uchun
+    javob matnini (xuddi shu tartibda) qaytarishi kerak.
+    """
+
+    def __init__(self, run_batch, window_ms=20.0, max_batch_size=8, timeout_s=60.0):
+        self.run_batch = run_batch
+        self.window_s = max(window_ms, 0.0) / 1000.0
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.timeout_s = timeout_s
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        # Metrikalar
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.errors = 0
+        self.max_batch_seen = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.total_run_s = 0.0
+        self.batch_size_counts = {}
+
+    def _ensure_worker(self):
+        """Ishchi thread'ni kerak bo'lganda ishga tushirish (fork'dan keyin ham)"""
+        pid = os.getpid()
+        if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+                return
+            if self._pid != pid:
+                # Fork'dan keyin ota jarayonning navbati yaroqsiz
+                self._queue = queue.Queue()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._worker, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, prompt):
+        """Promptni navbatga qo'yish va Future qaytarish"""
+        self._ensure_worker()
+        item = _BatchItem(prompt)
+        self._queue.put(item)
+        return item.future
+
+    def generate(self, prompt, cancel=None):
+        """Promptni navbatga qo'yib, javobni kutish.
+
+        cancel - CancelToken: bekor qilinsa, hali batch'ga olinmagan so'rov navbatdan
+        tashlanadi va concurrent.futures.CancelledError ko'tariladi. timeout_s o'tsa ham
+        so'rov bekor qilinadi (batch'ga olinmagan bo'lsa) va TimeoutError ko'tariladi.
+        """
+        future = self.submit(prompt)
+        if cancel is not None:
+            cancel.add_callback(future.cancel)
+        try:
+            return future.result(timeout=self.timeout_s)
+        except FuturesTimeoutError:
+            # Kutish tugadi: hali batch'ga olinmagan so'rov navbatdan tashlanadi
+            future.cancel()
+            raise
+        finally:
+            if cancel is not None:
+                cancel.remove_callback(future.cancel)
+
+    def _collect(self):
+        """Birinchi so'rovni kutib, oyna davomida qolganlarini yig'ish"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                with profiler.attach([item.profile for item in batch], 'batch'):
+                    results = self.run_batch([item.prompt for item in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch natijalari soni mos emas: {len(results)} != {len(batch)}")
+                for item, result in zip(batch, results):
+                    item.future.set_result(result)
+                failed = False
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                failed = True
+
+            self._record(batch, started, time.perf_counter(), failed)
+
+    def _record(self, batch, started, finished, failed):
+        size = len(batch)
+        waits = [started - item.enqueued_at for item in batch]
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += size
+            if failed:
+                self.errors += 1
+            self.max_batch_seen = max(self.max_batch_seen, size)
+            self.total_wait_s += sum(waits)
+            self.max_wait_s = max(self.max_wait_s, max(waits))
+            self.total_run_s += finished - started
+            self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+
+    def stats(self):
+        """Batch hajmi va navbatda kutish metrikalari"""
+        with self._stats_lock:
+            batches = self.batches or 1
+            requests = self.requests or 1
+            return {
+                'window_ms': self.window_s * 1000.0,
+                'max_batch_size': self.max_batch_size,
+                'batches': self.batches,
+                'requests': self.requests,
+                'errors': self.errors,
+                'queue_depth': self._queue.qsize(),
+                'avg_batch_size': round(self.requests / batches, 3) if self.batches else 0.0,
+                'max_batch_seen': self.max_batch_seen,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self.batch_size_counts.items())},
+                'avg_queue_wait_ms': round(self.total_wait_s / requests * 1000.0, 3) if self.requests else 0.0,
+                'max_queue_wait_ms': round(self.max_wait_s * 1000.0, 3),
+                'avg_batch_run_ms': round(self.total_run_s / batches * 1000.0, 3) if self.batches else 0.0,
+            }
@@ -0,0 +1,207 @@
+# backend/cancellation.py - So'rovni bekor qilish: mijoz uzilsa yoki /api/chat/cancel kelsa, GPT-2 to'xtaydi
+#
+# Har bir chat so'rovi CancelToken oladi (contextvar orqali ichki qatlamlarga yetadi). Token
+# bekor qilinganda: admission navbatidagi so'rov chiqariladi, micro-batch navbatidagi so'rov
+# batch'ga qo'shilmaydi, ishlayotgan generatsiya keyingi tokendan keyin to'xtaydi.
+# Registr har bir jarayonda alohida: bir nechta worker'da /api/chat/cancel boshqa worker'ga
+# tushishi mumkin, lekin mijoz fetch'ni to'xtatganda ulanish yopiladi va buni generatsiya
+# qilayotgan worker'ning o'zi aniqlaydi.
+
+import contextvars
+import os
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from structured_log import get_logger
+
+log = get_logger('cancellation')
+
+CANCEL_REASONS = ('client', 'disconnect')
+
+_current = contextvars.ContextVar('ai_tutor_cancel', default=None)
+
+
+class CancelToken:
+    """Bitta so'rovning bekor qilinish holati (threading.Event interfeysi bilan: is_set)"""
+    __slots__ = ('key', 'socket', 'reason', '_event', '_callbacks', '_lock')
+
+    def __init__(self, key=None, sock=None):
+        self.key = key
+        self.socket = sock
+        self.reason = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def cancel(self, reason='client'):
+        """Bekor qilish; birinchi chaqiruvda True"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                log.warning('cancel_callback_failed', extra={'error': str(e)})
+        return True
+
+    def add_callback(self, callback):
+        """Bekor qilinganda chaqiriladi (allaqachon bekor qilingan bo'lsa - darhol)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+def current_token():
+    """Joriy so'rovning tokeni yoki None"""
+    return _current.get()
+
+
+@contextmanager
+def bind(token):
+    """Token shu blok ichidagi chaqiruvlar uchun joriy bo'ladi"""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def client_socket(environ):
+    """WSGI so'rovining socket'i (gunicorn yoki werkzeug), bo'lmasa None"""
+    return environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+
+
+def peer_closed(sock):
+    """Qarama-qarshi tomon ulanishni yopganmi (o'qiladigan ma'lumot qolmagan EOF)"""
+    try:
+        return sock.recv(1, socket.MSG_PEEK | getattr(socket, 'MSG_DONTWAIT', 0)) == b''
+    except (BlockingIOError, InterruptedError):
+        return False
+    except OSError:
+        return True
+
+
+class CancelRegistry:
+    """Faol so'rovlar: (user_id, request_id) -> CancelToken.
+
+    Socket berilgan so'rovlar fon thread'ida kuzatiladi: mijoz ulanishni yopsa
+    (yangi so'rov yoki javob kutmasdan), token 'disconnect' sababi bilan bekor qilinadi.
+    """
+
+    def __init__(self, poll_s=0.2):
+        self.poll_s = poll_s
+        self._tokens = {}
+        self._watched = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        # Metrikalar
+        self.registered = 0
+        self.cancelled = dict.fromkeys(CANCEL_REASONS, 0)
+        self.unknown = 0
+
+    def register(self, user_id, request_id=None, sock=None):
+        key = (user_id, request_id) if request_id else None
+        token = CancelToken(key, sock)
+        with self._lock:
+            self.registered += 1
+            if key is not None:
+                self._tokens[key] = token
+            if sock is not None:
+                self._watched.add(token)
+        if sock is not None:
+            self._ensure_watcher()
+        return token
+
+    def unregister(self, token):
+        with self._lock:
+            if token.key is not None and self._tokens.get(token.key) is token:
+                del self._tokens[token.key]
+            self._watched.discard(token)
+
+    @contextmanager
+    def track(self, user_id, request_id=None, sock=None):
+        """So'rov davomida token ro'yxatda va joriy (contextvar) bo'ladi"""
+        token = self.register(user_id, request_id, sock)
+        try:
+            with bind(token):
+                yield token
+        finally:
+            self.unregister(token)
+
+    def cancel(self, user_id, request_id, reason='client'):
+        """Foydalanuvchining so'rovini bekor qilish; so'rov topilmasa (allaqachon tugagan) False"""
+        with self._lock:
+            token = self._tokens.get((user_id, request_id))
+            if token is None:
+                self.unknown += 1
+                return False
+        return self.cancel_token(token, reason)
+
+    def cancel_token(self, token, reason):
+        if not token.cancel(reason):
+            return False
+        with self._lock:
+            self.cancelled[reason] += 1
+        log.info('request_cancelled', extra={'reason': reason})
+        return True
+
+    def _ensure_watcher(self):
+        """Kuzatuvchi thread'ni kerak bo'lganda ishga tushirish (fork'dan keyin ham)"""
+        pid = os.getpid()
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._watch, name='cancel-watcher', daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_s)
+            with self._lock:
+                tokens = [token for token in self._watched if not token.cancelled]
+            if not tokens:
+                continue
+            try:
+                readable, _, _ = select.select([token.socket for token in tokens], [], [], 0)
+            except (OSError, ValueError):
+                # Yopilgan socket: har birini alohida tekshirish
+                readable = [token.socket for token in tokens]
+            readable = set(map(id, readable))
+            for token in tokens:
+                # So'rov shu orada tugagan bo'lsa, socket allaqachon yopilgan bo'lishi mumkin
+                if id(token.socket) in readable and token in self._watched and peer_closed(token.socket):
+                    self.cancel_token(token, 'disconnect')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': len(self._tokens),
+                'watched': len(self._watched),
+                'registered': self.registered,
+                'cancelled': dict(self.cancelled),
+                'unknown': self.unknown,
+            }
@@ -0,0 +1,170 @@
+# backend/config.py - Sozlamalar (environment o'zgaruvchilaridan)
+
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# .env fayl bo'lsa, undan o'qish (ixtiyoriy)
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+
+def env_int(name, default):
+    """Butun son ko'rinishidagi sozlamani o'qish"""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name, default):
+    """Kasr son ko'rinishidagi sozlamani o'qish"""
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_bool(name, default):
+    """Ha/yo'q ko'rinishidagi sozlamani o'qish"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Micro-batching (bir vaqtdagi so'rovlarni bitta generate chaqiruviga yig'ish)
+BATCH_ENABLED = env_bool('AI_TUTOR_BATCH_ENABLED', True)
+BATCH_WINDOW_MS = env_float('AI_TUTOR_BATCH_WINDOW_MS', 20.0)
+BATCH_MAX_SIZE = env_int('AI_TUTOR_BATCH_MAX_SIZE', 8)
+BATCH_TIMEOUT_S = env_float('AI_TUTOR_BATCH_TIMEOUT_S', 60.0)
+
+# Admission control: bir vaqtda generatsiya qiladigan so'rovlar, navbat hajmi, bitta foydalanuvchining
+# parallel so'rovlari va navbatda kutishning yuqori chegarasi (SLO). Oshsa - default yoki keshdagi javob
+ADMISSION_MAX_ACTIVE = env_int('AI_TUTOR_ADMISSION_MAX_ACTIVE', BATCH_MAX_SIZE)
+ADMISSION_MAX_QUEUE = env_int('AI_TUTOR_ADMISSION_MAX_QUEUE', 32)
+ADMISSION_PER_USER = env_int('AI_TUTOR_ADMISSION_PER_USER', 2)
+ADMISSION_SLO_S = env_float('AI_TUTOR_ADMISSION_SLO_S', 10.0)
+
+# Generatsiyani erta to'xtatish (gap oxiri, yangi qator, noto'g'ri javob) va rad etilgan javobni
+# qayta urinish: bitta so'rov uchun jami token byudjeti ichida
+GENERATION_EARLY_STOP = env_bool('AI_TUTOR_GENERATION_EARLY_STOP', True)
+GENERATION_RETRIES = env_int('AI_TUTOR_GENERATION_RETRIES', 1)
+GENERATION_TOKEN_BUDGET = env_int('AI_TUTOR_GENERATION_TOKEN_BUDGET', 80)
+GENERATION_MIN_RETRY_TOKENS = env_int('AI_TUTOR_GENERATION_MIN_RETRY_TOKENS', 16)
+
+# KV kesh (umumiy prompt shabloni va foydalanuvchi suhbati uchun past_key_values)
+KV_CACHE_ENABLED = env_bool('AI_TUTOR_KV_CACHE_ENABLED', True)
+KV_CACHE_MAX_MB = env_float('AI_TUTOR_KV_CACHE_MAX_MB', 256.0)
+CONTEXT_TURNS = env_int('AI_TUTOR_CONTEXT_TURNS', 3)
+CONTEXT_MAX_TOKENS = env_int('AI_TUTOR_CONTEXT_MAX_TOKENS', 256)
+CONTEXT_MAX_USERS = env_int('AI_TUTOR_CONTEXT_MAX_USERS', 10000)
+
+# Foydalanuvchi sessiyalari: 'memory' yoki 'sqlite' (qayta ishga tushishda saqlanadi, worker'lar bo'lishadi)
+SESSION_BACKEND = os.environ.get('AI_TUTOR_SESSION_BACKEND', 'memory')
+SESSION_DB_PATH = os.environ.get('AI_TUTOR_SESSION_DB_PATH', os.path.join(BASE_DIR, 'data', 'sessions.db'))
+SESSION_MAX_MB = env_float('AI_TUTOR_SESSION_MAX_MB', 32.0)
+SESSION_TTL_S = env_float('AI_TUTOR_SESSION_TTL_S', 86400.0)
+
+# Bilimlar bazasi: 'memory' (JSON har jarayonda) yoki 'sqlite' (jarayonlar bitta faylni bo'lishadi)
+KB_BACKEND = os.environ.get('AI_TUTOR_KB_BACKEND', 'memory')
+KB_JSON_PATH = os.environ.get('AI_TUTOR_KB_JSON_PATH', os.path.join(BASE_DIR, 'data', 'knowledge_base.json'))
+KB_DB_PATH = os.environ.get('AI_TUTOR_KB_DB_PATH', os.path.join(BASE_DIR, 'data', 'knowledge_base.db'))
+KB_RELOAD_INTERVAL_S = env_float('AI_TUTOR_KB_RELOAD_INTERVAL_S', 2.0)
+
+# Admin endpoint'lari uchun token (bo'sh bo'lsa, admin endpoint'lari o'chiq)
+ADMIN_TOKEN = os.environ.get('AI_TUTOR_ADMIN_TOKEN', '')
+
+# Ma'noviy qidiruv (kalit so'z topilmaganda embedding bo'yicha eng yaqin javob)
+SEMANTIC_ENABLED = env_bool('AI_TUTOR_SEMANTIC_ENABLED', True)
+SEMANTIC_EMBEDDER = os.environ.get('AI_TUTOR_SEMANTIC_EMBEDDER', 'hashing')  # 'hashing' yoki 'gpt2'
+# Chegara hashing embedder bo'yicha tanlangan: 0.25 da "kompyuter nima" (0.28) va "samarqand haqida"
+# (0.275) boshqa mavzu javobini oldi. Ular ikkinchi yozuvdan ancha oldinda (farq ~0.23), shuning uchun
+# farq sharti yordam bermaydi; 0.40 da parafrazalarning 16/20 tasi topiladi (0.30 dagidek), umumiy
+# bir so'zli savollar ("samarqand" 0.35, "kimyo nima" 0.36) esa rad etiladi
+SEMANTIC_THRESHOLD = env_float('AI_TUTOR_SEMANTIC_THRESHOLD', 0.40)
+SEMANTIC_TOP_K = env_int('AI_TUTOR_SEMANTIC_TOP_K', 3)
+
+# Javoblar keshi (yo'l bo'yicha TTL, soniyalarda; 0 - keshlanmaydi)
+RESPONSE_CACHE_ENABLED = env_bool('AI_TUTOR_RESPONSE_CACHE_ENABLED', True)
+RESPONSE_CACHE_MAX_ENTRIES = env_int('AI_TUTOR_RESPONSE_CACHE_MAX_ENTRIES', 10000)
+RESPONSE_CACHE_TTLS = {
+    'kb': env_float('AI_TUTOR_CACHE_TTL_KB', 3600.0),
+    'semantic': env_float('AI_TUTOR_CACHE_TTL_SEMANTIC', 3600.0),
+    'math': env_float('AI_TUTOR_CACHE_TTL_MATH', 86400.0),
+    'web': env_float('AI_TUTOR_CACHE_TTL_WEB', 300.0),
+    # GPT-2 va default javoblar tasodifiy tanlanadi, shuning uchun keshlanmaydi
+    'ai': env_float('AI_TUTOR_CACHE_TTL_AI', 0.0),
+    'default': env_float('AI_TUTOR_CACHE_TTL_DEFAULT', 0.0),
+    # Oxirgi GPT-2 javoblari faqat yuklama yuqori bo'lib, generatsiya rad etilganda beriladi
+    'ai_fallback': env_float('AI_TUTOR_CACHE_TTL_AI_FALLBACK', 3600.0),
+}
+# Brauzer keshi: deterministik javoblar chat.js'da shuncha soniya saqlanadi (0 - o'chirilgan)
+CLIENT_CACHE_TTL_S = env_float('AI_TUTOR_CLIENT_CACHE_TTL_S', 600.0)
+
+# Web qidiruv: 'google' (HTML) yoki 'json' (lokal stub / ichki xizmat, URL kerak)
+WEB_SEARCH_PROVIDER = os.environ.get('AI_TUTOR_WEB_SEARCH_PROVIDER', 'google')
+WEB_SEARCH_URL = os.environ.get('AI_TUTOR_WEB_SEARCH_URL', '')
+WEB_SEARCH_TIMEOUT_S = env_float('AI_TUTOR_WEB_SEARCH_TIMEOUT_S', 3.0)
+WEB_SEARCH_MAX_CONCURRENCY = env_int('AI_TUTOR_WEB_SEARCH_MAX_CONCURRENCY', 4)
+WEB_SEARCH_CACHE_TTL_S = env_float('AI_TUTOR_WEB_SEARCH_CACHE_TTL_S', 300.0)
+WEB_SEARCH_BREAKER_FAILURES = env_int('AI_TUTOR_WEB_SEARCH_BREAKER_FAILURES', 3)
+WEB_SEARCH_BREAKER_RESET_S = env_float('AI_TUTOR_WEB_SEARCH_BREAKER_RESET_S', 30.0)
+
+# Test savollari: har bir (mavzu, qiyinlik) uchun tayyor testlar soni va bitta so'rovdagi chegara
+QUIZ_POOL_SIZE = env_int('AI_TUTOR_QUIZ_POOL_SIZE', 64)
+QUIZ_QUESTIONS = env_int('AI_TUTOR_QUIZ_QUESTIONS', 5)
+QUIZ_BATCH_MAX = env_int('AI_TUTOR_QUIZ_BATCH_MAX', 200)
+
+# Serving: torch thread'lari soni (0 - torch o'zi tanlaydi) va warm-up'ni keyinga qoldirish
+# (gunicorn preload rejimida warm-up har bir worker'da fork'dan keyin bajariladi)
+TORCH_THREADS = env_int('AI_TUTOR_TORCH_THREADS', 0)
+DEFER_WARMUP = env_bool('AI_TUTOR_DEFER_WARMUP', False)
+# ASGI rejimi (asgi.py): GPT-2 executor'i thread'lari (admission navbatidagilar ham thread band qiladi)
+ASGI_MODEL_THREADS = env_int('AI_TUTOR_ASGI_MODEL_THREADS', ADMISSION_MAX_ACTIVE + ADMISSION_MAX_QUEUE)
+# ASGI rejimi: bilimlar bazasi, matematika va ma'noviy qidiruv executor'i (event loop bloklanmaydi)
+ASGI_LOCAL_THREADS = env_int('AI_TUTOR_ASGI_LOCAL_THREADS', 4)
+DEBUG = env_bool('AI_TUTOR_DEBUG', True)
+
+# GPT-2 model nomi yoki lokal papka
+MODEL_NAME = os.environ.get('AI_TUTOR_MODEL_NAME', 'gpt2')
+# Tokenizer: 'fast' (Rust, tokenizers) yoki 'slow' (Python BPE); fast yuklanganda sekin variant bilan
+# moslik tekshiriladi, farq bo'lsa sekin variantga qaytiladi. Kesh - prompt qismlari va tez-tez keladigan xabarlar
+TOKENIZER = os.environ.get('AI_TUTOR_TOKENIZER', 'fast')
+TOKENIZER_PARITY_CHECK = env_bool('AI_TUTOR_TOKENIZER_PARITY_CHECK', True)
+TOKEN_CACHE_SIZE = env_int('AI_TUTOR_TOKEN_CACHE_SIZE', 4096)
+# CPU inference: 'eager' (float32), 'int8' (dinamik kvantlash), 'compile' yoki 'int8-compile' (torch.compile).
+# Standart - eager: int8 javob sonlarini o'zgartiradi, shuning uchun faqat ataylab yoqiladi
+INFERENCE_BACKEND = os.environ.get('AI_TUTOR_INFERENCE_BACKEND', 'eager')
+
+# Model yuklash: 'background' - server darhol ishlaydi, model fonda yuklanadi; 'eager' - yuklanguncha kutiladi
+MODEL_LOAD_MODE = os.environ.get('AI_TUTOR_MODEL_LOAD_MODE', 'background')
+# Model yuklanayotganda generatsiya so'rovi necha soniya kutadi (0 - darhol default javob)
+MODEL_WAIT_S = env_float('AI_TUTOR_MODEL_WAIT_S', 0.0)
+
+# Model server rejimi (model_server.py): GPT-2 bitta jarayonda, worker'lar Unix socket orqali so'raydi.
+# Bo'sh qator - har bir jarayon modelni o'zi yuklaydi
+MODEL_SERVER_SOCKET = os.environ.get('AI_TUTOR_MODEL_SERVER_SOCKET', '')
+MODEL_SERVER_AUTHKEY = os.environ.get('AI_TUTOR_MODEL_SERVER_AUTHKEY', '')
+MODEL_SERVER_TIMEOUT_S = env_float('AI_TUTOR_MODEL_SERVER_TIMEOUT_S', 120.0)
+
+# Strukturali (JSON) loglar darajasi; so'rov loglari navbat orqali fon thread'ida yoziladi
+LOG_LEVEL = os.environ.get('AI_TUTOR_LOG_LEVEL', 'INFO').upper()
+# Chat loglariga savol matnini yozish (standart o'chiq; precompute.py shu loglardan foydalanadi)
+LOG_QUESTIONS = env_bool('AI_TUTOR_LOG_QUESTIONS', False)
+
+# Profiling (profiling.py): so'rovlarning shu ulushi cProfile ostida bajarilib, funksiyalar bo'yicha
+# vaqt logga yoziladi (0 - o'chirilgan). X-Debug-Profile sarlavhasi va /api/admin/profile ADMIN_TOKEN bilan
+PROFILE_SAMPLE_RATE = env_float('AI_TUTOR_PROFILE_SAMPLE_RATE', 0.0)
+PROFILE_TOP_N = env_int('AI_TUTOR_PROFILE_TOP_N', 25)
+PROFILE_INTERVAL_MS = env_float('AI_TUTOR_PROFILE_INTERVAL_MS', 5.0)
+PROFILE_MAX_CAPTURE_S = env_float('AI_TUTOR_PROFILE_MAX_CAPTURE_S', 30.0)
+
+# Tez-tez so'raladigan savollar uchun oldindan yaratilgan GPT-2 javoblari (precompute.py).
+# Fayl bo'lmasa, bu bosqich o'tkazib yuboriladi
+PRECOMPUTED_ANSWERS_PATH = os.environ.get(
+    'AI_TUTOR_PRECOMPUTED_ANSWERS_PATH', os.path.join(BASE_DIR, 'data', 'precomputed_answers.json')
+)
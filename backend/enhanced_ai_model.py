@@ -1,49 +1,284 @@
 # backend/enhanced_ai_model.py - Yangi kuchli AI model
 
-import torch
-from transformers import GPT2LMHeadModel, GPT2Tokenizer, pipeline
-import requests
-from bs4 import BeautifulSoup
 import json
-import re
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError
+from contextlib import contextmanager
 from datetime import datetime
 
+import cancellation
+import config
+import math_engine
+from admission import AdmissionController, AdmissionRejected
+from batching import MicroBatcher
+from intent_router import create_router
+from kv_cache import PrefixKVCache, to_model_cache
+from metrics import metrics
+from model_server import ModelClient, ModelServerError
+from precompute import PrecomputedAnswers
+from profiling import profiler
+from kb_store import create_store
+from quiz_engine import QuizEngine, QuizPool
+from session_store import create_session_store
+from stopping import AnswerStoppingCriteria, GenerationStats
+from structured_log import get_logger
+from tokenization import CachedTokenizer, load_tokenizer
+from semantic_index import SemanticIndex, HashingEmbedder, GPT2Embedder
+from response_cache import ResponseCache
+from web_search import WebSearchClient, create_provider
+
+log = get_logger('tutor')
+
+# Og'ir kutubxonalar (torch, transformers) faqat model yuklanayotganda import qilinadi,
+# shuning uchun server bilimlar bazasi, matematika va quiz'ga darhol javob bera oladi
+torch = None
+transformers = None
+
+
+def _import_ml_libraries():
+    global torch, transformers
+    if torch is None:
+        import torch as torch_module
+        import transformers as transformers_module
+        torch, transformers = torch_module, transformers_module
+
+
+class _StopOnEvent:
+    """Tashqaridan signal kelganda generatsiyani to'xtatish (transformers StoppingCriteria interfeysi)"""
+    def __init__(self, event):
+        self.event = event
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event.is_set()
+
+
+class _StopOnCancel:
+    """Batch'dagi har bir qator o'z so'rovi bekor qilinganda to'xtaydi (qolganlari davom etadi)"""
+    def __init__(self, tokens):
+        self.tokens = tokens
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        done = [token is not None and token.cancelled for token in self.tokens]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
 class EnhancedAITutor:
-    def __init__(self):
+    def __init__(self, load_mode=None, warmup=None):
         print("🤖 Kuchli AI yordamchi yuklanmoqda...")
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        print(f"📱 Qurilma: {self.device}")
+        load_mode = load_mode or ('remote' if config.MODEL_SERVER_SOCKET else config.MODEL_LOAD_MODE)
+        warmup = (not config.DEFER_WARMUP) if warmup is None else warmup
         
-        # AI modellarni yuklash
-        self.load_ai_models()
+        # Ishga tushish bosqichlari (ms) va model holati
+        self.startup_phases = OrderedDict()
+        self.load_mode = load_mode
+        self.model_state = 'not_loaded'
+        self.models_loaded = threading.Event()
+        
+        # Warm-up tugagach, server so'rovlarga tayyor
+        self.ready = threading.Event()
+        self.warmup_s = None
+        
+        # Model kerak bo'lmagan qismlar darhol tayyorlanadi
+        self.generator = None
+        self.model = None
+        self.tokenizer = None
+        self.token_cache = None
+        self.tokenizer_info = None
+        self.inference_backend = None
+        self.model_bytes = None
+        self.model_client = None
+        self._init_generation_state()
         
         # Bilimlar bazasi
-        self.load_knowledge_base()
+        with self._phase('knowledge_base'):
+            self.load_knowledge_base()
+        
+        # Xabar turini (matematika, web, ...) bitta o'tishda aniqlash
+        self.intent_router = create_router()
         
         # Web search sozlamalari
         self.search_enabled = True
         self.max_search_results = 3
+        self.web_search = WebSearchClient(
+            create_provider(config.WEB_SEARCH_PROVIDER, config.WEB_SEARCH_URL),
+            timeout_s=config.WEB_SEARCH_TIMEOUT_S,
+            max_concurrency=config.WEB_SEARCH_MAX_CONCURRENCY,
+            cache_ttl_s=config.WEB_SEARCH_CACHE_TTL_S,
+            breaker_failures=config.WEB_SEARCH_BREAKER_FAILURES,
+            breaker_reset_s=config.WEB_SEARCH_BREAKER_RESET_S
+        )
+        
+        # Tez-tez so'raladigan savollar uchun javoblar keshi
+        self.response_cache = None
+        if config.RESPONSE_CACHE_ENABLED:
+            self.response_cache = ResponseCache(
+                config.RESPONSE_CACHE_TTLS,
+                max_entries=config.RESPONSE_CACHE_MAX_ENTRIES
+            )
+        
+        # Tez-tez so'raladigan savollarga oldindan yaratilgan GPT-2 javoblari (precompute.py)
+        self.precomputed = PrecomputedAnswers.load(config.PRECOMPUTED_ANSWERS_PATH, config.MODEL_NAME)
+        if self.precomputed:
+            print(f"📦 Oldindan yaratilgan javoblar: {len(self.precomputed)} ta")
+        
+        # Test savollari: shablonlar bir marta, tayyor testlar pool'i fonda to'ldiriladi
+        self.quiz_pool = QuizPool(
+            QuizEngine(),
+            size=config.QUIZ_POOL_SIZE,
+            num_questions=config.QUIZ_QUESTIONS
+        )
+        
+        # AI modellarni yuklash: 'eager' - shu yerda, 'background' - fonda (server kutmaydi),
+        # 'remote' - model alohida jarayonda (model_server.py), bu yerda faqat klient,
+        # 'none' - model'siz (offline tahlil, masalan precompute.py)
+        if load_mode == 'none':
+            self.model_state = 'disabled'
+            self.models_loaded.set()
+        elif load_mode == 'remote':
+            self.model_client = ModelClient(
+                config.MODEL_SERVER_SOCKET,
+                authkey=config.MODEL_SERVER_AUTHKEY.encode(),
+                timeout_s=config.MODEL_SERVER_TIMEOUT_S
+            )
+            self.model_state = 'remote'
+            self.models_loaded.set()
+            print(f"🔌 Model server: {config.MODEL_SERVER_SOCKET}")
+            if warmup:
+                self.warm_up()
+        elif load_mode == 'background':
+            threading.Thread(
+                target=self._load_models_and_warm_up,
+                args=(warmup,),
+                name='model-loader',
+                daemon=True
+            ).start()
+        else:
+            self._load_models_and_warm_up(warmup)
+    
+    def _init_generation_state(self):
+        """Generatsiya parametrlari va model yuklanmaguncha bo'sh holatlar"""
+        self.max_new_tokens = 50
+        self.temperature = 0.7
+        self.early_stop = config.GENERATION_EARLY_STOP
+        self.generation_stats = GenerationStats()
+        self.batcher = None
+        self.kv_cache = None
+        
+        # GPT-2 yo'liga kirish nazorati (navbat, foydalanuvchi cheklovi, SLO)
+        self.admission = AdmissionController(
+            max_active=config.ADMISSION_MAX_ACTIVE,
+            max_queue=config.ADMISSION_MAX_QUEUE,
+            per_user=config.ADMISSION_PER_USER,
+            slo_s=config.ADMISSION_SLO_S
+        )
         
+        # Foydalanuvchi sessiyalari (token ID'lar, oxirgi bir necha savol-javob)
+        self.sessions = create_session_store(
+            config.SESSION_BACKEND,
+            config.SESSION_DB_PATH,
+            max_mb=config.SESSION_MAX_MB,
+            max_sessions=config.CONTEXT_MAX_USERS,
+            ttl_s=config.SESSION_TTL_S,
+            max_turns=config.CONTEXT_TURNS,
+            max_tokens=config.CONTEXT_MAX_TOKENS
+        )
+    
+    @contextmanager
+    def _phase(self, name):
+        """Ishga tushish bosqichi vaqtini o'lchash"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_phases[name] = round((time.perf_counter() - started) * 1000.0, 1)
+    
+    def _load_models_and_warm_up(self, warmup):
+        self.load_ai_models()
+        if warmup:
+            self.warm_up()
+    
     def load_ai_models(self):
         """AI modellarni yuklash"""
+        self.model_state = 'loading'
         try:
+            with self._phase('import_libraries'):
+                _import_ml_libraries()
+                # inference_backends torch'ni import qiladi: model server rejimidagi worker'larga kerak emas
+                from inference_backends import prepare_model, model_nbytes
+            
+            self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            print(f"📱 Qurilma: {self.device}")
+            if config.TORCH_THREADS > 0:
+                torch.set_num_threads(config.TORCH_THREADS)
+            
             print("📥 GPT-2 model yuklanmoqda... (biroz vaqt oladi)")
             
-            # GPT-2 tokenizer va model
-            self.tokenizer = GPT2Tokenizer.from_pretrained('gpt2')
-            self.model = GPT2LMHeadModel.from_pretrained('gpt2').to(self.device)
+            # GPT-2 tokenizer (Rust varianti, bilimlar bazasi savollari ham moslik tekshiruviga kiradi) va model
+            with self._phase('tokenizer'):
+                tokenizer, self.tokenizer_info = load_tokenizer(
+                    config.MODEL_NAME,
+                    config.TOKENIZER,
+                    config.TOKENIZER_PARITY_CHECK,
+                    extra_samples=[key for key, _ in self.kb_store.items()[:200]]
+                )
+            print(f"🔤 Tokenizer: {self.tokenizer_info['class']} (fast: {self.tokenizer_info['fast']}, "
+                  f"moslik: {self.tokenizer_info['parity']}"
+                  f"{'' if self.tokenizer_info['slow_available'] else ', sekin variant mavjud emas'})")
+            with self._phase('model'):
+                model = transformers.GPT2LMHeadModel.from_pretrained(config.MODEL_NAME).to(self.device)
+            
+            # CPU uchun int8 kvantlash va/yoki torch.compile
+            with self._phase('inference_backend'):
+                model, self.inference_backend = prepare_model(model, config.INFERENCE_BACKEND, self.device)
+            self.model_bytes = model_nbytes(model)
+            print(f"⚙️ Inference backend: {self.inference_backend} ({self.model_bytes / 1024 / 1024:.0f} MB)")
             
             # Padding token qo'shish
-            self.tokenizer.pad_token = self.tokenizer.eos_token
+            tokenizer.pad_token = tokenizer.eos_token
+            # Decoder-only model: batch'da padding chap tomonda bo'lishi kerak
+            tokenizer.padding_side = 'left'
+            self.tokenizer = tokenizer
+            self.token_cache = CachedTokenizer(tokenizer, config.TOKEN_CACHE_SIZE)
+            self.model = model
             
             # Text generation pipeline
-            self.generator = pipeline(
-                'text-generation', 
-                model=self.model, 
-                tokenizer=self.tokenizer,
-                device=0 if torch.cuda.is_available() else -1
-            )
+            with self._phase('pipeline'):
+                generator = transformers.pipeline(
+                    'text-generation', 
+                    model=self.model, 
+                    tokenizer=self.tokenizer,
+                    device=0 if torch.cuda.is_available() else -1
+                )
+            
+            # Prompt shablonining doimiy qismi
+            self.scaffold_ids = self.token_cache.encode("Question:")
+            self.newline_ids = self.token_cache.encode("\n")
+            
+            # Umumiy shablon va suhbat prefikslari uchun KV kesh
+            if config.KV_CACHE_ENABLED:
+                with self._phase('kv_prefill'):
+                    self.kv_cache = PrefixKVCache(int(config.KV_CACHE_MAX_MB * 1024 * 1024))
+                    self._prefill_shared_prefix(self.scaffold_ids)
+            
+            # Bir vaqtdagi so'rovlarni bitta generate chaqiruviga yig'ish
+            if config.BATCH_ENABLED:
+                self.batcher = MicroBatcher(
+                    self._generate_batch,
+                    window_ms=config.BATCH_WINDOW_MS,
+                    max_batch_size=config.BATCH_MAX_SIZE,
+                    timeout_s=config.BATCH_TIMEOUT_S
+                )
+            
+            # Hammasi tayyor bo'lgach, generatsiya yo'li ochiladi
+            self.generator = generator
+            self.model_state = 'ready'
+            
+            if config.SEMANTIC_EMBEDDER == 'gpt2' and self.semantic_index:
+                with self._phase('semantic_index'):
+                    self.semantic_index.embedder = GPT2Embedder(self.model, self.tokenizer, self.device)
+                    self.semantic_index.build(self.kb_store.items(), self.kb_store.version)
             
             print("✅ GPT-2 model muvaffaqiyatli yuklandi!")
             
@@ -51,94 +286,278 @@ class EnhancedAITutor:
             print(f"❌ Model yuklashda xatolik: {e}")
             print("🔄 Oddiy mode'da ishlaymiz...")
             self.generator = None
+            self.model_state = 'failed'
+        finally:
+            self.models_loaded.set()
     
-    def load_knowledge_base(self):
-        """Kengaytirilgan bilimlar bazasi"""
-        self.knowledge_base = {
-            # O'zbek tili va adabiyoti
-            "o'zbek tili": "O'zbek tili - turkiy tillar oilasiga mansub. 35 million kishi gapiradi.",
-            "alisher navoiy": "Alisher Navoiy (1441-1501) - buyuk shoir va davlat arbobi. 'Xamsa' asari mashhur.",
-            "abdulla qodiriy": "Abdulla Qodiriy (1894-1938) - o'zbek adabiyotining asoschisi. 'Mehrobdan Chayon' romani.",
-            
-            # Matematika
-            "integral": "Integral - funksiya ostidagi yuzani hisoblash. ∫f(x)dx ko'rinishda yoziladi.",
-            "limit": "Limit - x ma'lum qiymatga yaqinlashgandagi funksiya qiymati. lim x→a f(x)",
-            "differensial": "Differensial - funksiyaning o'zgarish tezligi. f'(x) yoki dy/dx bilan belgilanadi.",
-            "matrisa": "Matrisa - sonlarning to'rtburchak jadval ko'rinishidagi joylashishi.",
-            
-            # Fizika
-            "nisbiylik nazariyasi": "Einstein nazariyasi: E=mc², vaqt va fazo nisbiy.",
-            "kvant fizika": "Kvant mexanikasi - atom va subatom zarrachalar harakati qonunlari.",
-            "termodinamika": "Termodinamika - issiqlik va energiya o'zgarishi qonunlari.",
-            "elektromagnetizm": "Elektr va magnit maydonlarning o'zaro ta'siri.",
-            
-            # Kimyo
-            "organik kimyo": "Organik kimyo - uglerod tutgan birikmalarni o'rganadi.",
-            "noorganik kimyo": "Noorganik kimyo - uglerod tutmagan elementlar va birikmalar.",
-            "fizik kimyo": "Fizik kimyo - kimyoviy hodisalarning fizik asoslarini o'rganadi.",
-            "analitik kimyo": "Analitik kimyo - moddalar tarkibini aniqlash usullari.",
-            
-            # Biologiya
-            "genetika": "Genetika - irsiyat qonunlarini o'rganuvchi fan. DNA, RNK.",
-            "evolyutsiya": "Evolyutsiya - tirik mavjudotlarning vaqt davomida o'zgarishi.",
-            "ekologiya": "Ekologiya - organizmlar va atrof-muhit munosabatlari.",
-            "mikrobiologiya": "Mikrobiologiya - ko'zga ko'rinmas organizmlarni o'rganish.",
-            
-            # Tarix
-            "ipak yo'li": "Ipak yo'li - Sharq va G'arbni bog'lagan savdo yo'li. Samarqand, Buxoro muhim nuqtalar.",
-            "movarounahr": "Movarounahr - Amudaryo va Sirdaryo orasidagi hudud. O'zbekiston markazi.",
-            "timurid davlati": "Temuriylar (1370-1507) - O'rta Osiyoda kuchli imperiya.",
-            
-            # Zamonaviy mavzular
-            "sun'iy intellekt": "AI - kompyuterlarni inson kabi o'ylashga o'rgatish texnologiyasi.",
-            "blockchain": "Blockchain - ma'lumotlarni himoya qiluvchi zanjir texnologiyasi.",
-            "python dasturlash": "Python - oddiy va kuchli dasturlash tili. AI uchun eng mashhur.",
-            
-            # Iqtisod
-            "bozor iqtisodiyoti": "Bozor iqtisodiyoti - talab va taklif asosida narx shakllanishi.",
-            "inflyatsiya": "Inflyatsiya - tovarlar narxining umumiy o'sishi.",
-            "valyuta": "Valyuta - xalqaro to'lov vositasi. Dollar, yevro, so'm.",
+    def model_available(self):
+        """GPT-2 ishlatish mumkinmi; model yuklanayotgan bo'lsa, sozlangan muddatgacha kutish"""
+        if self.generator:
+            return True
+        if self.model_client:
+            return self.model_client.available()
+        if self.model_state in ('not_loaded', 'loading') and config.MODEL_WAIT_S > 0:
+            self.models_loaded.wait(config.MODEL_WAIT_S)
+        return self.generator is not None
+    
+    def startup_stats(self):
+        return {
+            'load_mode': self.load_mode,
+            'model_state': self.model_state,
+            'inference_backend': self.inference_backend,
+            'model_mb': round(self.model_bytes / 1024 / 1024, 1) if self.model_bytes else None,
+            'ready': self.ready.is_set(),
+            'phases_ms': dict(self.startup_phases),
         }
     
-    def generate_response(self, user_message, user_id=None):
-        """Foydalanuvchi savoliga javob yaratish"""
+    def tokenizer_stats(self):
+        if not self.token_cache:
+            return None
+        return dict(self.tokenizer_info, cache=self.token_cache.stats())
+    
+    def warm_up(self):
+        """Birinchi haqiqiy so'rov bir martalik xarajatlarni to'lamasligi uchun sinov generatsiyasi"""
+        started = time.perf_counter()
+        try:
+            if self.generator:
+                prompt_ids, _ = self.build_prompt_ids("salom")
+                self._generate_batch([(prompt_ids, None, None)])
+            self.search_knowledge_base("salom")
+            self.quiz_pool.prefill()
+        except Exception as e:
+            print(f"⚠️ Warm-up xatolik: {e}")
+        finally:
+            self.warmup_s = time.perf_counter() - started
+            self.startup_phases['warmup'] = round(self.warmup_s * 1000.0, 1)
+            self.ready.set()
+            print(f"🔥 Warm-up tugadi: {self.warmup_s * 1000:.0f} ms")
+    
+    def load_knowledge_base(self):
+        """Kengaytirilgan bilimlar bazasi (tashqi fayldan, o'zgarsa qayta yuklanadi)"""
+        self.kb_store = create_store(
+            config.KB_BACKEND,
+            config.KB_JSON_PATH,
+            config.KB_DB_PATH,
+            reload_interval_s=config.KB_RELOAD_INTERVAL_S
+        )
+        print(f"📚 Bilimlar bazasi: {len(self.kb_store)} ta yozuv ({self.kb_store.backend})")
         
-        # 1. Bilimlar bazasidan qidirish
-        kb_response = self.search_knowledge_base(user_message)
-        if kb_response:
-            return self.enhance_with_ai(kb_response, user_message)
+        # Parafraza qilingan savollar uchun embedding indeksi (bir marta hisoblanadi)
+        self.semantic_index = None
+        if config.SEMANTIC_ENABLED:
+            try:
+                # GPT-2 embedder model yuklangach almashtiriladi (load_ai_models)
+                if config.SEMANTIC_EMBEDDER == 'gpt2' and self.generator:
+                    embedder = GPT2Embedder(self.model, self.tokenizer, self.device)
+                else:
+                    embedder = HashingEmbedder()
+                self.semantic_index = SemanticIndex(
+                    embedder,
+                    threshold=config.SEMANTIC_THRESHOLD,
+                    top_k=config.SEMANTIC_TOP_K
+                )
+                self.semantic_index.build(self.kb_store.items(), self.kb_store.version)
+            except Exception as e:
+                print(f"❌ Semantik indeks yaratishda xatolik: {e}")
+                self.semantic_index = None
+    
+    def generate_response(self, user_message, user_id=None, deadline_s=None):
+        """Foydalanuvchi savoliga javob yaratish (deadline_s - mijoz kutishi mumkin bo'lgan vaqt)"""
+        with metrics.stage('cache_lookup'):
+            cached = self.get_cached_response(user_message)
+        if cached:
+            metrics.count_route('cache')
+            return cached
         
-        # 2. Matematika masalasi ekanligini tekshirish
-        if self.is_math_problem(user_message):
-            return self.solve_math(user_message)
+        route, response = self.answer_with_route(user_message, user_id, deadline_s, self.route_message(user_message))
+        metrics.count_route(route)
+        self.cache_response(user_message, route, response)
+        return response
+    
+    def route_message(self, user_message):
+        """Xabar turi va topilgan kalit so'zlar (Intent) - keyingi bosqichlar shundan foydalanadi"""
+        with metrics.stage('route'):
+            return self.intent_router.route(user_message)
+    
+    def answer_with_route(self, user_message, user_id=None, deadline_s=None, intent=None):
+        """Javob va uni bergan yo'l: (yo'l, javob)"""
+        intent = intent or self.route_message(user_message)
+        
+        # 1-3. Model'siz tezkor javoblar (bilimlar bazasi, matematika, web)
+        route, quick_response = self.answer_without_model(user_message, intent)
+        if quick_response:
+            return route, quick_response
+        
+        # 4-5. AI model yoki default javob
+        return self.answer_with_model(user_message, user_id, deadline_s, intent)
+    
+    def answer_with_model(self, user_message, user_id=None, deadline_s=None, intent=None):
+        """GPT-2 javobi (admission orqali) yoki model hali yuklanayotgan bo'lsa - default javob"""
+        precomputed = self.lookup_precomputed(user_message)
+        if precomputed:
+            return 'precomputed', precomputed
+        
+        if self.model_available():
+            cancel = cancellation.current_token()
+            try:
+                with metrics.stage('admission'):
+                    ticket = self.admission.acquire(user_id, deadline_s, cancel)
+            except AdmissionRejected as e:
+                if e.reason == 'cancelled':
+                    return 'cancelled', ''
+                return 'shed', self.shed_response(user_message, e.reason, intent)
+            try:
+                response = self.generate_ai_response(user_message, user_id)
+            finally:
+                self.admission.release(ticket)
+            if cancel is not None and cancel.cancelled:
+                # Mijoz javobni kutmayapti: default javob ham keshlanmaydi
+                return 'cancelled', ''
+            return 'ai', response
+        
+        with metrics.stage('default'):
+            return 'default', self.generate_default_response(user_message, intent)
+    
+    def stream_response(self, user_message, user_id=None):
+        """Javobni qismlarga bo'lib qaytarish (model javobi token-token keladi)"""
+        with metrics.stage('cache_lookup'):
+            cached = self.get_cached_response(user_message)
+        if cached:
+            metrics.count_route('cache')
+            yield cached
+            return
+        
+        intent = self.route_message(user_message)
+        route, quick_response = self.answer_without_model(user_message, intent)
+        if quick_response:
+            metrics.count_route(route)
+            self.cache_response(user_message, route, quick_response)
+            yield quick_response
+            return
+        
+        yield from self.stream_with_model(user_message, user_id, intent)
+    
+    def stream_with_model(self, user_message, user_id=None, intent=None):
+        """GPT-2 javobi token-token (admission orqali) yoki default javob"""
+        precomputed = self.lookup_precomputed(user_message)
+        if precomputed:
+            metrics.count_route('precomputed')
+            yield precomputed
+            return
+        
+        if self.model_available():
+            try:
+                with metrics.stage('admission'):
+                    ticket = self.admission.acquire(user_id, cancel=cancellation.current_token())
+            except AdmissionRejected as e:
+                if e.reason == 'cancelled':
+                    metrics.count_route('cancelled')
+                    return
+                metrics.count_route('shed')
+                yield self.shed_response(user_message, e.reason, intent)
+                return
+            metrics.count_route('ai')
+            try:
+                yield from self.generate_ai_response_stream(user_message, user_id)
+            finally:
+                # Mijoz uzilsa ham joy bo'shatiladi
+                self.admission.release(ticket)
+            return
+        
+        metrics.count_route('default')
+        yield self.generate_default_response(user_message, intent)
+    
+    def answer_without_model(self, user_message, intent=None):
+        """GPT-2 kerak bo'lmagan yo'llar: bilimlar bazasi, matematika, web. (yo'l, javob) qaytaradi"""
+        intent = intent or self.route_message(user_message)
+        route, response = self.answer_locally(user_message, intent)
+        if response:
+            return route, response
         
         # 3. Web'dan qidirish (agar ruxsat berilsa)
-        if self.search_enabled and self.should_search_web(user_message):
-            web_info = self.search_web(user_message)
+        if self.wants_web_search(intent):
+            with metrics.stage('web'):
+                web_info = self.search_web(user_message)
             if web_info:
-                return self.create_response_with_web_data(user_message, web_info)
-        
-        # 4. AI model bilan javob yaratish
-        if self.generator:
-            return self.generate_ai_response(user_message)
+                return 'web', self.create_response_with_web_data(user_message, web_info)
         
-        # 5. Default javob
-        return self.generate_default_response(user_message)
+        return None, None
     
-    def search_knowledge_base(self, query):
-        """Bilimlar bazasida qidirish"""
-        query_lower = query.lower()
+    def answer_locally(self, user_message, intent=None):
+        """Tarmoq va model'siz yo'llar (bilimlar bazasi, matematika, ma'noviy qidiruv)"""
+        intent = intent or self.route_message(user_message)
         
-        # To'liq mos kelish
-        if query_lower in self.knowledge_base:
-            return self.knowledge_base[query_lower]
+        # 1. Bilimlar bazasidan qidirish (normallashtirilgan matn router'dan)
+        with metrics.stage('kb'):
+            kb_response = self.search_knowledge_base(user_message, intent)
+        if kb_response:
+            return 'kb', self.enhance_with_ai(kb_response, user_message)
         
-        # Kalit so'zlar bo'yicha qidirish
-        for key, value in self.knowledge_base.items():
-            if key in query_lower or any(word in query_lower for word in key.split()):
-                return value
+        # 2. Matematika masalasi ekanligini tekshirish
+        with metrics.stage('math'):
+            if intent.is_math:
+                return 'math', self.solve_math(user_message)
         
-        return None
+        # 2.5. Ma'no bo'yicha bilimlar bazasidan qidirish (parafrazalar uchun)
+        with metrics.stage('semantic'):
+            semantic_response = self.search_semantic(user_message)
+        if semantic_response:
+            return 'semantic', self.enhance_with_ai(semantic_response, user_message)
+        
+        return None, None
+    
+    def lookup_precomputed(self, user_message):
+        """Oldindan yaratilgan javob yoki None (model chaqirilmaydi)"""
+        if not self.precomputed:
+            return None
+        with metrics.stage('precomputed'):
+            return self.precomputed.get(user_message)
+    
+    def wants_web_search(self, intent):
+        return self.search_enabled and intent.wants_web
+    
+    def shed_response(self, user_message, reason, intent=None):
+        """Generatsiya rad etildi: shu savolga oldingi GPT-2 javobi (keshda bo'lsa) yoki default javob"""
+        log.info('generation_shed', extra={'reason': reason})
+        if self.response_cache:
+            cached = self.response_cache.get(user_message, self._fallback_namespace())
+            if cached:
+                return cached[1]
+        return self.generate_default_response(user_message, intent)
+    
+    def _fallback_namespace(self):
+        return ('ai_fallback', self.kb_store.version)
+    
+    def _cache_namespace(self):
+        """Bilimlar bazasi yangilansa yoki web qidiruv o'chirilsa, eski javoblar ishlatilmaydi"""
+        return (self.kb_store.version, self.search_enabled)
+    
+    def get_cached_response(self, user_message):
+        """Keshdagi javob yoki None"""
+        if not self.response_cache:
+            return None
+        cached = self.response_cache.get(user_message, self._cache_namespace())
+        return cached[1] if cached else None
+    
+    def cache_response(self, user_message, route, response):
+        """Javobni yo'lning TTL'i bilan keshlash (sampling qilingan javoblar keshlanmaydi)"""
+        if self.response_cache:
+            self.response_cache.put(user_message, route, response, self._cache_namespace())
+    
+    def search_knowledge_base(self, query, intent=None):
+        """Bilimlar bazasida qidirish"""
+        # To'liq mos kelish, so'ng iboralar va kalit so'zlar bo'yicha (indeks orqali)
+        if intent is not None:
+            return self.kb_store.search_normalized(intent.normalized)
+        return self.kb_store.search(query)
+    
+    def search_semantic(self, query):
+        """Embedding bo'yicha eng yaqin bilimlar bazasi javobi (chegaradan yuqori bo'lsa)"""
+        if not self.semantic_index:
+            return None
+        # Bilimlar bazasi qayta yuklangan bo'lsa, indeks fonda yangilanadi
+        self.semantic_index.sync(self.kb_store)
+        return self.semantic_index.best_match(query)
     
     def enhance_with_ai(self, base_response, user_question):
         """Asosiy javobni AI bilan boyitish"""
@@ -148,91 +567,25 @@ class EnhancedAITutor:
     
     def is_math_problem(self, text):
         """Matematika masalasi ekanligini aniqlash"""
-        math_patterns = [
-            r'\d+\s*[\+\-\*/]\s*\d+',  # 2+2, 5*3
-            r'x\s*[\+\-\*/=]\s*\d+',   # x+5=10
-            r'sin|cos|tan|log',         # trigonometriya
-            r'integral|differensial|limit',  # matematika terminlari
-            r'tenglama|funksiya|grafik'
-        ]
-        
-        for pattern in math_patterns:
-            if re.search(pattern, text.lower()):
-                return True
-        return False
+        return math_engine.is_math_problem(text)
     
     def solve_math(self, problem):
-        """Matematik masalani yechish"""
-        problem_lower = problem.lower()
-        
-        # Oddiy amallar
-        if '+' in problem:
-            try:
-                # Xavfsiz eval uchun
-                numbers = re.findall(r'\d+', problem)
-                if len(numbers) >= 2:
-                    result = sum(int(n) for n in numbers)
-                    return f"Javob: {' + '.join(numbers)} = {result}"
-            except:
-                pass
-        
-        if '-' in problem:
-            try:
-                numbers = re.findall(r'\d+', problem)
-                if len(numbers) >= 2:
-                    result = int(numbers[0]) - int(numbers[1])
-                    return f"Javob: {numbers[0]} - {numbers[1]} = {result}"
-            except:
-                pass
-        
-        if '*' in problem or 'x' in problem.replace('x=', ''):
-            try:
-                numbers = re.findall(r'\d+', problem)
-                if len(numbers) >= 2:
-                    result = int(numbers[0]) * int(numbers[1])
-                    return f"Javob: {numbers[0]} × {numbers[1]} = {result}"
-            except:
-                pass
-        
-        return "Bu matematik masalani yecha olmadim. Boshqa ko'rinishda yozib ko'ring."
+        """Matematik masalani yechish (xavfsiz parser va hisoblagich orqali)"""
+        try:
+            result = math_engine.solve(problem)
+        except math_engine.MathError as e:
+            if str(e) == math_engine.NO_EXPRESSION:
+                return "Bu matematik masalani yecha olmadim. Boshqa ko'rinishda yozib ko'ring."
+            return f"Bu matematik masalani yecha olmadim: {e}. Boshqa ko'rinishda yozib ko'ring."
+        return math_engine.format_answer(*result)
     
     def should_search_web(self, query):
-        """Web'da qidirish kerakligini aniqlash"""
-        current_keywords = ['yangi', 'hozir', 'bugun', '2024', '2025', 'so\'nggi', 'eng yangi']
-        news_keywords = ['yangiliklar', 'xabarlar', 'hodisa', 'voqea']
-        
-        query_lower = query.lower()
-        
-        return any(keyword in query_lower for keyword in current_keywords + news_keywords)
+        """Web'da qidirish kerakligini aniqlash (kalit so'zlar: intent_router.WEB_KEYWORDS)"""
+        return self.intent_router.route(query).wants_web
     
     def search_web(self, query):
-        """Web'dan qidirish"""
-        try:
-            # Google qidirish URL
-            search_url = f"https://www.google.com/search?q={query}&hl=uz"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(search_url, headers=headers, timeout=5)
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Qidiruv natijalarini olish
-                results = []
-                for div in soup.find_all('div', class_='BVG0Nb')[:self.max_search_results]:
-                    text = div.get_text()
-                    if len(text) > 50:
-                        results.append(text[:200] + "...")
-                
-                return results
-                
-        except Exception as e:
-            print(f"Web search xatolik: {e}")
-            
-        return None
+        """Web'dan qidirish (kesh, ulanishlar pool'i va circuit breaker orqali)"""
+        return self.web_search.search(query, self.max_search_results)
     
     def create_response_with_web_data(self, query, web_results):
         """Web ma'lumotlari bilan javob yaratish"""
@@ -245,34 +598,365 @@ class EnhancedAITutor:
         
         return response
     
-    def generate_ai_response(self, user_message):
-        """AI model bilan javob yaratish"""
+    def generate_ai_response(self, user_message, user_id=None):
+        """AI model bilan javob yaratish (rad etilsa yoki xatolikda - default javob)"""
+        if self.model_client:
+            try:
+                response = self.model_client.generate(user_message, user_id, cancel=cancellation.current_token())
+            except ModelServerError as e:
+                log.warning('model_server_failed', extra={'error': str(e)})
+                response = None
+        else:
+            response = self.generate_model_answer(user_message, user_id)
+        
+        if response is None:
+            return self.generate_default_response(user_message)
+        # Yuklama yuqori bo'lganda rad etilgan so'rovlar uchun zaxira
+        if self.response_cache:
+            self.response_cache.put(user_message, 'ai_fallback', response, self._fallback_namespace())
+        return response
+    
+    def generate_model_answer(self, user_message, user_id=None):
+        """GPT-2 javobi yoki None (rad etilsa, umumiy token byudjeti ichida qayta urinish)"""
+        attempts = tokens_used = 0
+        cancel = cancellation.current_token()
         try:
-            # O'zbek tilida oddiy prompt
-            prompt = f"Question: {user_message}\nAnswer:"
+            # O'zbek tilida oddiy prompt (oldingi suhbat konteksti bilan)
+            with metrics.stage('tokenize'):
+                prompt_ids, turn_ids = self.build_prompt_ids(user_message, user_id)
+            request = (prompt_ids, user_id, cancel)
             
-            response = self.generator(
-                prompt,
-                max_new_tokens=50,
-                num_return_sequences=1,
-                temperature=0.7,
-                do_sample=True,
-                pad_token_id=self.tokenizer.eos_token_id,
-                truncation=True,
-                clean_up_tokenization_spaces=True
-            )
+            # Navbat kutish + prefill + decode (prefill/decode alohida batch thread'ida yoziladi)
+            with metrics.stage('generate'):
+                for attempt in range(1 + config.GENERATION_RETRIES):
+                    if cancel is not None and cancel.cancelled:
+                        # Mijoz uzildi yoki so'rovni bekor qildi: qisman javob ham ishlatilmaydi
+                        break
+                    if attempt == 0:
+                        if self.batcher:
+                            # Boshqa so'rovlar bilan birga bitta batch'da generatsiya
+                            text, answer_ids, kv = self.batcher.generate(request, cancel)
+                        else:
+                            text, answer_ids, kv = self._generate_batch([request])[0]
+                    else:
+                        # Qayta urinish boshqa sampling bilan, qolgan byudjet doirasida
+                        max_new_tokens = min(self.max_new_tokens, config.GENERATION_TOKEN_BUDGET - tokens_used)
+                        if max_new_tokens < config.GENERATION_MIN_RETRY_TOKENS:
+                            break
+                        text, answer_ids, kv = self._generate_batch(
+                            [request], sampling=self.RETRY_SAMPLING, max_new_tokens=max_new_tokens
+                        )[0]
+                    attempts += 1
+                    tokens_used += len(answer_ids)
+                    answer = text.strip()
+                    
+                    # Noto'g'ri javoblarni filtrlash
+                    if not (cancel is not None and cancel.cancelled) and self.is_acceptable_answer(answer):
+                        self.generation_stats.record_request(attempts, tokens_used, True)
+                        self.remember_turn(user_id, turn_ids + answer_ids + self.newline_ids, kv)
+                        return f"🤖 {answer}"
             
-            generated = response[0]['generated_text']
-            answer = generated[len(prompt):].strip()
+        except CancelledError:
+            # Bekor qilingan so'rov batch'ga olinmadi
+            pass
+        except Exception as e:
+            log.warning('ai_response_failed', extra={'error': str(e)})
+        
+        if attempts:
+            self.generation_stats.record_request(attempts, tokens_used, False)
+        return None
+    
+    def generate_answers_batch(self, messages, attempts=1):
+        """Bir nechta savolga kontekstsiz GPT-2 javoblari bitta batch'da (offline); rad etilganlar None"""
+        turns = self.token_cache.encode_batch([self._turn_text(message) for message in messages])
+        requests = [(self._fit_prompt(self.scaffold_ids + turn_ids)[0], None, None) for turn_ids in turns]
+        answers = [None] * len(messages)
+        pending = list(range(len(messages)))
+        for attempt in range(attempts):
+            if not pending:
+                break
+            results = self._generate_batch(
+                [requests[i] for i in pending], sampling=self.RETRY_SAMPLING if attempt else None
+            )
+            rejected = []
+            for i, (text, _, _) in zip(pending, results):
+                answer = text.strip()
+                if self.is_acceptable_answer(answer):
+                    answers[i] = f"🤖 {answer}"
+                else:
+                    rejected.append(i)
+            pending = rejected
+        return answers
+    
+    def build_prompt_ids(self, user_message, user_id=None):
+        """Prompt tokenlari: foydalanuvchi konteksti + "Question: ...\nAnswer:" shabloni"""
+        return self._fit_prompt(self.scaffold_ids + self.token_cache.encode(self._turn_text(user_message)), user_id)
+    
+    @staticmethod
+    def _turn_text(user_message):
+        """Shablonning "Question:" dan keyingi qismi (tokenlash keshi kaliti)"""
+        return f" {user_message}\nAnswer:"
+    
+    def _fit_prompt(self, turn_ids, user_id=None):
+        """Kontekstni qo'shib, prompt'ni model oynasiga sig'dirish: (prompt tokenlari, savol tokenlari)"""
+        max_prompt_len = self.model.config.n_positions - self.max_new_tokens
+        
+        context_ids = []
+        if self._has_context(user_id):
+            context_ids = self.sessions.context_ids(user_id).tolist()
+        
+        prompt_ids = context_ids + turn_ids
+        if len(prompt_ids) > max_prompt_len:
+            prompt_ids = turn_ids[-max_prompt_len:]
+        return prompt_ids, turn_ids
+    
+    def remember_turn(self, user_id, turn_ids, kv=None):
+        """Qabul qilingan savol-javobni foydalanuvchi kontekstiga qo'shish"""
+        if not self._has_context(user_id):
+            return
+        
+        self.sessions.append_turn(user_id, turn_ids)
+        
+        if self.kv_cache and kv:
+            kv_tokens, past = kv
+            self.kv_cache.put_user(user_id, kv_tokens, past)
+    
+    def _has_context(self, user_id):
+        """Umumiy (anonim) foydalanuvchilar uchun kontekst saqlanmaydi"""
+        return config.CONTEXT_TURNS > 0 and user_id not in (None, '', 'anonymous')
+    
+    def generate_ai_response_stream(self, user_message, user_id=None):
+        """AI javobini token-token qaytarish; noto'g'ri javob boshlansa, darhol to'xtatish.
+        
+        Suhbat konteksti va foydalanuvchi KV keshi generate_model_answer'dagidek ishlatiladi;
+        qabul qilingan javob kontekstga qo'shiladi.
+        """
+        if self.model_client:
+            yield from self._stream_remote(user_message, user_id)
+            return
+        
+        stop_event = threading.Event()
+        cancel = cancellation.current_token()
+        if cancel is not None:
+            cancel.add_callback(stop_event.set)
+        answer = ''
+        started = False
+        accepted = False
+        
+        try:
+            with metrics.stage('tokenize'):
+                prompt_ids, turn_ids = self.build_prompt_ids(user_message, user_id)
+            streamer = transformers.TextIteratorStreamer(
+                self.tokenizer,
+                skip_prompt=True,
+                skip_special_tokens=True,
+                timeout=config.BATCH_TIMEOUT_S
+            )
+            # Generate thread'i javob tokenlari va KV keshni shu yerga yozadi
+            result = {}
+            # Birinchi qism kelguncha (prefill + birinchi token) vaqti
+            first_chunk_started = time.perf_counter()
+            profile = profiler.current()
+            generator = threading.Thread(
+                target=self._generate_to_streamer,
+                args=(streamer, prompt_ids, user_id, stop_event, result, profile),
+                daemon=True
+            )
+            generator.start()
             
-            # Noto'g'ri javoblarni filtrlash
-            if answer and len(answer) > 5 and not self.is_gibberish(answer):
-                return f"🤖 {answer}"
+            for chunk in streamer:
+                if stop_event.is_set():
+                    break
+                if not chunk:
+                    continue
+                candidate = answer + chunk
+                # Noto'g'ri javobni oxirigacha kutmasdan kesish
+                if self.is_gibberish(candidate):
+                    break
+                answer = candidate
+                
+                if started:
+                    yield chunk
+                elif len(answer.strip()) > 5:
+                    # Birinchi qism: juda qisqa javoblar yuborilmaydi
+                    started = True
+                    metrics.observe('first_chunk', time.perf_counter() - first_chunk_started)
+                    yield f"🤖 {answer.lstrip()}"
+            else:
+                accepted = started and not stop_event.is_set() and self.is_acceptable_answer(answer.strip())
             
+            if accepted or profile is not None:
+                # Streamer tugadi: generate thread'i natijani (va profilni) yozib bo'lishi kerak
+                stop_event.set()
+                generator.join(config.BATCH_TIMEOUT_S)
+            if accepted:
+                if 'answer_ids' in result:
+                    self.remember_turn(user_id, turn_ids + result['answer_ids'] + self.newline_ids, result['kv'])
+                
         except Exception as e:
-            print(f"AI response xatolik: {e}")
+            log.warning('ai_stream_failed', extra={'error': str(e)})
+        finally:
+            # Mijoz uzilib qolsa ham (GeneratorExit) generatsiya to'xtaydi
+            stop_event.set()
+            if cancel is not None:
+                cancel.remove_callback(stop_event.set)
+        
+        if not started and not (cancel is not None and cancel.cancelled):
+            yield self.generate_default_response(user_message)
+    
+    def _stream_remote(self, user_message, user_id=None):
+        """Model serverdan javob qismlari (server ham default javobni o'zi qaytaradi)"""
+        started = False
+        cancel = cancellation.current_token()
+        try:
+            for chunk in self.model_client.stream(user_message, user_id, cancel=cancel):
+                started = True
+                yield chunk
+        except ModelServerError as e:
+            log.warning('model_server_failed', extra={'error': str(e)})
+        if not started and not (cancel is not None and cancel.cancelled):
+            yield self.generate_default_response(user_message)
+    
+    def _generate_to_streamer(self, streamer, prompt_ids, user_id, stop_event, result, profile=None):
+        """Alohida thread'da generate chaqirish (streamer tokenlarni uzatadi, natija result'ga).
+        
+        profile - so'rov profili hisoboti: generatsiya shu so'rov nomidan profillanadi.
+        """
+        try:
+            with profiler.attach([profile], 'stream_generate'):
+                _, result['answer_ids'], result['kv'] = self._generate_with_cache(
+                    prompt_ids, user_id, streamer=streamer, extra_criteria=[_StopOnEvent(stop_event)]
+                )
+        except Exception as e:
+            log.warning('ai_stream_generate_failed', extra={'error': str(e)})
+            streamer.end()
+    
+    # Birinchi javob rad etilganda: sovuqroq sampling va takrorlanish jarimasi
+    RETRY_SAMPLING = {'temperature': 0.5, 'top_k': 40, 'repetition_penalty': 1.3}
+    
+    def _generation_kwargs(self, start, sampling=None, max_new_tokens=None, cancels=(), extra_criteria=()):
+        """generate() parametrlari va erta to'xtatish mezoni (None - o'chirilgan).
+        
+        cancels - har bir qator uchun CancelToken yoki None: bekor qilingan qator keyingi tokendan to'xtaydi.
+        """
+        kwargs = dict(
+            max_new_tokens=max_new_tokens or self.max_new_tokens,
+            temperature=self.temperature,
+            do_sample=True,
+            pad_token_id=self.tokenizer.eos_token_id
+        )
+        kwargs.update(sampling or {})
+        criteria = self._answer_criteria(start)
+        stoppers = criteria + list(extra_criteria) + ([_StopOnCancel(list(cancels))] if any(cancels) else [])
+        if stoppers:
+            kwargs['stopping_criteria'] = transformers.StoppingCriteriaList(stoppers)
+        return kwargs, (criteria[0] if criteria else None)
+    
+    def _answer_criteria(self, start):
+        if not self.early_stop:
+            return []
+        return [AnswerStoppingCriteria(self.token_cache, start, self.is_gibberish)]
+    
+    def _generate_batch(self, requests, sampling=None, max_new_tokens=None):
+        """Bir nechta promptni padding bilan birlashtirib, bitta generate chaqiruvida ishlatish.
+        
+        Har bir so'rov uchun (matn, javob tokenlari, KV kesh yoki None) qaytaradi.
+        """
+        if len(requests) == 1 and self.kv_cache:
+            # Yakka so'rov: keshlangan prefiksdan foydalanish
+            return [self._generate_with_cache(*requests[0], sampling=sampling, max_new_tokens=max_new_tokens)]
+        
+        pad_id = self.tokenizer.pad_token_id
+        max_len = max(len(prompt_ids) for prompt_ids, _, _ in requests)
+        input_ids = [[pad_id] * (max_len - len(ids)) + ids for ids, _, _ in requests]
+        attention_mask = [[0] * (max_len - len(ids)) + [1] * len(ids) for ids, _, _ in requests]
+        
+        input_ids = torch.tensor(input_ids, device=self.device)
+        attention_mask = torch.tensor(attention_mask, device=self.device)
+        
+        generate_kwargs, criteria = self._generation_kwargs(
+            max_len, sampling, max_new_tokens, [cancel for _, _, cancel in requests]
+        )
+        timer = metrics.generation_timer()
+        with torch.inference_mode(), profiler.torch_scope('generate_batch'):
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                logits_processor=transformers.LogitsProcessorList([timer]),
+                **generate_kwargs
+            )
+        self.generation_stats.record_attempt(criteria, len(requests))
+        
+        # Faqat yangi tokenlarni har bir so'rovchiga qaytarish
+        rows = [self._strip_eos(row) for row in output_ids[:, max_len:].tolist()]
+        results = [(text, answer_ids, None) for text, answer_ids in zip(self.token_cache.decode_batch(rows), rows)]
+        metrics.record_generation(timer, sum(len(answer_ids) for _, answer_ids, _ in results))
+        return results
+    
+    def _generate_with_cache(self, prompt_ids, user_id, cancel=None, sampling=None, max_new_tokens=None,
+                             streamer=None, extra_criteria=()):
+        """Keshda bor prefiksni qayta hisoblamasdan, faqat yangi tokenlarni prefill qilish.
+        
+        KV kesh o'chirilgan bo'lsa, prompt to'liq prefill qilinadi (stream yo'li ham shu yerdan o'tadi).
+        """
+        prefix_len, past = self.kv_cache.lookup(prompt_ids, user_id) if self.kv_cache else (0, None)
+        cache = to_model_cache(past)
+        input_ids = torch.tensor([prompt_ids], device=self.device)
+        
+        # Prefill vaqti qo'lda prefill + generate ichidagi birinchi qadamni o'z ichiga oladi
+        timer = metrics.generation_timer()
+        with torch.inference_mode(), profiler.torch_scope('generate_with_cache'):
+            # Oxirgi token generate'ga qoldiriladi
+            started = time.perf_counter()
+            if len(prompt_ids) - 1 > prefix_len:
+                output = self.model(input_ids[:, prefix_len:-1], past_key_values=cache, use_cache=True)
+                cache = output.past_key_values
+            if self.kv_cache:
+                self.kv_cache.record_prefill(len(prompt_ids) - 1 - prefix_len, time.perf_counter() - started)
+            
+            generate_kwargs, criteria = self._generation_kwargs(
+                len(prompt_ids), sampling, max_new_tokens, [cancel], extra_criteria
+            )
+            if streamer is not None:
+                generate_kwargs['streamer'] = streamer
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=cache,
+                return_dict_in_generate=True,
+                logits_processor=transformers.LogitsProcessorList([timer]),
+                **generate_kwargs
+            )
+        self.generation_stats.record_attempt(criteria, 1)
+        
+        sequence = output.sequences[0].tolist()
+        answer_ids = self._strip_eos(sequence[len(prompt_ids):])
+        metrics.record_generation(timer, len(answer_ids))
         
-        return self.generate_default_response(user_message)
+        # Kesh oxirgi tanlangan tokendan oldingi barcha tokenlarni qamrab oladi
+        kv_len = min(len(prompt_ids) + len(answer_ids), len(sequence) - 1)
+        kv = ((prompt_ids + answer_ids)[:kv_len], output.past_key_values)
+        return self.token_cache.decode(answer_ids), answer_ids, kv
+    
+    def _prefill_shared_prefix(self, token_ids):
+        """Umumiy prefiks uchun KV keshni oldindan hisoblash"""
+        input_ids = torch.tensor([token_ids], device=self.device)
+        with torch.inference_mode():
+            started = time.perf_counter()
+            output = self.model(input_ids, use_cache=True)
+            self.kv_cache.record_prefill(len(token_ids), time.perf_counter() - started)
+        self.kv_cache.put_shared(token_ids, output.past_key_values)
+    
+    def _strip_eos(self, token_ids):
+        """Javob oxiridagi eos/pad tokenlarini olib tashlash"""
+        eos_id = self.tokenizer.eos_token_id
+        if eos_id in token_ids:
+            token_ids = token_ids[:token_ids.index(eos_id)]
+        return token_ids
+    
+    def is_acceptable_answer(self, answer):
+        """Javob foydalanuvchiga berishga yaroqlimi (juda qisqa yoki noto'g'ri emas)"""
+        return bool(answer) and len(answer) > 5 and not self.is_gibberish(answer)
     
     def is_gibberish(self, text):
         """Noto'g'ri javoblarni aniqlash"""
@@ -292,12 +976,12 @@ class EnhancedAITutor:
             
         return False
     
-    def generate_default_response(self, user_message):
+    def generate_default_response(self, user_message, intent=None):
         """Default javob"""
-        message_lower = user_message.lower()
+        intent = intent or self.intent_router.route(user_message)
         
         # Maxsus savollar uchun javoblar
-        if 'nima qila olasan' in message_lower or 'qila olasan' in message_lower:
+        if intent.asks_capabilities:
             return """Men quyidagi ishlarni qila olaman:
 
 📚 **Ta'lim sohasida:**
@@ -333,99 +1017,9 @@ Qanday yordam kerak?"""
         return random.choice(responses)
     
     def generate_quiz(self, topic, difficulty='medium', num_questions=5):
-        """Test savollar yaratish"""
-        
-        # Mavzu bo'yicha savollar bazasi
-        quiz_templates = {
-            'matematika': [
-                {'q': 'Kvadrat ildizi {} ning qiymati nechaga teng?', 'type': 'sqrt'},
-                {'q': 'Agar x + {} = {}, x ning qiymati necha?', 'type': 'equation'},
-                {'q': '{} × {} ning natijasi?', 'type': 'multiply'},
-                {'q': 'Uchburchakning barcha burchaklari yig\'indisi nechaga teng?', 'answer': '180°'},
-                {'q': 'Pi soni taxminan qanchaga teng?', 'answer': '3.14159'}
-            ],
-            'fizika': [
-                {'q': 'Yerning tortishish tezlanishi nechaga teng?', 'answer': '9.8 m/s²'},
-                {'q': 'Yorug\'lik tezligi qancha?', 'answer': '300,000 km/s'},
-                {'q': 'Energiya saqlanish qonuni nima deydi?', 'answer': 'Energiya yo\'qolmaydi, faqat shaklini o\'zgartiradi'},
-                {'q': 'Elektr qarshilik birligi nima?', 'answer': 'Om (Ω)'},
-                {'q': 'Atmosfera bosimi nechaga teng?', 'answer': '101,325 Pa'}
-            ],
-            'kimyo': [
-                {'q': 'Suvning kimyoviy formulasi?', 'answer': 'H₂O'},
-                {'q': 'Kislorodning kimyoviy belgisi?', 'answer': 'O'},
-                {'q': 'Tuzning kimyoviy nomi?', 'answer': 'Natriy xlorid (NaCl)'},
-                {'q': 'Uglerodni oksidning formulasi?', 'answer': 'CO₂'},
-                {'q': 'pH shkalasi qancha oraliqda?', 'answer': '0 dan 14 gacha'}
-            ]
-        }
-        
-        if topic.lower() not in quiz_templates:
-            topic = 'matematika'
-        
-        questions = []
-        templates = quiz_templates[topic.lower()]
-        
-        import random
-        selected_templates = random.sample(templates, min(num_questions, len(templates)))
-        
-        for template in selected_templates:
-            if template['type'] == 'sqrt' if 'type' in template else False:
-                num = random.choice([4, 9, 16, 25, 36, 49, 64, 81, 100])
-                questions.append({
-                    'question': template['q'].format(num),
-                    'answer': str(int(num ** 0.5)),
-                    'options': self.generate_options(str(int(num ** 0.5)), 'number')
-                })
-            elif template.get('type') == 'equation':
-                a = random.randint(1, 10)
-                b = random.randint(11, 20)
-                answer = b - a
-                questions.append({
-                    'question': template['q'].format(a, b),
-                    'answer': str(answer),
-                    'options': self.generate_options(str(answer), 'number')
-                })
-            elif template.get('type') == 'multiply':
-                a = random.randint(2, 12)
-                b = random.randint(2, 12)
-                answer = a * b
-                questions.append({
-                    'question': template['q'].format(a, b),
-                    'answer': str(answer),
-                    'options': self.generate_options(str(answer), 'number')
-                })
-            else:
-                questions.append({
-                    'question': template['q'],
-                    'answer': template['answer'],
-                    'options': self.generate_options(template['answer'], 'text')
-                })
-        
-        return {
-            'topic': topic,
-            'difficulty': difficulty,
-            'questions': questions,
-            'total_questions': len(questions)
-        }
+        """Test savollar yaratish (tayyor testlar pool'idan)"""
+        return self.quiz_pool.get(topic, difficulty, num_questions)[0]
     
-    def generate_options(self, correct_answer, answer_type):
-        """Test variantlari yaratish"""
-        if answer_type == 'number':
-            correct = int(correct_answer)
-            options = [correct]
-            
-            # Noto'g'ri variantlar
-            while len(options) < 4:
-                wrong = correct + random.randint(-10, 10)
-                if wrong != correct and wrong not in options and wrong > 0:
-                    options.append(wrong)
-            
-            random.shuffle(options)
-            return [str(opt) for opt in options]
-        
-        else:  # text
-            # Oddiy text uchun standard variantlar
-            options = [correct_answer, "Noto'g'ri variant 1", "Noto'g'ri variant 2", "Noto'g'ri variant 3"]
-            random.shuffle(options)
-            return options
\ No newline at end of file
+    def generate_quiz_batch(self, topic, difficulty='medium', num_questions=5, count=1):
+        """Butun sinf uchun bir nechta test (har bir o'quvchiga alohida variant)"""
+        return self.quiz_pool.get(topic, difficulty, num_questions, count)
\ No newline at end of file
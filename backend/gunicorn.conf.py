@@ -0,0 +1,102 @@
+# backend/gunicorn.conf.py - Production rejimi: bir nechta worker, model fork'dan oldin yuklanadi
+#
+# Ishga tushirish (backend papkasidan):
+#     gunicorn -c gunicorn.conf.py app:app
+#
+# Worker'lar soni AI_TUTOR_WORKERS, har biridagi torch thread'lari
+# AI_TUTOR_TORCH_THREADS_PER_WORKER bilan sozlanadi (standart: yadrolar / worker'lar).
+#
+# AI_TUTOR_MODEL_SERVER_SOCKET o'rnatilsa, GPT-2 bitta model server jarayonida
+# (model_server.py, shu yerda ishga tushiriladi), worker'lar esa faqat klient.
+
+import gc
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+
+# Standart: master jarayonda torch bitta thread'da ishlaydi (fork'dan keyin OpenMP pool'i
+# osilib qolmasligi uchun), warm-up esa har bir worker'da fork'dan keyin bajariladi.
+# Bu qiymatlar config import qilinishidan oldin o'rnatilishi kerak; operator ularni o'zgartirishi mumkin.
+os.environ.setdefault('AI_TUTOR_TORCH_THREADS', '1')
+os.environ.setdefault('AI_TUTOR_DEFER_WARMUP', '1')
+# Yuklash rejimi majburiy: model fork'dan oldin to'liq yuklanishi kerak (copy-on-write).
+# 'background' da yuklovchi thread fork'dan keyin worker'larga o'tmaydi va model hech qachon
+# yuklanmaydi; 'lazy' da har bir worker o'z nusxasini yuklaydi. Operator qiymati on_starting'da logga yoziladi.
+OVERRIDDEN_LOAD_MODE = os.environ.get('AI_TUTOR_MODEL_LOAD_MODE')
+if OVERRIDDEN_LOAD_MODE == 'eager':
+    OVERRIDDEN_LOAD_MODE = None
+os.environ['AI_TUTOR_MODEL_LOAD_MODE'] = 'eager'
+os.environ.setdefault('AI_TUTOR_DEBUG', '0')
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+from config import DEFER_WARMUP, env_bool, env_int
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+bind = os.environ.get('AI_TUTOR_BIND', '0.0.0.0:5000')
+workers = env_int('AI_TUTOR_WORKERS', max(1, min(4, CPU_COUNT // 2)))
+# Micro-batching ishlashi uchun worker bir vaqtda bir nechta so'rovni qabul qilishi kerak
+worker_class = 'gthread'
+threads = env_int('AI_TUTOR_WORKER_THREADS', 8)
+timeout = env_int('AI_TUTOR_WORKER_TIMEOUT', 120)
+graceful_timeout = 30
+keepalive = 5
+
+# Model master jarayonda bir marta yuklanadi; worker'lar og'irliklarni copy-on-write orqali bo'lishadi
+preload_app = True
+
+TORCH_THREADS_PER_WORKER = env_int('AI_TUTOR_TORCH_THREADS_PER_WORKER', max(1, CPU_COUNT // workers))
+
+MODEL_SERVER_SOCKET = os.environ.get('AI_TUTOR_MODEL_SERVER_SOCKET', '')
+model_server_process = None
+
+
+def on_starting(server):
+    """Model server rejimi: model bitta jarayonda, barcha yadrolar uning torch thread'lariga"""
+    global model_server_process
+    if OVERRIDDEN_LOAD_MODE:
+        server.log.warning(
+            f"AI_TUTOR_MODEL_LOAD_MODE={OVERRIDDEN_LOAD_MODE} e'tiborsiz: preload rejimida model fork'dan oldin "
+            f"yuklanishi kerak, 'eager' ishlatiladi"
+        )
+    if not MODEL_SERVER_SOCKET or not env_bool('AI_TUTOR_MODEL_SERVER_SPAWN', True):
+        return
+    env = dict(
+        os.environ,
+        AI_TUTOR_TORCH_THREADS=str(env_int('AI_TUTOR_MODEL_SERVER_TORCH_THREADS', CPU_COUNT)),
+        AI_TUTOR_DEFER_WARMUP='0'
+    )
+    model_server_process = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, 'model_server.py'), '--socket', MODEL_SERVER_SOCKET],
+        env=env
+    )
+    server.log.info(f"Model server: {MODEL_SERVER_SOCKET} (pid {model_server_process.pid})")
+
+
+def on_exit(server):
+    if model_server_process and model_server_process.poll() is None:
+        model_server_process.terminate()
+        model_server_process.wait(timeout=30)
+
+
+def when_ready(server):
+    # Preload qilingan obyektlar GC tomonidan ko'rilmaydi: fork'dan keyin ularning sahifalari nusxalanmaydi
+    gc.freeze()
+    server.log.info(f"Worker'lar: {workers}, har biriga torch thread'lari: {TORCH_THREADS_PER_WORKER}")
+
+
+def post_fork(server, worker):
+    from app import ai_tutor
+    if not ai_tutor:
+        return
+
+    if ai_tutor.generator:
+        import torch
+        torch.set_num_threads(TORCH_THREADS_PER_WORKER)
+
+    # Warm-up fonda: tugaguncha /api/ready 503 qaytaradi (DEFER_WARMUP=0 da master'da bajarilgan)
+    if DEFER_WARMUP:
+        threading.Thread(target=ai_tutor.warm_up, name='warm-up', daemon=True).start()
@@ -0,0 +1,108 @@
+# backend/inference_backends.py - GPT-2 ni CPU'da tezroq ishlatish: int8 kvantlash va torch.compile
+
+import torch
+from torch import nn
+
+BACKENDS = ('eager', 'int8', 'compile', 'int8-compile')
+
+
+def convert_conv1d_to_linear(model):
+    """GPT-2 Conv1D qatlamlarini nn.Linear'ga almashtirish.
+
+    transformers'dagi Conv1D aslida og'irligi transpozitsiya qilingan Linear;
+    dinamik kvantlash esa faqat nn.Linear qatlamlarini taniydi.
+    """
+    from transformers.pytorch_utils import Conv1D
+
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if not isinstance(child, Conv1D):
+                continue
+            in_features, out_features = child.weight.shape
+            linear = nn.Linear(in_features, out_features, bias=child.bias is not None)
+            with torch.no_grad():
+                linear.weight.copy_(child.weight.t())
+                if child.bias is not None:
+                    linear.bias.copy_(child.bias)
+            setattr(parent, name, linear)
+    return model
+
+
+def quantize_int8(model):
+    """Linear qatlamlarni dinamik int8 kvantlash (faqat CPU).
+
+    Og'irliklar int8 da saqlanadi, aktivatsiyalar har bir chaqiruvda
+    kvantlanadi; embedding va LayerNorm float32 qoladi.
+    """
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            break
+
+    convert_conv1d_to_linear(model)
+    # lm_head og'irligi wte bilan umumiy: kvantlangan nusxasi alohida saqlanadi,
+    # lekin matritsa ko'paytmasining eng katta qismi aynan shu qatlamda
+    # inplace: float32 modelning to'liq nusxasi yaratilmaydi (peak RSS oshmasligi uchun)
+    model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    # safetensors og'irliklari fayldan mmap qilingan: qolgan float32 tensorlar nusxalanmasa,
+    # butun fayl xaritasi (kvantlashda o'qilgan sahifalar bilan) jarayon xotirasida qoladi
+    with torch.no_grad():
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            tensor.data = tensor.data.clone()
+    return model
+
+
+def compile_model(model):
+    """Model forward'ini torch.compile bilan kompilyatsiya qilish (o'zgaruvchan uzunliklar uchun dynamic)"""
+    model.forward = torch.compile(model.forward, dynamic=True)
+    return model
+
+
+def prepare_model(model, backend, device):
+    """Tanlangan backend bo'yicha modelni tayyorlash: (model, haqiqatda ishlatilgan backend)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Noma'lum inference backend: {backend} (mavjud: {', '.join(BACKENDS)})")
+
+    model.eval()
+    if backend == 'eager':
+        return model, backend
+
+    if backend.startswith('int8'):
+        if device.type != 'cpu':
+            print("⚠️ int8 kvantlash faqat CPU'da ishlaydi, eager rejimda davom etamiz")
+            return model, 'eager'
+        try:
+            model = quantize_int8(model)
+        except Exception as e:
+            # torch.ao.quantization.quantize_dynamic eskirgan deb belgilangan va keyingi
+            # torch versiyalarida olib tashlanadi (yoki kvantlash engine'i bo'lmasligi mumkin)
+            if not backend.endswith('compile'):
+                print(f"⚠️ int8 kvantlash ishlamadi ({e}), eager rejimda davom etamiz")
+                return model, 'eager'
+            print(f"⚠️ int8 kvantlash ishlamadi ({e}), kvantlashsiz kompilyatsiya qilamiz")
+            backend = 'compile'
+
+    if backend.endswith('compile'):
+        try:
+            model = compile_model(model)
+        except Exception as e:
+            print(f"⚠️ torch.compile ishlamadi ({e}), kompilyatsiyasiz davom etamiz")
+            return model, 'int8' if backend.startswith('int8') else 'eager'
+
+    return model, backend
+
+
+def model_nbytes(model):
+    """Model og'irliklari egallagan xotira (bayt), kvantlangan qatlamlar bilan birga"""
+    total = sum(t.numel() * t.element_size() for t in model.parameters())
+    total += sum(t.numel() * t.element_size() for t in model.buffers())
+    for module in model.modules():
+        if not isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+            continue
+        weight, bias = module._weight_bias()
+        total += weight.numel() * weight.element_size()
+        if bias is not None:
+            total += bias.numel() * bias.element_size()
+    return total
@@ -0,0 +1,136 @@
+# backend/intent_router.py - Xabar turini bitta o'tishda aniqlash: web, matematika, imkoniyatlar va boshqalar
+
+import re
+
+from kb_index import AhoCorasick
+from math_engine import MATH_EXPRESSION_PATTERN, MATH_FUNCTION_WORDS, MATH_TERMS
+from textutils import normalize_text
+
+# Yangi ma'lumot kerakligini bildiruvchi so'zlar (so'z ichida ham: "yangiliklar")
+WEB_KEYWORDS = (
+    'yangi', 'hozir', 'bugun', '2024', '2025', "so'nggi", 'eng yangi',
+    'yangiliklar', 'xabarlar', 'hodisa', 'voqea'
+)
+CAPABILITY_PHRASES = ('nima qila olasan', 'qila olasan')
+MATH_FAMILIES = ('math_expression', 'math_function', 'math_term')
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class Intent:
+    """Bitta xabar bo'yicha marshrutlash qarori.
+
+    `spans` - (oila, topilgan matn, boshi, oxiri) ro'yxati, pozitsiyalar
+    `normalized` matnida; keyingi bosqichlar matnni qayta skanerlamaydi.
+    """
+    __slots__ = ('message', 'normalized', 'spans', '_first')
+
+    def __init__(self, message, normalized, spans, first):
+        self.message = message
+        self.normalized = normalized
+        self.spans = spans
+        self._first = first
+
+    def has(self, *families):
+        return any(span[0] in families for span in self.spans)
+
+    def matches(self, family):
+        return [span for span in self.spans if span[0] == family]
+
+    def first(self, family):
+        """Oilaning ro'yxatda birinchi e'lon qilingan (topilgan) kalit so'zi yoki None"""
+        first = self._first.get(family)
+        return first[1] if first else None
+
+    @property
+    def is_math(self):
+        return self.has(*MATH_FAMILIES)
+
+    @property
+    def wants_web(self):
+        return self.has('web')
+
+    @property
+    def asks_capabilities(self):
+        return self.has('capabilities')
+
+    @property
+    def kind(self):
+        if self.is_math:
+            return 'math'
+        if self.wants_web:
+            return 'web'
+        if self.asks_capabilities:
+            return 'capabilities'
+        return 'general'
+
+
+class IntentRouter:
+    """Barcha kalit so'z oilalari uchun bitta Aho-Corasick avtomati va bitta birlashgan regex.
+
+    keywords - {oila: [ibora, ...]} (so'z ichida ham topiladi), words - faqat
+    alohida so'z sifatida, patterns - {oila: regex}. Xabar bir marta
+    normallashtiriladi; kalit so'zlar soni oshsa ham bitta o'tish.
+    """
+
+    def __init__(self, keywords=None, words=None, patterns=None):
+        self._phrases = []
+        for whole_word, groups in ((False, keywords or {}), (True, words or {})):
+            for family, phrases in groups.items():
+                for phrase in phrases:
+                    phrase = normalize_text(phrase)
+                    if phrase:
+                        self._phrases.append((family, phrase, whole_word))
+        self._automaton = AhoCorasick([phrase for _, phrase, _ in self._phrases])
+
+        self._pattern = None
+        if patterns:
+            self._pattern = re.compile('|'.join(
+                f"(?P<{family}>{pattern})" for family, pattern in patterns.items()
+            ))
+
+    def __len__(self):
+        return len(self._phrases)
+
+    def route(self, message):
+        normalized = normalize_text(message)
+        spans = []
+        first = {}
+
+        for phrase_id, start, end in self._automaton.iter_matches(normalized):
+            family, phrase, whole_word = self._phrases[phrase_id]
+            if whole_word and not self._is_whole_word(normalized, start, end):
+                continue
+            spans.append((family, phrase, start, end))
+            if family not in first or phrase_id < first[family][0]:
+                first[family] = (phrase_id, phrase)
+
+        if self._pattern is not None:
+            for match in self._pattern.finditer(normalized):
+                spans.append((match.lastgroup, match.group(), match.start(), match.end()))
+
+        spans.sort(key=lambda span: span[2])
+        return Intent(message, normalized, spans, first)
+
+    @staticmethod
+    def _is_whole_word(text, start, end):
+        if start > 0 and _is_word_char(text[start - 1]):
+            return False
+        return end == len(text) or not _is_word_char(text[end])
+
+
+def create_router(extra_keywords=None):
+    """Standart oilalar (web, matematika, imkoniyatlar) va qo'shimcha kalit so'zlar bilan router"""
+    keywords = {
+        'web': WEB_KEYWORDS,
+        'math_term': MATH_TERMS,
+        'capabilities': CAPABILITY_PHRASES,
+    }
+    keywords.update(extra_keywords or {})
+    return IntentRouter(
+        keywords,
+        words={'math_function': MATH_FUNCTION_WORDS},
+        patterns={'math_expression': MATH_EXPRESSION_PATTERN}
+    )
@@ -0,0 +1,227 @@
+# backend/kb_index.py - Bilimlar bazasi uchun oldindan qurilgan qidiruv indeksi
+
+from collections import deque
+
+from textutils import normalize_text, tokenize
+
+# Qo'shimchali so'zlar ham mos kelsin: "integralni" -> "integral", "ipak yo'lida" -> "ipak yo'li"
+MIN_STEM_LEN = 4
+# Bundan qisqa so'zlar alohida kalit so'z sifatida hisobga olinmaydi
+MIN_TOKEN_LEN = 3
+
+
+def _is_word_char(char):
+    return char.isalnum() or char in "_'"
+
+
+def _at_word_boundary(text, start, end, key_tokens):
+    """Ibora so'z boshidan boshlanishi kerak; oxirida qo'shimcha bo'lishi mumkin"""
+    if start > 0 and _is_word_char(text[start - 1]):
+        return False
+    if end < len(text) and _is_word_char(text[end]):
+        return bool(key_tokens) and len(key_tokens[-1]) >= MIN_STEM_LEN
+    return True
+
+
+def query_terms(normalized_query):
+    """(qidiriladigan so'zlar, hisoblanadigan so'zlar): so'rov so'zlari va ularning o'zaklari.
+
+    Kalit so'z ikkinchi to'plamda bo'lsa, u _TokenTrie.matches qoidasi bo'yicha mos keladi;
+    qisqa so'zlar faqat iboralar uchun qidiriladi.
+    """
+    lookup, counted = set(), set()
+    for word in set(tokenize(normalized_query)):
+        lookup.add(word)
+        if len(word) >= MIN_TOKEN_LEN:
+            counted.add(word)
+        stems = {word[:length] for length in range(MIN_STEM_LEN, len(word))}
+        lookup |= stems
+        counted |= stems
+    return lookup, counted
+
+
+def rank_candidates(normalized_query, candidates):
+    """Nomzodlar ichidan KnowledgeIndex.match qoidalari bo'yicha eng mosining raqami yoki None.
+
+    candidates - [(raqam, normallashtirilgan kalit, mos kelgan kalit so'zlar soni)], masalan
+    SQLite teskari indeksidan (query_terms bilan). Aniq moslik bu yerda tekshirilmaydi;
+    kalitlar faqat kerak bo'lganda (ibora topilsa yoki eng ko'p moslikda) tokenlarga ajratiladi.
+    """
+    text = normalized_query
+    best_rank, best_id = None, None
+    for key_id, key, _ in candidates:
+        start = text.find(key) if key else -1
+        tokens = None
+        while start != -1:
+            end = start + len(key)
+            if tokens is None:
+                tokens = tokenize(key)
+            if _at_word_boundary(text, start, end, tokens):
+                rank = (len(tokens), end - start, -start, -key_id)
+                if best_rank is None or rank > best_rank:
+                    best_rank, best_id = rank, key_id
+            start = text.find(key, start + 1)
+    if best_id is not None:
+        return best_id
+
+    top = max((matched for _, _, matched in candidates), default=0)
+    if not top:
+        return None
+    for key_id, key, matched in candidates:
+        if matched != top:
+            continue
+        rank = (matched / len(set(tokenize(key))), -key_id)
+        if best_rank is None or rank > best_rank:
+            best_rank, best_id = rank, key_id
+    return best_id
+
+
+class AhoCorasick:
+    """Bir nechta iborani matndan bitta o'tishda topuvchi avtomat"""
+
+    def __init__(self, phrases):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for phrase_id, phrase in enumerate(phrases):
+            node = 0
+            for char in phrase:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = next_node
+            self._out[node].append((phrase_id, len(phrase)))
+
+        # Fail havolalari (BFS)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def iter_matches(self, text):
+        """(ibora raqami, boshi, oxiri) ko'rinishidagi barcha mosliklar"""
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for phrase_id, length in self._out[node]:
+                yield phrase_id, index + 1 - length, index + 1
+
+
+class _TokenTrie:
+    """Kalit so'zlar trie'si: so'zning o'zi yoki uning o'zagi (qo'shimchasiz) bo'yicha topish"""
+
+    _END = None
+
+    def __init__(self):
+        self._root = {}
+
+    def add(self, token):
+        node = self._root
+        for char in token:
+            node = node.setdefault(char, {})
+        node[self._END] = token
+
+    def matches(self, word):
+        """`word`ga teng yoki uning boshlanishi bo'lgan (yetarlicha uzun) kalit so'zlar"""
+        found = []
+        node = self._root
+        for index, char in enumerate(word):
+            node = node.get(char)
+            if node is None:
+                break
+            token = node.get(self._END)
+            if token is not None and (index + 1 == len(word) or len(token) >= MIN_STEM_LEN):
+                found.append(token)
+        return found
+
+
+class KnowledgeIndex:
+    """Bilimlar bazasi kalitlari bo'yicha indeks (bir marta quriladi).
+
+    Tartiblash: aniq moslik > to'liq ibora (ko'proq so'zli, uzunroq) >
+    ko'proq kalit so'z mos kelgan yozuv > kalitning kattaroq qismi mos kelgan
+    yozuv > bazadagi tartib.
+    """
+
+    def __init__(self, knowledge_base):
+        self.keys = list(knowledge_base.keys())
+        self.values = list(knowledge_base.values())
+
+        normalized = [normalize_text(key) for key in self.keys]
+        self._exact = {}
+        for key_id, key in enumerate(normalized):
+            self._exact.setdefault(key, key_id)
+
+        self._key_tokens = [tokenize(key) for key in normalized]
+        self._phrases = AhoCorasick(normalized)
+
+        # Teskari indeks: kalit so'z -> yozuvlar
+        self._postings = {}
+        self._trie = _TokenTrie()
+        for key_id, tokens in enumerate(self._key_tokens):
+            for token in set(tokens):
+                if len(token) < MIN_TOKEN_LEN:
+                    continue
+                if token not in self._postings:
+                    self._postings[token] = []
+                    self._trie.add(token)
+                self._postings[token].append(key_id)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, query):
+        """Eng mos yozuvning qiymati yoki None"""
+        key_id = self.match(normalize_text(query))
+        return self.values[key_id] if key_id is not None else None
+
+    def match(self, normalized_query):
+        """Eng mos yozuv raqami yoki None (so'rov oldindan normallashtirilgan)"""
+        exact = self._exact.get(normalized_query)
+        if exact is not None:
+            return exact
+
+        key_id = self._match_phrase(normalized_query)
+        if key_id is not None:
+            return key_id
+
+        return self._match_tokens(normalized_query)
+
+    def _match_phrase(self, text):
+        best_rank, best_id = None, None
+        for key_id, start, end in self._phrases.iter_matches(text):
+            if not _at_word_boundary(text, start, end, self._key_tokens[key_id]):
+                continue
+            rank = (len(self._key_tokens[key_id]), end - start, -start, -key_id)
+            if best_rank is None or rank > best_rank:
+                best_rank, best_id = rank, key_id
+        return best_id
+
+    def _match_tokens(self, text):
+        matched = {}
+        for word in set(tokenize(text)):
+            for token in self._trie.matches(word):
+                for key_id in self._postings[token]:
+                    matched.setdefault(key_id, set()).add(token)
+
+        if not matched:
+            return None
+
+        return max(matched, key=lambda key_id: (
+            len(matched[key_id]),
+            len(matched[key_id]) / len(set(self._key_tokens[key_id])),
+            -key_id
+        ))
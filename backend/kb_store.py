@@ -0,0 +1,279 @@
+# backend/kb_store.py - Bilimlar bazasi saqlagichlari (JSON xotirada yoki SQLite fayl)
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from kb_index import KnowledgeIndex, query_terms, rank_candidates
+from structured_log import get_logger
+from textutils import normalize_text, tokenize
+
+log = get_logger('kb_store')
+
+
+def load_json_knowledge(path):
+    """JSON fayldan {kalit: javob} lug'atini o'qish"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"Bilimlar bazasi lug'at ko'rinishida bo'lishi kerak: {path}")
+    return {str(key): str(value) for key, value in data.items()}
+
+
+class KnowledgeStore:
+    """Bilimlar bazasi saqlagichi uchun umumiy interfeys.
+
+    Fayl o'zgarsa, `search` chaqiruvlari orasida (har `reload_interval_s`
+    soniyada bir marta tekshirib) ma'lumotlar qayta yuklanadi.
+    """
+
+    backend = None
+
+    def __init__(self, path, reload_interval_s=2.0):
+        self.path = path
+        self.reload_interval_s = reload_interval_s
+        self.version = 0
+        self.loaded_at = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self._signature = None
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+
+    def search(self, query):
+        """So'rovga eng mos javob yoki None"""
+        return self.search_normalized(normalize_text(query))
+
+    def search_normalized(self, normalized_query):
+        """search() - so'rov oldindan normallashtirilgan (masalan, intent_router'da)"""
+        self.maybe_reload()
+        return self._search(normalized_query)
+
+    def items(self):
+        """Barcha (kalit, javob) juftliklari"""
+        raise NotImplementedError
+
+    def _search(self, normalized_query):
+        raise NotImplementedError
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def reload(self):
+        """Ma'lumotlarni fayldan qayta yuklash (xatolikda eskisi qoladi)"""
+        with self._reload_lock:
+            try:
+                signature = self._file_signature()
+                self._load()
+            except Exception as e:
+                self.reload_errors += 1
+                log.warning('kb_reload_failed', extra={'backend': self.backend, 'path': self.path, 'error': str(e)})
+                return False
+            self._signature = signature
+            self.version += 1
+            self.reloads += 1
+            self.loaded_at = time.time()
+            log.info('kb_reloaded', extra={'backend': self.backend, 'version': self.version, 'entries': len(self)})
+            return True
+
+    def maybe_reload(self):
+        """Fayl o'zgargan bo'lsa, qayta yuklash (tekshirish tez-tez qilinmaydi)"""
+        if self.reload_interval_s <= 0:
+            return False
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval_s
+        try:
+            changed = self._file_signature() != self._signature
+        except OSError:
+            return False
+        if changed:
+            log.info('kb_file_changed', extra={'backend': self.backend, 'path': self.path})
+            return self.reload()
+        return False
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'path': self.path,
+            'entries': len(self),
+            'version': self.version,
+            'reloads': self.reloads,
+            'reload_errors': self.reload_errors,
+            'loaded_at': self.loaded_at,
+        }
+
+
+class MemoryKnowledgeStore(KnowledgeStore):
+    """JSON fayl har bir jarayon xotirasiga indeks bilan yuklanadi (kichik bazalar uchun)"""
+
+    backend = 'memory'
+
+    def __init__(self, path, reload_interval_s=2.0):
+        super().__init__(path, reload_interval_s)
+        self._index = KnowledgeIndex({})
+        if not self.reload():
+            raise RuntimeError(f"Bilimlar bazasi yuklanmadi: {path}")
+
+    def _load(self):
+        # Yangi indeks to'liq qurilgandan keyin bitta havola almashtiriladi
+        self._index = KnowledgeIndex(load_json_knowledge(self.path))
+
+    def _search(self, normalized_query):
+        index = self._index
+        key_id = index.match(normalized_query)
+        return index.values[key_id] if key_id is not None else None
+
+    def items(self):
+        index = self._index
+        return list(zip(index.keys, index.values))
+
+    def __len__(self):
+        return len(self._index)
+
+
+class SQLiteKnowledgeStore(KnowledgeStore):
+    """Diskdagi SQLite fayl: bir nechta jarayon bitta faylni mmap orqali o'qiydi.
+
+    Har bir jarayon butun bazani xotirada saqlamaydi; so'rovdagi so'zlar
+    bo'yicha nomzod yozuvlar teskari indeks jadvalidan olinadi va ular
+    xotiradagi indeks qoidalari bilan (rank_candidates) tartiblanadi.
+    """
+
+    backend = 'sqlite'
+    MMAP_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, path, reload_interval_s=2.0):
+        super().__init__(path, reload_interval_s)
+        self._local = threading.local()
+        self._count = 0
+        if not self.reload():
+            raise RuntimeError(f"Bilimlar bazasi yuklanmadi: {path}")
+
+    def _load(self):
+        # Yangi ulanish ochib tekshirish; thread'lar keyingi so'rovda qayta ulanadi
+        connection = self._connect()
+        try:
+            self._count = connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        finally:
+            connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        connection.execute(f'PRAGMA mmap_size = {self.MMAP_SIZE}')
+        connection.execute('PRAGMA query_only = 1')
+        return connection
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'version', None) != self.version:
+            if getattr(local, 'connection', None) is not None:
+                local.connection.close()
+            local.connection = self._connect()
+            local.version = self.version
+        return local.connection
+
+    def _search(self, normalized_query):
+        connection = self._connection()
+
+        row = connection.execute(
+            'SELECT value FROM entries WHERE norm_key = ?', (normalized_query,)
+        ).fetchone()
+        if row:
+            return row[0]
+
+        # So'z yoki uning o'zagi (qo'shimchasiz boshlanishi) bo'yicha nomzodlar;
+        # har yozuvning mos kelgan kalit so'zlari soni SQLite'da sanaladi
+        lookup, counted = query_terms(normalized_query)
+        if not lookup:
+            return None
+
+        rows = connection.execute(
+            f"SELECT e.id, e.norm_key, SUM(t.token IN ({','.join('?' * len(counted))})) "
+            f"FROM tokens t JOIN entries e ON e.id = t.entry_id "
+            f"WHERE t.token IN ({','.join('?' * len(lookup))}) GROUP BY e.id",
+            tuple(counted) + tuple(lookup)
+        ).fetchall()
+
+        # Nomzodlarni xotiradagi indeks bilan bir xil qoidalar bo'yicha tartiblash (id - bazadagi tartib)
+        entry_id = rank_candidates(normalized_query, rows)
+        if entry_id is None:
+            return None
+        return connection.execute('SELECT value FROM entries WHERE id = ?', (entry_id,)).fetchone()[0]
+
+    def items(self):
+        return self._connection().execute('SELECT key, value FROM entries ORDER BY id').fetchall()
+
+    def __len__(self):
+        return self._count
+
+
+def build_sqlite_store(knowledge, db_path):
+    """{kalit: javob} lug'atidan SQLite faylini yaratish (atomar almashtirish bilan)"""
+    tmp_path = f"{db_path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.executescript('''
+            CREATE TABLE entries (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL,
+                norm_key TEXT NOT NULL UNIQUE,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE tokens (
+                token TEXT NOT NULL,
+                entry_id INTEGER NOT NULL REFERENCES entries(id)
+            );
+        ''')
+        for key, value in knowledge.items():
+            norm_key = normalize_text(key)
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO entries (key, norm_key, value) VALUES (?, ?, ?)',
+                (key, norm_key, value)
+            )
+            if cursor.rowcount:
+                connection.executemany(
+                    'INSERT INTO tokens (token, entry_id) VALUES (?, ?)',
+                    [(token, cursor.lastrowid) for token in set(tokenize(norm_key))]
+                )
+        connection.execute('CREATE INDEX tokens_token ON tokens (token)')
+        connection.commit()
+    finally:
+        connection.close()
+
+    # O'qiyotgan jarayonlar eski faylni oxirigacha o'qiydi, keyin yangisiga o'tadi
+    os.replace(tmp_path, db_path)
+
+
+def create_store(backend, json_path, db_path, reload_interval_s=2.0):
+    """Sozlamaga ko'ra saqlagich yaratish"""
+    if backend == 'sqlite':
+        if not os.path.exists(db_path):
+            print(f"📦 SQLite bilimlar bazasi yaratilmoqda: {db_path}")
+            build_sqlite_store(load_json_knowledge(json_path), db_path)
+        return SQLiteKnowledgeStore(db_path, reload_interval_s)
+    return MemoryKnowledgeStore(json_path, reload_interval_s)
+
+
+if __name__ == '__main__':
+    # Foydalanish: python kb_store.py build data/knowledge_base.json data/knowledge_base.db
+    if len(sys.argv) != 4 or sys.argv[1] != 'build':
+        print("Foydalanish: python kb_store.py build <knowledge.json> <knowledge.db>")
+        sys.exit(1)
+    knowledge = load_json_knowledge(sys.argv[2])
+    build_sqlite_store(knowledge, sys.argv[3])
+    print(f"✅ {len(knowledge)} ta yozuv saqlandi: {sys.argv[3]}")
@@ -0,0 +1,185 @@
+# backend/kv_cache.py - Token prefiksi bo'yicha past_key_values keshi
+
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+
+
+def prefix_key(token_ids):
+    """Token ID'lar ketma-ketligining qisqa hash'i"""
+    return hashlib.blake2b(array('I', token_ids).tobytes(), digest_size=16).hexdigest()
+
+
+def to_legacy(past_key_values):
+    """Har qanday kesh ko'rinishini ((key, value), ...) tuple'ga aylantirish"""
+    if past_key_values is None:
+        return None
+    if isinstance(past_key_values, tuple):
+        return past_key_values
+    if hasattr(past_key_values, 'to_legacy_cache'):
+        return past_key_values.to_legacy_cache()
+    # Yangi transformers: kesh qatlamlar ro'yxati sifatida saqlanadi
+    return tuple((layer.keys, layer.values) for layer in past_key_values.layers)
+
+
+def to_model_cache(legacy):
+    """Saqlangan tuple'dan generate uchun yangi kesh obyekti yaratish.
+
+    Tensorlar nusxalanmaydi: DynamicCache yangi tokenlarni torch.cat bilan
+    qo'shadi, shuning uchun keshdagi asl tensorlar o'zgarmaydi.
+    """
+    if legacy is None:
+        return legacy
+    # transformers faqat model yuklangandan keyin kerak bo'ladi
+    try:
+        from transformers import DynamicCache
+    except ImportError:  # juda eski transformers versiyasi
+        return legacy
+    if hasattr(DynamicCache, 'from_legacy_cache'):
+        return DynamicCache.from_legacy_cache(legacy)
+    return DynamicCache(legacy)
+
+
+def crop_legacy(legacy, length):
+    """Keshni birinchi `length` token bilan cheklash"""
+    return tuple((k[:, :, :length, :], v[:, :, :length, :]) for k, v in legacy)
+
+
+def legacy_nbytes(legacy):
+    """Kesh egallagan xotira (bayt)"""
+    return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in legacy)
+
+
+class _KVEntry:
+    __slots__ = ('length', 'past', 'nbytes', 'user_id')
+
+    def __init__(self, length, past, nbytes, user_id):
+        self.length = length
+        self.past = past
+        self.nbytes = nbytes
+        self.user_id = user_id
+
+
+class PrefixKVCache:
+    """Umumiy prompt qismi va foydalanuvchi suhbati uchun KV kesh (LRU, xotira bo'yicha chegaralangan).
+
+    Yozuvlar token prefiksining hash'i bo'yicha saqlanadi. Qidirishda
+    ma'lum prefiks uzunliklari (umumiy shablon va foydalanuvchining oxirgi
+    yozuvi) uchun hash hisoblanib, eng uzun mos keladigani tanlanadi.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._shared = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+
+        # Metrikalar
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokens_saved = 0
+        self.prefill_tokens = 0
+        self.prefill_s = 0.0
+
+    def put_shared(self, token_ids, past):
+        """Barcha so'rovlar uchun umumiy prefiks (masalan, "Question:" shabloni); LRU'dan chiqarilmaydi"""
+        legacy = crop_legacy(to_legacy(past), len(token_ids))
+        entry = _KVEntry(len(token_ids), legacy, legacy_nbytes(legacy), None)
+        key = prefix_key(token_ids)
+        with self._lock:
+            old = self._shared.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.nbytes
+            self._shared[key] = entry
+            self.total_bytes += entry.nbytes
+
+    def put_user(self, user_id, token_ids, past):
+        """Foydalanuvchining oxirgi suhbat konteksti uchun kesh (oldingisini almashtiradi)"""
+        legacy = crop_legacy(to_legacy(past), len(token_ids))
+        entry = _KVEntry(len(token_ids), legacy, legacy_nbytes(legacy), user_id)
+        if entry.nbytes > self.max_bytes:
+            return
+        key = prefix_key(token_ids)
+
+        with self._lock:
+            old_key = self._user_keys.pop(user_id, None)
+            if old_key is not None:
+                self._remove(old_key)
+            self._remove(key)
+            self._entries[key] = entry
+            self._user_keys[user_id] = key
+            self.total_bytes += entry.nbytes
+
+            # LRU: xotira chegarasidan oshsa, eng eski yozuvlarni o'chirish
+            while self.total_bytes > self.max_bytes and self._entries:
+                old_key = next(iter(self._entries))
+                self._remove(old_key)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.total_bytes -= entry.nbytes
+        if self._user_keys.get(entry.user_id) == key:
+            del self._user_keys[entry.user_id]
+
+    def lookup(self, token_ids, user_id=None):
+        """Eng uzun keshlangan prefiksni topish: (prefiks uzunligi, kesh) yoki (0, None).
+
+        Kamida bitta token keshdan tashqarida qoladi, chunki generate'ga
+        hech bo'lmasa bitta yangi token kerak.
+        """
+        with self._lock:
+            lengths = {entry.length for entry in self._shared.values()}
+            user_key = self._user_keys.get(user_id) if user_id is not None else None
+            if user_key is not None:
+                lengths.add(self._entries[user_key].length)
+
+            for length in sorted(lengths, reverse=True):
+                if length >= len(token_ids):
+                    continue
+                key = prefix_key(token_ids[:length])
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                else:
+                    entry = self._shared.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    self.tokens_saved += length
+                    return length, entry.past
+
+            self.misses += 1
+            return 0, None
+
+    def record_prefill(self, num_tokens, elapsed_s):
+        """Haqiqiy prefill vaqtini qayd etish (tejangan vaqtni baholash uchun)"""
+        if num_tokens <= 0:
+            return
+        with self._lock:
+            self.prefill_tokens += num_tokens
+            self.prefill_s += elapsed_s
+
+    def stats(self):
+        """Kesh samaradorligi: hit rate va tejangan prefill vaqti"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            per_token_s = self.prefill_s / self.prefill_tokens if self.prefill_tokens else 0.0
+            return {
+                'entries': len(self._entries) + len(self._shared),
+                'user_entries': len(self._user_keys),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'prefill_tokens_saved': self.tokens_saved,
+                'prefill_ms_per_token': round(per_token_s * 1000.0, 4),
+                'prefill_ms_saved': round(self.tokens_saved * per_token_s * 1000.0, 3),
+            }
@@ -0,0 +1,351 @@
+# backend/math_engine.py - Xavfsiz matematik ifodalar: tokenizer, parser (AST) va hisoblagich
+
+import math
+import re
+from functools import lru_cache
+
+# Chegaralar: juda katta yoki juda murakkab ifodalar hisoblanmaydi
+MAX_TOKENS = 64
+MAX_STEPS = 256
+MAX_NUMBER_DIGITS = 15
+MAX_ABS_VALUE = 1e15
+MAX_EXPONENT = 64
+
+# Matematika belgilari: ifoda ko'rinishi, funksiyalar (alohida so'z) va terminlar (so'z ichida ham).
+# intent_router.py ularni boshqa kalit so'zlar bilan bitta o'tishda qidiradi
+MATH_EXPRESSION_PATTERN = (
+    r"\d+\s*(?:\*\*|[-+*/^×÷x])\s*\d+"            # 2+2, 5*3, 2^10, 12 x 3
+    r"|(?<![a-z])x\s*[-+*/=]\s*\d+"               # x+5=10, 2x+3=11
+)
+MATH_FUNCTION_WORDS = ('sin', 'cos', 'tan', 'tg', 'log', 'ln', 'sqrt')
+MATH_TERMS = ('integral', 'differensial', 'limit', 'tenglama', 'funksiya', 'grafik')
+
+# Xabar matematika masalasiga o'xshaydimi (bitta oldindan kompilyatsiya qilingan regex)
+MATH_PROBLEM_RE = re.compile(
+    MATH_EXPRESSION_PATTERN
+    + r"|\b(?:" + '|'.join(MATH_FUNCTION_WORDS) + r")\b"
+    + '|' + '|'.join(MATH_TERMS)
+)
+
+# Bitta o'tishda barcha tokenlar: son, so'z, operator, qolgan belgilar
+_TOKEN_RE = re.compile(
+    r"(?P<number>\d+(?:[.,]\d+)?)"
+    r"|(?P<word>[a-zπ]+)"
+    r"|(?P<op>\*\*|[-+*/^()=×÷·°√])"
+    r"|(?P<space>\s+)"
+    r"|(?P<other>.)"
+)
+
+FUNCTIONS = {
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'tg': math.tan,
+    'log': math.log10,
+    'lg': math.log10,
+    'ln': math.log,
+    'sqrt': math.sqrt,
+    'ildiz': math.sqrt,
+    '√': math.sqrt,
+}
+CONSTANTS = {'pi': math.pi, 'π': math.pi, 'e': math.e}
+
+# Operatorlarning yagona ko'rinishi
+_OPERATOR_ALIASES = {'**': '^', '×': '*', '·': '*', '÷': '/'}
+
+# (chap, o'ng) bog'lanish kuchi: daraja o'ngdan chapga bog'lanadi
+_BINARY_POWER = {'+': (10, 11), '-': (10, 11), '*': (20, 21), '/': (20, 21), '^': (31, 30)}
+_UNARY_POWER = 25
+
+
+NO_EXPRESSION = "Ifoda topilmadi"
+
+
+class MathError(ValueError):
+    """Ifodani tahlil qilish yoki hisoblash mumkin emas"""
+
+
+def tokenize(text):
+    """Matndagi eng uzun matematik bo'lak tokenlari: ((tur, qiymat), ...)
+
+    Oddiy so'zlar ("nechaga", "teng") va tinish belgilari ifodani
+    bo'laklarga ajratadi; tokenlar bitta regex o'tishida olinadi.
+    """
+    runs = [[]]
+    for match in _TOKEN_RE.finditer(text.lower()):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'space':
+            continue
+        if kind == 'number':
+            runs[-1].append(('num', value.replace(',', '.')))
+        elif kind == 'op':
+            runs[-1].append(('op', _OPERATOR_ALIASES.get(value, value)))
+        elif kind == 'word' and (value in FUNCTIONS or value in CONSTANTS or value == 'x'):
+            runs[-1].append(('name', value))
+        elif runs[-1]:
+            runs.append([])
+
+    # Kamida bitta operand va amal bo'lgan eng uzun bo'lak ("2+3=" oxiridagi amallarsiz)
+    best = []
+    for run in runs:
+        while run and run[-1][0] == 'op' and run[-1][1] not in ')°':
+            run.pop()
+        if len(run) > len(best) and _looks_like_expression(run):
+            best = run
+    if len(best) > MAX_TOKENS:
+        raise MathError("Ifoda juda uzun")
+    return tuple(best)
+
+
+def _looks_like_expression(run):
+    has_operand = any(kind == 'num' or (kind == 'name' and value in CONSTANTS) for kind, value in run)
+    has_operation = any(
+        (kind == 'op' and value not in '()') or (kind == 'name' and value != 'e' and value not in ('pi', 'π'))
+        for kind, value in run
+    )
+    return has_operand and has_operation
+
+
+class _Parser:
+    """Pratt parser: tokenlar -> AST (ichma-ich tuple'lar)"""
+
+    def __init__(self, tokens, variable):
+        self.tokens = tokens
+        self.pos = 0
+        self.variable = variable
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def advance(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, value):
+        if self.advance() != ('op', value):
+            raise MathError(f"'{value}' kutilgan edi")
+
+    def parse(self):
+        node = self.expression(0)
+        if self.pos != len(self.tokens):
+            raise MathError("Ifodani oxirigacha tahlil qilib bo'lmadi")
+        return node
+
+    def expression(self, min_power):
+        left = self.prefix()
+        while True:
+            kind, value = self.peek()
+            if kind == 'op' and value in _BINARY_POWER:
+                left_power, right_power = _BINARY_POWER[value]
+                if left_power < min_power:
+                    break
+                self.advance()
+                left = ('bin', value, left, self.expression(right_power))
+            elif kind == 'op' and value == '°':
+                self.advance()
+                left = ('deg', left)
+            elif self._starts_operand(kind, value):
+                # Yashirin ko'paytirish: 2x, 2(3+4), 3sin(x)
+                if _BINARY_POWER['*'][0] < min_power:
+                    break
+                left = ('bin', '*', left, self.expression(_BINARY_POWER['*'][1]))
+            else:
+                break
+        return left
+
+    def _starts_operand(self, kind, value):
+        # Ikki son ketma-ket kelsa ("5 3"), ko'paytma deb hisoblanmaydi
+        return kind == 'name' or (kind == 'op' and value in ('(', '√'))
+
+    def prefix(self):
+        kind, value = self.advance()
+        if kind == 'num':
+            if len(value.replace('.', '')) > MAX_NUMBER_DIGITS:
+                raise MathError("Son juda katta")
+            return ('num', float(value) if '.' in value else int(value))
+        if kind == 'name':
+            if value == 'x':
+                if self.variable:
+                    return ('var',)
+                raise MathError("Noma'lum x faqat tenglamada bo'lishi mumkin")
+            if value in CONSTANTS:
+                return ('num', CONSTANTS[value])
+            return ('call', value, self._argument())
+        if kind == 'op':
+            if value == '(':
+                node = self.expression(0)
+                self.expect(')')
+                return node
+            if value == '√':
+                return ('call', value, self._argument())
+            if value in ('-', '+'):
+                operand = self.expression(_UNARY_POWER)
+                return ('neg', operand) if value == '-' else operand
+        raise MathError("Ifoda noto'g'ri yozilgan")
+
+    def _argument(self):
+        kind, value = self.peek()
+        if (kind, value) == ('op', '('):
+            self.advance()
+            node = self.expression(0)
+            self.expect(')')
+            return node
+        # Qavssiz argument: sin 30°, sqrt 16
+        return self.expression(_UNARY_POWER)
+
+
+@lru_cache(maxsize=4096)
+def parse(tokens):
+    """Tokenlardan AST: ('expr', ast, tokens) yoki ('equation', chap, o'ng, tokens); natija keshlanadi"""
+    if not tokens:
+        raise MathError(NO_EXPRESSION)
+
+    equals = sum(token == ('op', '=') for token in tokens)
+    if not equals:
+        # Tenglama bo'lmasa, ikki son orasidagi x ko'paytirish belgisi: 3 x 4
+        tokens = tuple(
+            ('op', '*') if token == ('name', 'x') and 0 < i < len(tokens) - 1
+            and tokens[i - 1][0] == 'num' and tokens[i + 1][0] == 'num' else token
+            for i, token in enumerate(tokens)
+        )
+        return ('expr', _Parser(tokens, variable=False).parse(), tokens)
+
+    if equals != 1:
+        raise MathError("Tenglamada bitta '=' bo'lishi kerak")
+    split = tokens.index(('op', '='))
+    left = _Parser(tokens[:split], variable=True).parse()
+    right = _Parser(tokens[split + 1:], variable=True).parse()
+    return ('equation', left, right, tokens)
+
+
+class _Evaluator:
+    """AST'ni hisoblash: har bir tugun x ga nisbatan chiziqli shakl (a, b) = a*x + b"""
+
+    def __init__(self):
+        self.steps = 0
+
+    def check(self, value):
+        if isinstance(value, complex) or math.isnan(value) or abs(value) > MAX_ABS_VALUE:
+            raise MathError("Natija ruxsat etilgan chegaradan tashqarida")
+        return value
+
+    def eval(self, node):
+        self.steps += 1
+        if self.steps > MAX_STEPS:
+            raise MathError("Ifoda juda murakkab")
+
+        kind = node[0]
+        if kind == 'num':
+            return 0, self.check(node[1])
+        if kind == 'var':
+            return 1, 0
+        if kind == 'neg':
+            a, b = self.eval(node[1])
+            return -a, -b
+        if kind == 'deg':
+            return 0, math.radians(self.constant(node[1]))
+        if kind == 'call':
+            argument = self.constant(node[2])
+            try:
+                return 0, self.check(FUNCTIONS[node[1]](argument))
+            except (ValueError, OverflowError):
+                raise MathError(f"{node[1]}({format_number(argument)}) aniqlanmagan")
+        return self.binary(node[1], self.eval(node[2]), self.eval(node[3]))
+
+    def constant(self, node):
+        a, b = self.eval(node)
+        if a:
+            raise MathError("Funksiya argumentida x bo'lishi mumkin emas")
+        return b
+
+    def binary(self, op, left, right):
+        (a1, b1), (a2, b2) = left, right
+        if op == '+':
+            return a1 + a2, self.check(b1 + b2)
+        if op == '-':
+            return a1 - a2, self.check(b1 - b2)
+        if op == '*':
+            if a1 and a2:
+                raise MathError("Faqat chiziqli tenglamalar yechiladi")
+            return self.check(a1 * b2 + a2 * b1), self.check(b1 * b2)
+        if op == '/':
+            if a2:
+                raise MathError("Faqat chiziqli tenglamalar yechiladi")
+            if b2 == 0:
+                raise MathError("Nolga bo'lish mumkin emas")
+            if a1 == 0 and isinstance(b1, int) and isinstance(b2, int) and b1 % b2 == 0:
+                return 0, b1 // b2
+            return a1 / b2, self.check(b1 / b2)
+        # op == '^'
+        if a1 or a2:
+            raise MathError("Faqat chiziqli tenglamalar yechiladi")
+        if abs(b2) > MAX_EXPONENT:
+            raise MathError("Daraja ko'rsatkichi juda katta")
+        if b1 == 0 and b2 < 0:
+            raise MathError("Nolga bo'lish mumkin emas")
+        try:
+            return 0, self.check(b1 ** b2)
+        except OverflowError:
+            raise MathError("Natija ruxsat etilgan chegaradan tashqarida")
+
+
+def format_number(value):
+    """Butun sonlar .0 siz, kasrlar 10 ta muhim raqam bilan"""
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return format(value, '.10g')
+    return str(value)
+
+
+def render(tokens):
+    """Tokenlardan o'qiladigan ifoda matni: 2 + 3 × 4"""
+    parts = []
+    previous = None
+    for kind, value in tokens:
+        unary = previous is None or (previous[0] == 'op' and previous[1] not in ')°')
+        if kind == 'op' and value in '+-*/=' and not unary:
+            parts.append(' × ' if value == '*' else f' {value} ')
+        elif previous and previous[0] == 'name' and previous[1] in FUNCTIONS and value != '(':
+            parts.append(f' {value}')
+        else:
+            parts.append(value)
+        previous = (kind, value)
+    return ''.join(parts)
+
+
+def solve(text):
+    """Matndagi ifodani hisoblash yoki chiziqli tenglamani yechish: (tur, ifoda matni, javob matni)"""
+    tree = parse(tokenize(text))
+    tokens = tree[-1]
+    evaluator = _Evaluator()
+
+    if tree[0] == 'expr':
+        a, b = evaluator.eval(tree[1])
+        return 'expr', render(tokens), format_number(b)
+
+    a1, b1 = evaluator.eval(tree[1])
+    a2, b2 = evaluator.eval(tree[2])
+    # a1*x + b1 = a2*x + b2  =>  x = (b2 - b1) / (a1 - a2)
+    a, b = a1 - a2, b2 - b1
+    if a == 0:
+        return 'equation', render(tokens), "har qanday x" if b == 0 else "yechim yo'q"
+    if isinstance(a, int) and isinstance(b, int) and b % a == 0:
+        x = b // a
+    else:
+        x = evaluator.check(b / a)
+    return 'equation', render(tokens), f"x = {format_number(x)}"
+
+
+def is_math_problem(text):
+    """Matematika masalasi ekanligini aniqlash"""
+    return MATH_PROBLEM_RE.search(text.lower()) is not None
+
+
+def format_answer(kind, expression, answer):
+    """Foydalanuvchiga ko'rsatiladigan javob: 'Javob: 2 + 3 = 5' yoki 'Javob: x + 5 = 10 ⇒ x = 5'"""
+    if kind == 'equation':
+        return f"Javob: {expression} ⇒ {answer}"
+    return f"Javob: {expression} = {answer}"
@@ -0,0 +1,222 @@
+# backend/metrics.py - So'rov bosqichlari vaqtlari, yo'l hisoblagichlari va Prometheus formatidagi eksport
+#
+# Metrikalar har bir jarayonda alohida yig'iladi (gunicorn'da /api/metrics
+# so'rovni qabul qilgan worker'ning qiymatlarini qaytaradi, `worker` yorlig'i bilan).
+
+import contextvars
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Joriy so'rovning bosqichlar trace'i: thread'lar va asyncio task'lari uchun alohida
+_trace = contextvars.ContextVar('ai_tutor_trace', default=None)
+# Joriy so'rovga javob bergan yo'l (kb, math, ai, ...)
+_route = contextvars.ContextVar('ai_tutor_route', default=None)
+
+
+class LatencySummary:
+    """Oxirgi N ta o'lchov (halqa bufer) bo'yicha p50/p95/p99, hamda umumiy soni va yig'indisi"""
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._samples = array('d', bytes(8 * window))
+        self._next = 0
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self._samples[self._next] = value
+        self._next = (self._next + 1) % self.window
+        self.count += 1
+        self.total += value
+
+    def quantiles(self, quantiles=QUANTILES):
+        filled = min(self.count, self.window)
+        if not filled:
+            return {q: 0.0 for q in quantiles}
+        ordered = sorted(self._samples[:filled])
+        return {q: ordered[min(int(q * filled), filled - 1)] for q in quantiles}
+
+
+class _GenerationTimer:
+    """generate() ichidagi prefill va decode vaqtini ajratish uchun LogitsProcessor.
+
+    Birinchi chaqiruv prompt to'liq hisoblangandan keyin keladi; har bir
+    keyingi chaqiruv - bitta yangi token.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_at = None
+        self.steps = 0
+
+    def __call__(self, input_ids, scores):
+        if self.first_at is None:
+            self.first_at = time.perf_counter()
+        self.steps += 1
+        return scores
+
+
+class Metrics:
+    """Bosqichlar kechikishi, yo'llar, tokenlar va bajarilayotgan so'rovlar"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.routes = {}
+        self.requests = {}
+        self.errors = {}
+        self.in_flight = {}
+        self.generated_tokens = 0
+        self.decode_seconds = 0.0
+        self.started_at = time.time()
+
+    # --- So'rov bosqichlari ---
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            summary = self.stages.get(stage)
+            if summary is None:
+                summary = self.stages[stage] = LatencySummary()
+            summary.observe(seconds)
+        trace = _trace.get()
+        if trace is not None:
+            trace[stage] = trace.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        """Bosqich vaqtini o'lchash (joriy so'rov trace'iga ham yoziladi)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    @contextmanager
+    def request(self, endpoint):
+        """Bitta so'rov: bajarilayotganlar soni, umumiy vaqt va bosqichlar trace'i (ms)"""
+        trace = {}
+        _trace.set(trace)
+        _route.set(None)
+        with self._lock:
+            self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) + 1
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        started = time.perf_counter()
+        try:
+            yield trace
+        except Exception:
+            with self._lock:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            raise
+        finally:
+            _trace.set(None)
+            self.observe(f'request:{endpoint}', time.perf_counter() - started)
+            with self._lock:
+                self.in_flight[endpoint] -= 1
+
+    def current_trace(self):
+        return _trace.get()
+
+    def current_route(self):
+        return _route.get()
+
+    def count_route(self, route):
+        _route.set(route)
+        with self._lock:
+            self.routes[route] = self.routes.get(route, 0) + 1
+
+    # --- Generatsiya ---
+
+    def generation_timer(self):
+        return _GenerationTimer()
+
+    def record_generation(self, timer, new_tokens):
+        """generate() tugagach: prefill, decode va token tezligi"""
+        finished = time.perf_counter()
+        first_at = timer.first_at or finished
+        decode_s = finished - first_at
+        self.observe('prefill', first_at - timer.started)
+        self.observe('decode', decode_s)
+        if timer.steps:
+            self.observe('time_per_token', decode_s / timer.steps)
+        with self._lock:
+            self.generated_tokens += new_tokens
+            self.decode_seconds += decode_s
+
+    # --- Eksport ---
+
+    def snapshot(self):
+        """JSON uchun qisqa ko'rinish (ms)"""
+        with self._lock:
+            stages = {
+                name: {
+                    'count': summary.count,
+                    **{f'p{int(q * 100)}_ms': round(v * 1000.0, 3) for q, v in summary.quantiles().items()},
+                }
+                for name, summary in self.stages.items()
+            }
+            return {
+                'stages': stages,
+                'routes': dict(self.routes),
+                'in_flight': dict(self.in_flight),
+                'generated_tokens': self.generated_tokens,
+                'tokens_per_s': round(self.generated_tokens / self.decode_seconds, 2) if self.decode_seconds else 0.0,
+            }
+
+    def render_prometheus(self):
+        """Prometheus text exposition formati (0.0.4)"""
+        worker = f'worker="{os.getpid()}"'
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            metric('ai_tutor_stage_latency_seconds', 'summary', "So'rov bosqichlari kechikishi")
+            for name, summary in sorted(self.stages.items()):
+                labels = f'{worker},stage="{_escape(name)}"'
+                for q, value in summary.quantiles().items():
+                    lines.append(f'ai_tutor_stage_latency_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+                lines.append(f'ai_tutor_stage_latency_seconds_sum{{{labels}}} {summary.total:.6f}')
+                lines.append(f'ai_tutor_stage_latency_seconds_count{{{labels}}} {summary.count}')
+
+            metric('ai_tutor_route_total', 'counter', "Javob bergan yo'l (kb, math, semantic, web, ai, cache, default)")
+            for route, count in sorted(self.routes.items()):
+                lines.append(f'ai_tutor_route_total{{{worker},route="{_escape(route)}"}} {count}')
+
+            metric('ai_tutor_requests_total', 'counter', "Endpoint bo'yicha so'rovlar")
+            for endpoint, count in sorted(self.requests.items()):
+                lines.append(f'ai_tutor_requests_total{{{worker},endpoint="{_escape(endpoint)}"}} {count}')
+
+            metric('ai_tutor_request_errors_total', 'counter', "Xatolik bilan tugagan so'rovlar")
+            for endpoint, count in sorted(self.errors.items()):
+                lines.append(f'ai_tutor_request_errors_total{{{worker},endpoint="{_escape(endpoint)}"}} {count}')
+
+            metric('ai_tutor_in_flight_requests', 'gauge', "Hozir bajarilayotgan so'rovlar")
+            for endpoint, count in sorted(self.in_flight.items()):
+                lines.append(f'ai_tutor_in_flight_requests{{{worker},endpoint="{_escape(endpoint)}"}} {count}')
+
+            metric('ai_tutor_generated_tokens_total', 'counter', 'GPT-2 yaratgan tokenlar')
+            lines.append(f'ai_tutor_generated_tokens_total{{{worker}}} {self.generated_tokens}')
+            metric('ai_tutor_decode_seconds_total', 'counter', 'Decode bosqichiga sarflangan vaqt')
+            lines.append(f'ai_tutor_decode_seconds_total{{{worker}}} {self.decode_seconds:.6f}')
+            metric('ai_tutor_tokens_per_second', 'gauge', "O'rtacha decode tezligi")
+            tokens_per_s = self.generated_tokens / self.decode_seconds if self.decode_seconds else 0.0
+            lines.append(f'ai_tutor_tokens_per_second{{{worker}}} {tokens_per_s:.3f}')
+
+            metric('ai_tutor_process_start_time_seconds', 'gauge', 'Jarayon ishga tushgan vaqt')
+            lines.append(f'ai_tutor_process_start_time_seconds{{{worker}}} {self.started_at:.3f}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Jarayon bo'yicha yagona registr
+metrics = Metrics()
@@ -0,0 +1,355 @@
+# backend/model_server.py - GPT-2 alohida jarayonda: worker'lar Unix socket orqali generatsiya so'raydi
+#
+# Ishga tushirish (backend papkasidan):
+#     python model_server.py --socket /tmp/ai_tutor_model.sock
+#     AI_TUTOR_MODEL_SERVER_SOCKET=/tmp/ai_tutor_model.sock gunicorn -c gunicorn.conf.py app:app
+#
+# gunicorn.conf.py AI_TUTOR_MODEL_SERVER_SOCKET o'rnatilgan bo'lsa, serverni o'zi ishga tushiradi.
+# Model og'irliklari, torch thread'lari, micro-batcher, KV kesh va foydalanuvchi kontekstlari
+# shu jarayonda bitta nusxada; worker'lar bilimlar bazasi, matematika va quiz'ni o'zi bajaradi.
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import config
+from cancellation import CancelRegistry
+from profiling import profiler
+from structured_log import get_logger, setup_logging
+
+log = get_logger('model_server')
+
+
+class ModelServerError(Exception):
+    """Model server bilan aloqa xatoligi yoki serverdagi xatolik"""
+
+
+class ModelClient:
+    """Worker tomoni: ulanishlar pool'i orqali model serverga so'rov yuborish.
+
+    multiprocessing.connection ulanishi thread-safe emas, shuning uchun har bir
+    so'rov pool'dan alohida ulanish oladi. Server ishlamasa, `retry_s` davomida
+    qayta ulanishga urinilmaydi - so'rovlar darhol default javobga o'tadi.
+    """
+
+    def __init__(self, address, authkey=None, timeout_s=120.0, retry_s=1.0):
+        self.address = address
+        self.authkey = authkey or None
+        self.timeout_s = timeout_s
+        self.retry_s = retry_s
+
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+        self._down_until = 0.0
+        self._checked_at = 0.0
+
+        # Metrikalar
+        self.requests = 0
+        self.errors = 0
+        self.connects = 0
+
+    def _acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Fork'dan keyin ota jarayonning ulanishlari ishlatilmaydi
+                self._idle = []
+                self._pid = os.getpid()
+            if self._idle:
+                return self._idle.pop()
+            if time.monotonic() < self._down_until:
+                raise ModelServerError("Model server ishlamayapti")
+        try:
+            connection = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+        except (OSError, EOFError, AuthenticationError) as e:
+            self._mark_down()
+            raise ModelServerError(f"Model serverga ulanib bo'lmadi: {e}") from e
+        with self._lock:
+            self.connects += 1
+        return connection
+
+    def _release(self, connection):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def _mark_down(self):
+        with self._lock:
+            self.errors += 1
+            self._down_until = time.monotonic() + self.retry_s
+
+    # Bekor qilish tekshiruvi oralig'i (javob kutilayotganda)
+    CANCEL_POLL_S = 0.1
+
+    def _receive(self, connection, cancel=None):
+        """Keyingi xabar; bekor qilinsa None (ulanishni chaqiruvchi yopadi)"""
+        if cancel is None:
+            if not connection.poll(self.timeout_s):
+                raise TimeoutError("Model server javob bermadi")
+            return connection.recv()
+        deadline = time.monotonic() + self.timeout_s
+        while not connection.poll(self.CANCEL_POLL_S):
+            if cancel.cancelled:
+                return None
+            if time.monotonic() >= deadline:
+                raise TimeoutError("Model server javob bermadi")
+        return connection.recv()
+
+    def call(self, op, *args, cancel=None):
+        """Bitta so'rov-javob; xatolikda ModelServerError.
+
+        cancel - CancelToken: bekor qilinsa ulanish yopiladi (server generatsiyani
+        to'xtatadi) va None qaytadi.
+        """
+        connection = self._acquire()
+        with self._lock:
+            self.requests += 1
+        try:
+            connection.send((op, args))
+            message = self._receive(connection, cancel)
+            if message is None:
+                connection.close()
+                return None
+            status, value = message
+        except (OSError, EOFError, TimeoutError) as e:
+            connection.close()
+            self._mark_down()
+            raise ModelServerError(str(e)) from e
+        self._release(connection)
+        if status == 'error':
+            raise ModelServerError(value)
+        return value
+
+    def generate(self, user_message, user_id=None, cancel=None):
+        """Qabul qilingan GPT-2 javobi yoki None (EnhancedAITutor.generate_model_answer).
+
+        So'rov profillanayotgan bo'lsa, server ham uni profillaydi va natija hisobotga qo'shiladi.
+        """
+        report = profiler.current()
+        if report is None:
+            return self.call('generate', user_message, user_id, cancel=cancel)
+        result = self.call('generate_profiled', user_message, user_id, cancel=cancel)
+        if result is None:
+            return None
+        answer, remote_profile = result
+        profiler.add_attached([report], 'model_server', remote_profile)
+        return answer
+
+    def stream(self, user_message, user_id=None, cancel=None):
+        """Javob qismlari; generator yopilsa (mijoz uzilsa) ulanish yopiladi va server generatsiyani to'xtatadi"""
+        connection = self._acquire()
+        with self._lock:
+            self.requests += 1
+        finished = False
+        try:
+            report = profiler.current()
+            connection.send(('stream' if report is None else 'stream_profiled', (user_message, user_id)))
+            while True:
+                message = self._receive(connection, cancel)
+                if message is None:
+                    return
+                status, value = message
+                if status == 'chunk':
+                    yield value
+                    continue
+                finished = True
+                if status == 'error':
+                    raise ModelServerError(value)
+                if report is not None:
+                    profiler.add_attached([report], 'model_server', value)
+                return
+        except (OSError, EOFError, TimeoutError) as e:
+            self._mark_down()
+            raise ModelServerError(str(e)) from e
+        finally:
+            if finished:
+                self._release(connection)
+            else:
+                connection.close()
+
+    def available(self):
+        """Server ishlayaptimi (muvaffaqiyatli tekshiruv bir soniya eslab qolinadi)"""
+        now = time.monotonic()
+        if now - self._checked_at < 1.0:
+            return True
+        try:
+            self.call('ping')
+        except ModelServerError:
+            return False
+        self._checked_at = now
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'address': self.address,
+                'requests': self.requests,
+                'errors': self.errors,
+                'connects': self.connects,
+                'idle_connections': len(self._idle),
+            }
+        try:
+            stats['server'] = self.call('stats')
+        except ModelServerError:
+            stats['server'] = None
+        return stats
+
+
+class ModelServer:
+    """Model egasi: har bir ulanish alohida thread'da, generatsiya umumiy micro-batcher orqali"""
+
+    def __init__(self, tutor, address, authkey=None):
+        self.tutor = tutor
+        self.address = address
+        self.authkey = authkey or None
+        self.started_at = time.time()
+        self._connections = 0
+        self._lock = threading.Lock()
+        # Worker ulanishni yopsa (mijoz uzildi), shu ulanishdagi generatsiya to'xtaydi
+        self.cancel_registry = CancelRegistry()
+
+        self.handlers = {
+            'ping': lambda: os.getpid(),
+            'generate': tutor.generate_model_answer,
+            'generate_profiled': self._generate_profiled,
+            'profile': profiler.capture,
+            'stats': self.stats,
+        }
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        # Socket faylini faqat shu foydalanuvchi ochishi mumkin (xabarlar pickle orqali)
+        old_umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        finally:
+            os.umask(old_umask)
+
+        print(f"🧠 Model server tayyor: {self.address} (pid {os.getpid()})")
+        with listener:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    # Masalan, authkey mos kelmadi
+                    log.warning('model_server_accept_failed', extra={'error': str(e)})
+                    continue
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+    def _serve_connection(self, connection):
+        with self._lock:
+            self._connections += 1
+        try:
+            with connection:
+                while True:
+                    try:
+                        op, args = connection.recv()
+                    except (OSError, EOFError):
+                        return
+                    if not self._handle(connection, op, args):
+                        return
+        finally:
+            with self._lock:
+                self._connections -= 1
+
+    GENERATION_OPS = ('generate', 'generate_profiled', 'stream', 'stream_profiled')
+
+    def _handle(self, connection, op, args):
+        """Bitta so'rovni bajarish; ulanish uzilgan bo'lsa False"""
+        if op in self.GENERATION_OPS:
+            # Worker javobni kutayotganda ulanishga boshqa hech narsa yozmaydi: o'qish mumkin bo'lsa - EOF
+            sock = socket.fromfd(connection.fileno(), socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                with self.cancel_registry.track(None, sock=sock):
+                    return self._run(connection, op, args)
+            finally:
+                sock.close()
+        return self._run(connection, op, args)
+
+    def _run(self, connection, op, args):
+        try:
+            if op in ('stream', 'stream_profiled'):
+                # Profillangan stream: oxirgi 'ok' xabarida server tomonidagi profil qaytadi
+                scope = profiler.request('model_server', force=True) if op == 'stream_profiled' else nullcontext()
+                with scope as profile:
+                    chunks = self.tutor.generate_ai_response_stream(*args)
+                    try:
+                        for chunk in chunks:
+                            connection.send(('chunk', chunk))
+                    finally:
+                        # Worker uzilsa: generatsiya to'xtaydi
+                        chunks.close()
+                connection.send(('ok', profile))
+                return True
+
+            handler = self.handlers.get(op)
+            if handler is None:
+                raise ValueError(f"Noma'lum so'rov: {op}")
+            connection.send(('ok', handler(*args)))
+            return True
+        except (OSError, EOFError):
+            return False
+        except Exception as e:
+            log.warning('model_server_request_failed', extra={'op': op, 'error': str(e)})
+            try:
+                connection.send(('error', str(e)))
+            except (OSError, EOFError):
+                return False
+            return True
+
+    def _generate_profiled(self, user_message, user_id=None):
+        """generate + server tomonidagi profil (worker'dagi X-Debug-Profile so'rovi uchun)"""
+        with profiler.request('model_server', force=True) as profile:
+            answer = self.tutor.generate_model_answer(user_message, user_id)
+        return answer, profile
+
+    def stats(self):
+        tutor = self.tutor
+        with self._lock:
+            connections = self._connections
+        return {
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'connections': connections,
+            'model_state': tutor.model_state,
+            'model_mb': round(tutor.model_bytes / 1024 / 1024, 1) if tutor.model_bytes else None,
+            'batching': tutor.batcher.stats() if tutor.batcher else None,
+            'generation': tutor.generation_stats.stats(),
+            'kv_cache': tutor.kv_cache.stats() if tutor.kv_cache else None,
+            'tokenizer': tutor.tokenizer_stats(),
+            'sessions': tutor.sessions.stats(),
+            'cancellation': self.cancel_registry.stats(),
+            'profiling': profiler.stats(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPT-2 model server (Unix socket)")
+    parser.add_argument('--socket', default=config.MODEL_SERVER_SOCKET or '/tmp/ai_tutor_model.sock')
+    args = parser.parse_args()
+
+    setup_logging(config.LOG_LEVEL)
+    from enhanced_ai_model import EnhancedAITutor
+
+    # Model shu jarayonda yuklanadi (server rejimi faqat worker'lar uchun)
+    tutor = EnhancedAITutor(load_mode='eager')
+    if tutor.generator is None:
+        print("❌ Model yuklanmadi, server ishga tushmaydi")
+        sys.exit(1)
+    # SIGTERM (gunicorn to'xtaganda): Listener yopiladi va socket fayli o'chiriladi
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    ModelServer(tutor, args.socket, config.MODEL_SERVER_AUTHKEY.encode() or None).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+# backend/precompute.py - Tez-tez so'raladigan savollarga GPT-2 javoblarini oldindan (offline) yaratish
+#
+# Ishlatish (backend papkasidan, yuklama past paytda). Loglar AI_TUTOR_LOG_QUESTIONS=1 bilan yig'iladi:
+#     python precompute.py build --logs /var/log/ai_tutor/app.log [--workers 4] [--min-count 2] [--top 5000]
+#     python precompute.py report --logs /var/log/ai_tutor/today.log
+#
+# build: xabarlar normallashtirilgan matn bo'yicha guruhlanadi; faqat GPT-2 gacha yetib boradigan
+# guruhlar (bilimlar bazasi, matematika, web emas) bir nechta jarayonda katta batch'larda
+# generatsiya qilinadi. is_gibberish filtridan o'tgan javoblar ixcham JSON artefaktga yoziladi.
+# Har bir natija holat fayliga darhol yoziladi: to'xtatilgan ish qayta ishga tushirilsa,
+# tayyor guruhlar o'tkazib yuboriladi.
+# report: artefakt jonli trafikning qancha qismini qoplashini hisoblaydi.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+
+import config
+from response_cache import cache_key
+
+ARTIFACT_VERSION = 1
+
+
+class PrecomputedAnswers:
+    """Oldindan yaratilgan javoblar: normallashtirilgan savol -> javob"""
+
+    def __init__(self, answers, meta=None, path=None):
+        self.answers = answers
+        self.meta = meta or {}
+        self.path = path
+        self.lookups = 0
+        self.hits = 0
+
+    @classmethod
+    def load(cls, path, model_name=None):
+        """Artefaktni yuklash; fayl bo'lmasa yoki boshqa model uchun bo'lsa None"""
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != ARTIFACT_VERSION:
+            print(f"⚠️ Oldindan yaratilgan javoblar: noma'lum versiya ({path})")
+            return None
+        if model_name and data.get('model') != model_name:
+            print(f"⚠️ Oldindan yaratilgan javoblar boshqa model uchun ({data.get('model')}), ishlatilmaydi")
+            return None
+        meta = {key: value for key, value in data.items() if key != 'answers'}
+        return cls(data['answers'], meta, path)
+
+    def save(self, path):
+        """Atomik yozish: ishlayotgan serverlar yarim yozilgan faylni ko'rmaydi"""
+        data = dict(self.meta, version=ARTIFACT_VERSION, answers=self.answers)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def get(self, message):
+        self.lookups += 1
+        answer = self.answers.get(cache_key(message))
+        if answer is not None:
+            self.hits += 1
+        return answer
+
+    def __len__(self):
+        return len(self.answers)
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'entries': len(self.answers),
+            'model': self.meta.get('model'),
+            'created_at': self.meta.get('created_at'),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+
+def read_questions(paths):
+    """JSON loglardan chat savollari (savol matni yozilgan qatorlar)"""
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.startswith('{'):
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                question = entry.get('question')
+                if entry.get('event') in ('chat', 'chat_stream') and question:
+                    yield question
+
+
+def cluster_questions(questions):
+    """Normallashtirilgan matn bo'yicha guruhlar: [(kalit, eng ko'p uchragan yozilishi, soni), ...]"""
+    variants = {}
+    for question in questions:
+        variants.setdefault(cache_key(question), Counter())[question.strip()] += 1
+    clusters = [(key, counts.most_common(1)[0][0], sum(counts.values())) for key, counts in variants.items()]
+    clusters.sort(key=lambda cluster: (-cluster[2], cluster[0]))
+    return clusters
+
+
+def goes_to_model(tutor, message):
+    """Xabar GPT-2 gacha yetib boradimi (bilimlar bazasi, matematika, ma'noviy qidiruv va web'dan keyin)"""
+    intent = tutor.route_message(message)
+    _, response = tutor.answer_locally(message, intent)
+    return not response and not tutor.wants_web_search(intent)
+
+
+def create_offline_tutor():
+    """Model'siz tutor: faqat marshrutlash uchun"""
+    from enhanced_ai_model import EnhancedAITutor
+    tutor = EnhancedAITutor(load_mode='none', warmup=False)
+    tutor.response_cache = None
+    return tutor
+
+
+def read_state(path):
+    """Holat faylidagi tayyor natijalar: {kalit: javob yoki None}"""
+    state = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # To'xtatilgan yozuvning yarim qatori
+                    continue
+                state[record['key']] = record['answer']
+    return state
+
+
+_worker_tutor = None
+
+
+def _init_worker(torch_threads):
+    global _worker_tutor
+    from enhanced_ai_model import EnhancedAITutor
+    # Batch'larni job o'zi yig'adi; har bir jarayon o'z yadrolari bilan
+    config.BATCH_ENABLED = False
+    config.TORCH_THREADS = torch_threads
+    _worker_tutor = EnhancedAITutor(load_mode='eager', warmup=False)
+    if _worker_tutor.generator is None:
+        raise RuntimeError("Model yuklanmadi")
+
+
+def _generate_chunk(args):
+    chunk, attempts = args
+    answers = _worker_tutor.generate_answers_batch([message for _, message in chunk], attempts)
+    return [(key, answer) for (key, _), answer in zip(chunk, answers)]
+
+
+def build(args):
+    started = time.perf_counter()
+    clusters = cluster_questions(read_questions(args.logs))
+    total_messages = sum(count for _, _, count in clusters)
+
+    tutor = create_offline_tutor()
+    selected = []
+    for key, message, count in clusters:
+        if count < args.min_count or len(selected) >= args.top:
+            continue
+        if goes_to_model(tutor, message):
+            selected.append((key, message, count))
+
+    state_path = args.state or f"{args.output}.state.jsonl"
+    state = read_state(state_path)
+    todo = [(key, message) for key, message, _ in selected if key not in state]
+    print(f"📊 {total_messages} ta xabar, {len(clusters)} ta guruh; GPT-2 ga boradigan va "
+          f"{args.min_count}+ marta so'ralgan: {len(selected)} (tayyor: {len(selected) - len(todo)})")
+
+    if todo:
+        if os.path.exists(state_path) and os.path.getsize(state_path):
+            with open(state_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                partial = f.read(1) != b'\n'
+            if partial:
+                # To'xtatilgan yozuvning yarim qatori yangi yozuvlarga qo'shilib ketmasligi uchun
+                with open(state_path, 'a', encoding='utf-8') as f:
+                    f.write('\n')
+        chunks = [(todo[i:i + args.batch_size], args.attempts) for i in range(0, len(todo), args.batch_size)]
+        workers = max(1, min(args.workers, len(chunks)))
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+        done = 0
+        # spawn: har bir jarayon modelni o'zi yuklaydi (ota jarayondagi thread'lar fork qilinmaydi)
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(workers, initializer=_init_worker, initargs=(torch_threads,)) as pool, \
+                open(state_path, 'a', encoding='utf-8') as state_file:
+            for results in pool.imap_unordered(_generate_chunk, chunks):
+                for key, answer in results:
+                    state_file.write(json.dumps({'key': key, 'answer': answer}, ensure_ascii=False) + '\n')
+                    state[key] = answer
+                state_file.flush()
+                done += len(results)
+                print(f"⏳ {done}/{len(todo)}")
+
+    answers = {key: state[key] for key, _, _ in selected if state.get(key)}
+    covered = sum(count for key, _, count in selected if key in answers)
+    artifact = PrecomputedAnswers(answers, {
+        'model': config.MODEL_NAME,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'source_messages': total_messages,
+    })
+    artifact.save(args.output)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {len(answers)} ta javob yozildi: {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB), "
+          f"rad etilgan: {len(selected) - len(answers)}, {elapsed:.0f} s")
+    print(f"📈 Manba loglardagi qamrov: {covered}/{total_messages} ({covered / max(total_messages, 1):.1%})")
+
+
+def report(args):
+    clusters = cluster_questions(read_questions(args.logs))
+    total = sum(count for _, _, count in clusters)
+    artifact = PrecomputedAnswers.load(args.artifact)
+    if artifact is None:
+        print(f"❌ Artefakt topilmadi: {args.artifact}")
+        sys.exit(1)
+
+    tutor = create_offline_tutor()
+    model_bound = hits = 0
+    for key, message, count in clusters:
+        if not goes_to_model(tutor, message):
+            continue
+        model_bound += count
+        if key in artifact.answers:
+            hits += count
+
+    print(f"Jonli trafik: {total} ta xabar ({len(clusters)} xil), artefakt: {len(artifact)} ta javob")
+    print(f"GPT-2 ga boradigan: {model_bound} ({model_bound / max(total, 1):.1%})")
+    print(f"Qamrov: {hits}/{total} ({hits / max(total, 1):.1%}) barcha trafik, "
+          f"{hits}/{model_bound} ({hits / max(model_bound, 1):.1%}) GPT-2 trafigi")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tez-tez so'raladigan savollarga javoblarni oldindan yaratish")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help="loglardan artefakt yaratish (davom ettirish mumkin)")
+    build_parser.add_argument('--logs', nargs='+', required=True)
+    build_parser.add_argument('--output', default=config.PRECOMPUTED_ANSWERS_PATH)
+    build_parser.add_argument('--state', help="holat fayli (standart: <output>.state.jsonl)")
+    build_parser.add_argument('--min-count', type=int, default=2)
+    build_parser.add_argument('--top', type=int, default=5000)
+    build_parser.add_argument('--batch-size', type=int, default=32)
+    build_parser.add_argument('--attempts', type=int, default=3, help="rad etilgan javob uchun urinishlar")
+    build_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    report_parser = commands.add_parser('report', help="artefakt jonli trafikni qanchalik qoplaydi")
+    report_parser.add_argument('--logs', nargs='+', required=True)
+    report_parser.add_argument('--artifact', default=config.PRECOMPUTED_ANSWERS_PATH)
+
+    args = parser.parse_args()
+    build(args) if args.command == 'build' else report(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+# backend/profiling.py - Profiling: tanlangan so'rovlar cProfile bilan, admin uchun N soniyalik yozib olish
+#
+# O'chirilgan holatda (sample_rate 0, yozib olish yo'q) so'rov boshiga bitta taqqoslash qoladi.
+#   - So'rovlar ulushi (AI_TUTOR_PROFILE_SAMPLE_RATE) yoki X-Debug-Profile sarlavhali chat
+#     so'rovi cProfile ostida bajariladi: funksiyalar bo'yicha vaqt logga yoki javobga qo'shiladi.
+#     cProfile faqat so'rov thread'ini ko'radi, shuning uchun so'rov nomidan boshqa joyda
+#     bajarilgan ish (batch thread'i, stream generatsiyasi, model server) attach() bilan
+#     alohida profillanib, hisobotning 'attached' ro'yxatiga qo'shiladi
+#   - /api/admin/profile N soniya davomida barcha thread'larning stack'larini yig'adi
+#     (sys._current_frames) yoki torch profiler bilan model.generate ichidagi op'larni yozadi;
+#     natija collapsed stack (flamegraph.pl, speedscope) yoki Chrome trace (chrome://tracing, Perfetto)
+# torch profiler faqat o'zi yoqilgan thread'dagi op'larni ko'radi, shuning uchun u generate
+# chaqiruvlarining o'ziga o'raladi (torch_scope).
+
+import contextvars
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+import config
+from structured_log import get_logger
+
+log = get_logger('profiling')
+
+CAPTURE_MODES = ('stack', 'torch')
+CAPTURE_FORMATS = ('collapsed', 'chrome')
+
+# Joriy profillanayotgan so'rov hisoboti (profillanmasa None)
+_current_report = contextvars.ContextVar('profile_report', default=None)
+
+
+class ProfilerBusy(Exception):
+    """Boshqa yozib olish ishlayapti"""
+
+
+def _frame_label(code, labels):
+    label = labels.get(code)
+    if label is None:
+        name = getattr(code, 'co_qualname', code.co_name)
+        label = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        labels[code] = label
+    return label
+
+
+def _function_label(key):
+    """pstats kaliti (fayl, qator, funksiya) -> o'qiladigan nom"""
+    filename, lineno, name = key
+    if filename == '~':
+        # Builtin: "<built-in method time.sleep>"
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+class Profiler:
+    """So'rovlarni profiling qilish va jarayonni N soniya yozib olish (jarayon bo'yicha bitta nusxa)"""
+
+    def __init__(self, sample_rate=0.0, top_n=25, interval_ms=5.0, max_capture_s=30.0):
+        self.sample_rate = sample_rate
+        self.top_n = top_n
+        self.interval_s = max(interval_ms, 0.5) / 1000.0
+        self.max_capture_s = max_capture_s
+
+        # cProfile bir vaqtda bitta so'rovda (Python 3.12+ da jarayonda bittadan ortiq bo'lmaydi)
+        self._request_lock = threading.Lock()
+        self._capture_lock = threading.Lock()
+        self._torch_lock = threading.Lock()
+        # Torch yozib olish faol bo'lsa - [(boshlanish, hodisalar)], aks holda None
+        self._torch_records = None
+
+        # Metrikalar
+        self._stats_lock = threading.Lock()
+        self.sampled = 0
+        self.forced = 0
+        self.busy_skips = 0
+        self.captures = 0
+
+    # --- So'rovlar ---
+
+    @contextmanager
+    def request(self, endpoint, force=False):
+        """So'rov profili: tanlanmasa None, aks holda blokdan keyin to'ldiriladigan dict.
+
+        force - debug sarlavhasi: natija javobga qo'shiladi. Tanlangan so'rovlar logga yoziladi.
+        """
+        if not force and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            yield None
+            return
+        if not self._request_lock.acquire(blocking=False):
+            with self._stats_lock:
+                self.busy_skips += 1
+            yield None
+            return
+
+        report = {}
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        context_token = _current_report.set(report)
+        try:
+            profile.enable()
+            try:
+                yield report
+            finally:
+                profile.disable()
+        finally:
+            _current_report.reset(context_token)
+            self._request_lock.release()
+            report.update(self._breakdown(profile, time.perf_counter() - started))
+            with self._stats_lock:
+                if force:
+                    self.forced += 1
+                else:
+                    self.sampled += 1
+            if not force:
+                log.info('request_profile', extra={
+                    'endpoint': endpoint, 'total_ms': report['total_ms'], 'functions': report['functions'][:10],
+                    'attached': [
+                        {'scope': entry['scope'], 'total_ms': entry['total_ms'], 'functions': entry['functions'][:10]}
+                        for entry in report.get('attached', ())
+                    ],
+                })
+
+    def current(self):
+        """Joriy so'rov hisoboti (profillanmasa None): boshqa thread'ga attach() uchun uzatiladi"""
+        return _current_report.get()
+
+    @contextmanager
+    def attach(self, reports, scope):
+        """So'rov(lar) nomidan boshqa thread'da bajarilgan ishni profillash.
+
+        reports - current() qiymatlari (None'lar e'tiborsiz). Natija har bir hisobotning
+        'attached' ro'yxatiga qo'shiladi; batch bir nechta so'rovga umumiy bo'lgani uchun
+        shared_by - shu ishni bo'lishgan profillangan so'rovlar soni.
+        """
+        reports = [report for report in reports if report is not None]
+        if not reports:
+            yield
+            return
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: jarayonda boshqa profiler faol
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.add_attached(reports, scope, self._breakdown(profile, time.perf_counter() - started))
+
+    def add_attached(self, reports, scope, breakdown):
+        """Tayyor profilni (masalan, model serverdan kelganini) so'rov hisobotlariga qo'shish"""
+        if not breakdown:
+            return
+        entry = dict(scope=scope, shared_by=len(reports), **breakdown)
+        for report in reports:
+            report.setdefault('attached', []).append(entry)
+
+    def _breakdown(self, profile, elapsed_s):
+        """Funksiyalar bo'yicha vaqt (o'z vaqti bo'yicha kamayish tartibida)"""
+        stats = pstats.Stats(profile).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top_n]
+        return {
+            'total_ms': round(elapsed_s * 1000.0, 3),
+            'functions': [
+                {
+                    'function': _function_label(key),
+                    'calls': calls,
+                    'self_ms': round(self_s * 1000.0, 3),
+                    'cumulative_ms': round(cumulative_s * 1000.0, 3),
+                }
+                for key, (_, calls, self_s, cumulative_s, _) in rows
+            ],
+        }
+
+    # --- torch profiler ---
+
+    def torch_scope(self, name):
+        """model.generate atrofida: torch yozib olish faol bo'lsa op'lar yoziladi, aks holda hech narsa"""
+        if self._torch_records is None:
+            return nullcontext()
+        return self._record_torch(name)
+
+    @contextmanager
+    def _record_torch(self, name):
+        # Bir vaqtda bitta torch profiler: band bo'lsa, bu chaqiruv yozilmaydi
+        if not self._torch_lock.acquire(blocking=False):
+            yield
+            return
+        try:
+            records = self._torch_records
+            if records is None:
+                yield
+                return
+            import torch
+            started = time.perf_counter()
+            with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU]) as prof:
+                with torch.profiler.record_function(name):
+                    yield
+            records.append((started, prof.events()))
+        finally:
+            self._torch_lock.release()
+
+    # --- Yozib olish ---
+
+    def capture(self, seconds, mode='stack', fmt='collapsed'):
+        """N soniya yozib olish; natija matn (collapsed) yoki JSON matni (chrome)"""
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"mode {', '.join(CAPTURE_MODES)} dan biri bo'lishi kerak")
+        if fmt not in CAPTURE_FORMATS:
+            raise ValueError(f"format {', '.join(CAPTURE_FORMATS)} dan biri bo'lishi kerak")
+        seconds = min(max(float(seconds), 0.1), self.max_capture_s)
+        if not self._capture_lock.acquire(blocking=False):
+            raise ProfilerBusy("Profil allaqachon yozib olinmoqda")
+        try:
+            with self._stats_lock:
+                self.captures += 1
+            if mode == 'torch':
+                return self._capture_torch(seconds, fmt)
+            return self._capture_stacks(seconds, fmt)
+        finally:
+            self._capture_lock.release()
+
+    def _capture_stacks(self, seconds, fmt):
+        own_thread = threading.get_ident()
+        labels = {}
+        samples = []
+        thread_names = {}
+        deadline = time.perf_counter() + seconds
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            stacks = {}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code, labels))
+                    frame = frame.f_back
+                stacks[thread_id] = tuple(reversed(stack))
+            samples.append((now, stacks))
+            for thread in threading.enumerate():
+                thread_names.setdefault(thread.ident, thread.name)
+            time.sleep(self.interval_s)
+
+        if fmt == 'chrome':
+            return self._chrome_from_samples(samples, thread_names)
+        counts = Counter()
+        for _, stacks in samples:
+            for thread_id, stack in stacks.items():
+                counts[(thread_names.get(thread_id, str(thread_id)),) + stack] += 1
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in counts.most_common())
+
+    def _chrome_from_samples(self, samples, thread_names):
+        """Ketma-ket stack'lar farqidan B/E hodisalari (har thread alohida qator)"""
+        pid = os.getpid()
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id, 'args': {'name': name}}
+            for thread_id, name in thread_names.items()
+        ]
+        if not samples:
+            return json.dumps({'traceEvents': events})
+        origin = samples[0][0]
+        open_stacks = {}
+        for now, stacks in samples + [(samples[-1][0] + self.interval_s, {})]:
+            ts = round((now - origin) * 1e6, 1)
+            for thread_id in set(open_stacks) | set(stacks):
+                old, new = open_stacks.get(thread_id, ()), stacks.get(thread_id, ())
+                common = 0
+                while common < min(len(old), len(new)) and old[common] == new[common]:
+                    common += 1
+                for name in reversed(old[common:]):
+                    events.append({'name': name, 'ph': 'E', 'ts': ts, 'pid': pid, 'tid': thread_id})
+                for name in new[common:]:
+                    events.append({'name': name, 'ph': 'B', 'ts': ts, 'pid': pid, 'tid': thread_id})
+                open_stacks[thread_id] = new
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+    def _capture_torch(self, seconds, fmt):
+        records = []
+        origin = time.perf_counter()
+        self._torch_records = records
+        try:
+            time.sleep(seconds)
+        finally:
+            self._torch_records = None
+        # Oyna ichida boshlangan generate tugashini kutish (u ham natijaga kiradi)
+        if self._torch_lock.acquire(timeout=self.max_capture_s):
+            self._torch_lock.release()
+
+        if fmt == 'chrome':
+            pid = os.getpid()
+            events = []
+            for started, function_events in records:
+                base = min((event.time_range.start for event in function_events), default=0)
+                offset = (started - origin) * 1e6 - base
+                for event in function_events:
+                    events.append({
+                        'name': event.name, 'ph': 'X', 'pid': pid, 'tid': event.thread,
+                        'ts': round(event.time_range.start + offset, 1),
+                        'dur': round(event.time_range.elapsed_us(), 1),
+                    })
+            return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+        # Collapsed: op ierarxiyasi, qiymat - o'z CPU vaqti (µs)
+        counts = Counter()
+        for _, function_events in records:
+            for event in function_events:
+                stack = []
+                node = event
+                while node is not None:
+                    stack.append(node.name)
+                    node = node.cpu_parent
+                counts[tuple(reversed(stack))] += event.self_cpu_time_total
+        return ''.join(f"{';'.join(stack)} {round(us)}\n" for stack, us in counts.most_common() if us >= 0.5)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'sampled': self.sampled,
+                'forced': self.forced,
+                'busy_skips': self.busy_skips,
+                'captures': self.captures,
+                'capture_active': self._capture_lock.locked(),
+            }
+
+
+# Jarayon bo'yicha yagona profiler
+profiler = Profiler(
+    sample_rate=config.PROFILE_SAMPLE_RATE,
+    top_n=config.PROFILE_TOP_N,
+    interval_ms=config.PROFILE_INTERVAL_MS,
+    max_capture_s=config.PROFILE_MAX_CAPTURE_S,
+)
@@ -0,0 +1,280 @@
+# backend/quiz_engine.py - Test savollari: shablonlar, vektorlashgan generatsiya va tayyor testlar pool'i
+
+import os
+import threading
+from collections import deque
+
+import numpy as np
+
+from structured_log import get_logger
+
+log = get_logger('quiz_engine')
+
+DEFAULT_TOPIC = 'matematika'
+DEFAULT_DIFFICULTY = 'medium'
+DIFFICULTIES = ('easy', 'medium', 'hard')
+OPTION_COUNT = 4
+
+# Mavzu bo'yicha savollar shablonlari (modul yuklanganda bir marta)
+QUIZ_TEMPLATES = {
+    'matematika': [
+        {'q': 'Kvadrat ildizi {} ning qiymati nechaga teng?', 'type': 'sqrt'},
+        {'q': 'Agar x + {} = {}, x ning qiymati necha?', 'type': 'equation'},
+        {'q': '{} × {} ning natijasi?', 'type': 'multiply'},
+        {'q': 'Uchburchakning barcha burchaklari yig\'indisi nechaga teng?', 'answer': '180°',
+         'wrong': ['90°', '270°', '360°']},
+        {'q': 'Pi soni taxminan qanchaga teng?', 'answer': '3.14159',
+         'wrong': ['2.71828', '1.41421', '1.61803']},
+    ],
+    'fizika': [
+        {'q': 'Yerning tortishish tezlanishi nechaga teng?', 'answer': '9.8 m/s²',
+         'wrong': ['8.9 m/s²', '10.8 m/s²', '1.6 m/s²']},
+        {'q': 'Yorug\'lik tezligi qancha?', 'answer': '300,000 km/s',
+         'wrong': ['150,000 km/s', '30,000 km/s', '343 m/s']},
+        {'q': 'Energiya saqlanish qonuni nima deydi?', 'answer': 'Energiya yo\'qolmaydi, faqat shaklini o\'zgartiradi',
+         'wrong': ['Energiya vaqt o\'tishi bilan kamayadi', 'Energiya faqat issiqlikka aylanadi',
+                   'Energiya yo\'qdan paydo bo\'ladi']},
+        {'q': 'Elektr qarshilik birligi nima?', 'answer': 'Om (Ω)',
+         'wrong': ['Volt (V)', 'Amper (A)', 'Vatt (W)']},
+        {'q': 'Atmosfera bosimi nechaga teng?', 'answer': '101,325 Pa',
+         'wrong': ['10,132 Pa', '1,013 Pa', '1,000,000 Pa']},
+    ],
+    'kimyo': [
+        {'q': 'Suvning kimyoviy formulasi?', 'answer': 'H₂O', 'wrong': ['H₂O₂', 'CO₂', 'HO₂']},
+        {'q': 'Kislorodning kimyoviy belgisi?', 'answer': 'O', 'wrong': ['K', 'Ok', 'Os']},
+        {'q': 'Tuzning kimyoviy nomi?', 'answer': 'Natriy xlorid (NaCl)',
+         'wrong': ['Kaliy xlorid (KCl)', 'Natriy gidroksid (NaOH)', 'Kalsiy karbonat (CaCO₃)']},
+        {'q': 'Uglerodni oksidning formulasi?', 'answer': 'CO₂', 'wrong': ['CO₃', 'C₂O', 'O₂']},
+        {'q': 'pH shkalasi qancha oraliqda?', 'answer': '0 dan 14 gacha',
+         'wrong': ['1 dan 10 gacha', '0 dan 100 gacha', '-7 dan 7 gacha']},
+    ],
+}
+
+# Sonli savollar uchun oraliqlar (qiyinlik bo'yicha, yuqori chegara kiritilmaydi)
+NUMERIC_RANGES = {
+    'sqrt': {'easy': (2, 10), 'medium': (2, 13), 'hard': (5, 26)},
+    'equation': {'easy': ((1, 6), (7, 13)), 'medium': ((1, 11), (11, 21)), 'hard': ((10, 51), (51, 101))},
+    'multiply': {'easy': (2, 10), 'medium': (2, 13), 'hard': (11, 26)},
+}
+
+# Noto'g'ri variantlar to'g'ri javobdan shuncha uzoqlikda
+DISTRACTOR_OFFSETS = np.array([offset for offset in range(-10, 11) if offset != 0])
+
+
+def numeric_questions(kind, difficulty, count, rng):
+    """Bir xil turdagi `count` ta sonli savol: (savol argumentlari, javoblar) massivlari"""
+    ranges = NUMERIC_RANGES[kind][difficulty]
+    if kind == 'sqrt':
+        roots = rng.integers(*ranges, size=count)
+        return (roots * roots)[:, None], roots
+    if kind == 'equation':
+        a = rng.integers(*ranges[0], size=count)
+        b = rng.integers(*ranges[1], size=count)
+        return np.stack([a, b], axis=1), b - a
+    a = rng.integers(*ranges, size=count)
+    b = rng.integers(*ranges, size=count)
+    return np.stack([a, b], axis=1), a * b
+
+
+def numeric_options(answers, rng):
+    """Har bir javob uchun 4 ta musbat, takrorlanmaydigan variant va to'g'ri javob indeksi.
+
+    Rad etish sikli o'rniga: har bir qator uchun ruxsat etilgan siljishlar
+    tasodifiy tartiblanadi va birinchi uchtasi olinadi.
+    """
+    count = len(answers)
+    candidates = answers[:, None] + DISTRACTOR_OFFSETS[None, :]
+    scores = rng.random(candidates.shape)
+    # Musbat bo'lmagan variantlar oxiriga suriladi (+1..+10 har doim yetarli)
+    scores[candidates <= 0] = np.inf
+    picked = np.argsort(scores, axis=1)[:, :OPTION_COUNT - 1]
+    wrong = np.take_along_axis(candidates, picked, axis=1)
+
+    options = np.concatenate([answers[:, None], wrong], axis=1)
+    order = np.argsort(rng.random((count, OPTION_COUNT)), axis=1)
+    options = np.take_along_axis(options, order, axis=1)
+    correct = np.argmax(order == 0, axis=1)
+    return options, correct
+
+
+class QuizEngine:
+    """Test yaratish: bir nechta testni birdaniga, sonli savollarni NumPy bilan"""
+
+    def __init__(self, templates=QUIZ_TEMPLATES, seed=None):
+        self.templates = templates
+        self._seed = seed
+        self._rng = None
+        self._pid = None
+
+    @property
+    def rng(self):
+        # Fork'dan keyin har bir worker o'z tasodifiy ketma-ketligiga ega bo'lishi kerak
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._rng = np.random.default_rng(self._seed)
+        return self._rng
+
+    def resolve(self, topic, difficulty):
+        """Noma'lum mavzu/qiyinlik standart qiymatga almashtiriladi"""
+        topic = (topic or DEFAULT_TOPIC).lower()
+        if topic not in self.templates:
+            topic = DEFAULT_TOPIC
+        if difficulty not in DIFFICULTIES:
+            difficulty = DEFAULT_DIFFICULTY
+        return topic, difficulty
+
+    def generate(self, topic, difficulty='medium', num_questions=5, count=1):
+        """`count` ta test, har birida `num_questions` ta savol"""
+        topic, difficulty = self.resolve(topic, difficulty)
+        rng = self.rng
+        templates = self.templates[topic]
+        per_quiz = min(num_questions, len(templates))
+
+        # Har bir test uchun shablonlar tartibi (takrorlanmasdan)
+        chosen = np.argsort(rng.random((count, len(templates))), axis=1)[:, :per_quiz]
+
+        # Har bir shablon bo'yicha barcha savollar bitta chaqiruvda
+        questions = np.empty(chosen.shape, dtype=object)
+        for template_id, template in enumerate(templates):
+            slots = np.nonzero(chosen == template_id)
+            total = len(slots[0])
+            if not total:
+                continue
+            if 'type' in template:
+                questions[slots] = self._numeric(template, difficulty, total, rng)
+            else:
+                questions[slots] = self._text(template, total, rng)
+
+        return [
+            {
+                'topic': topic,
+                'difficulty': difficulty,
+                'questions': list(row),
+                'total_questions': per_quiz,
+            }
+            for row in questions
+        ]
+
+    def _numeric(self, template, difficulty, count, rng):
+        arguments, answers = numeric_questions(template['type'], difficulty, count, rng)
+        options, correct = numeric_options(answers, rng)
+        return [
+            {
+                'question': template['q'].format(*args),
+                'answer': str(answer),
+                'options': [str(option) for option in row],
+                'correct': int(index),
+            }
+            for args, answer, row, index in zip(arguments.tolist(), answers.tolist(), options.tolist(), correct)
+        ]
+
+    def _text(self, template, count, rng):
+        choices = [template['answer']] + template['wrong'][:OPTION_COUNT - 1]
+        orders = np.argsort(rng.random((count, len(choices))), axis=1)
+        correct = np.argmax(orders == 0, axis=1)
+        return [
+            {
+                'question': template['q'],
+                'answer': template['answer'],
+                'options': [choices[i] for i in order],
+                'correct': int(index),
+            }
+            for order, index in zip(orders.tolist(), correct)
+        ]
+
+
+class QuizPool:
+    """Har bir (mavzu, qiyinlik) uchun oldindan tayyorlangan testlar; kamaysa, fonda to'ldiriladi"""
+
+    def __init__(self, engine, size=64, num_questions=5):
+        self.engine = engine
+        self.size = size
+        self.num_questions = num_questions
+        self._pools = {}
+        self._pid = None
+        self._lock = threading.Lock()
+        self._refilling = set()
+
+        # Metrikalar
+        self.served_from_pool = 0
+        self.generated_inline = 0
+        self.refills = 0
+
+    def _pool(self, key):
+        if self._pid != os.getpid():
+            # Fork'dan keyin ota jarayonning testlari boshqa worker'larda takrorlanmasligi uchun
+            self._pid = os.getpid()
+            self._pools = {}
+            self._refilling = set()
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools.setdefault(key, deque())
+        return pool
+
+    def get(self, topic, difficulty='medium', num_questions=None, count=1):
+        """`count` ta test: avval pool'dan, yetmasa - shu yerda yaratiladi"""
+        num_questions = num_questions or self.num_questions
+        topic, difficulty = self.engine.resolve(topic, difficulty)
+        if num_questions != self.num_questions or self.size <= 0:
+            return self.engine.generate(topic, difficulty, num_questions, count)
+
+        key = (topic, difficulty)
+        quizzes = []
+        with self._lock:
+            pool = self._pool(key)
+            while pool and len(quizzes) < count:
+                quizzes.append(pool.popleft())
+        served = len(quizzes)
+        if served < count:
+            quizzes.extend(self.engine.generate(topic, difficulty, num_questions, count - served))
+
+        with self._lock:
+            self.served_from_pool += served
+            self.generated_inline += count - served
+        self.refill_async(key)
+        return quizzes
+
+    def fill(self, key):
+        """Pool'ni to'liq hajmgacha to'ldirish"""
+        with self._lock:
+            missing = self.size - len(self._pool(key))
+        if missing <= 0:
+            return
+        quizzes = self.engine.generate(key[0], key[1], self.num_questions, missing)
+        with self._lock:
+            self._pool(key).extend(quizzes)
+            self.refills += 1
+
+    def refill_async(self, key):
+        """Pool yarmidan kam qolsa, fonda to'ldirish"""
+        with self._lock:
+            if len(self._pool(key)) >= self.size // 2 or key in self._refilling:
+                return
+            self._refilling.add(key)
+
+        def refill():
+            try:
+                self.fill(key)
+            except Exception as e:
+                log.warning('quiz_pool_refill_failed', extra={'topic': key[0], 'difficulty': key[1], 'error': str(e)})
+            finally:
+                with self._lock:
+                    self._refilling.discard(key)
+
+        threading.Thread(target=refill, name='quiz-pool-refill', daemon=True).start()
+
+    def prefill(self, difficulties=DIFFICULTIES):
+        """Barcha mavzular uchun pool'larni to'ldirish (warm-up paytida)"""
+        for topic in self.engine.templates:
+            for difficulty in difficulties:
+                self.fill((topic, difficulty))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'pools': {f"{topic}/{difficulty}": len(pool) for (topic, difficulty), pool in self._pools.items()},
+                'served_from_pool': self.served_from_pool,
+                'generated_inline': self.generated_inline,
+                'refills': self.refills,
+            }
@@ -0,0 +1,112 @@
+# backend/response_cache.py - Tayyor javoblar keshi (LRU + TTL)
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from textutils import normalize_text
+
+_TRAILING_PUNCT_RE = re.compile(r'[\s?!.,;:]+$')
+
+
+class TTLCache:
+    """Hajmi chegaralangan LRU kesh, har bir yozuvning o'z yashash muddati bilan"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def cache_key(message):
+    """Xabarni kesh kaliti uchun normallashtirish (registr, bo'sh joy, apostrof, oxirgi tinish belgisi)"""
+    return _TRAILING_PUNCT_RE.sub('', normalize_text(message))
+
+
+class ResponseCache:
+    """Javob yo'li (kb, math, web, ...) bo'yicha alohida TTL bilan javoblar keshi.
+
+    TTL 0 bo'lgan yo'llar keshlanmaydi (masalan, GPT-2 javoblari har safar
+    sampling bilan yangidan yaratiladi).
+    """
+
+    def __init__(self, route_ttls, max_entries=10000):
+        self.route_ttls = dict(route_ttls)
+        self._cache = TTLCache(max_entries)
+        self._route_hits = {}
+        self._stats_lock = threading.Lock()
+
+    def get(self, message, namespace=None):
+        """Keshlangan javob: (yo'l, matn) yoki None"""
+        item = self._cache.get((namespace, cache_key(message)))
+        if item is not None:
+            with self._stats_lock:
+                self._route_hits[item[0]] = self._route_hits.get(item[0], 0) + 1
+        return item
+
+    def put(self, message, route, response, namespace=None):
+        ttl = self.route_ttls.get(route, 0)
+        if ttl > 0 and response:
+            self._cache.set((namespace, cache_key(message)), (route, response), ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        stats = self._cache.stats()
+        with self._stats_lock:
+            stats['hits_by_route'] = dict(self._route_hits)
+        stats['route_ttls'] = self.route_ttls
+        return stats
@@ -0,0 +1,185 @@
+# backend/semantic_index.py - Bilimlar bazasi bo'yicha ma'noviy (embedding) qidiruv
+
+import threading
+import zlib
+
+import numpy as np
+
+from structured_log import get_logger
+from textutils import normalize_text, tokenize
+
+log = get_logger('semantic_index')
+
+
+class HashingEmbedder:
+    """Belgi n-grammalari bo'yicha vektor (hashing trick); model talab qilinmaydi.
+
+    O'zbek tilidagi qo'shimchalar ("genetikaning", "irsiyatni") so'z
+    o'zagining n-grammalarini o'zgartirmaydi, shuning uchun parafrazalar
+    yaqin vektorlarga tushadi.
+    """
+
+    name = 'hashing'
+
+    def __init__(self, dim=4096, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text):
+        features = []
+        for word in tokenize(normalize_text(text)):
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for start in range(max(len(padded) - n + 1, 1)):
+                    features.append(zlib.crc32(padded[start:start + n].encode('utf-8')) % self.dim)
+        return features
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if features:
+                np.add.at(matrix[row], features, 1.0)
+        # Kichik chastotalarni ustun qilish uchun sublinear og'irlik
+        np.log1p(matrix, out=matrix)
+        return _normalize_rows(matrix)
+
+
+class GPT2Embedder:
+    """Yuklangan GPT-2 ning oxirgi yashirin holatlari o'rtachasi"""
+
+    name = 'gpt2'
+
+    def __init__(self, model, tokenizer, device, batch_size=32, max_length=128):
+        import torch
+        self._torch = torch
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def embed(self, texts):
+        torch = self._torch
+        chunks = []
+        for start in range(0, len(texts), self.batch_size):
+            inputs = self.tokenizer(
+                list(texts[start:start + self.batch_size]),
+                return_tensors='pt',
+                padding=True,
+                truncation=True,
+                max_length=self.max_length
+            ).to(self.device)
+            with torch.inference_mode():
+                hidden = self.model.transformer(**inputs).last_hidden_state
+            mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+            chunks.append(pooled.float().cpu().numpy())
+        if not chunks:
+            return np.zeros((0, self.model.config.n_embd), dtype=np.float32)
+        return _normalize_rows(np.concatenate(chunks))
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+class SemanticIndex:
+    """Bilimlar bazasi yozuvlari embedding'lari (bitta uzluksiz matritsa) va top-k qidiruv"""
+
+    def __init__(self, embedder, threshold=0.40, top_k=3):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.top_k = top_k
+        self.version = None
+        # (kalitlar, javoblar, matritsa) - bitta o'zgarmas nusxa: qidiruv uchalasini birga oladi
+        self._snapshot = ((), (), None)
+        self._rebuild_lock = threading.Lock()
+        self._rebuilding = False
+
+        # Metrikalar
+        self.queries = 0
+        self.hits = 0
+
+    def build(self, items, version=None):
+        """Embedding'larni bir marta hisoblab, matritsani almashtirish"""
+        items = list(items)
+        keys = tuple(key for key, _ in items)
+        values = tuple(value for _, value in items)
+        matrix = self.embedder.embed([f"{key}. {value}" for key, value in items])
+        matrix.setflags(write=False)
+        # Bitta havola orqali almashtirish: parallel qidiruvlar eski yoki yangi nusxani to'liq ko'radi
+        self._snapshot = (keys, values, matrix)
+        self.version = version
+
+    @property
+    def keys(self):
+        return self._snapshot[0]
+
+    @property
+    def values(self):
+        return self._snapshot[1]
+
+    @property
+    def matrix(self):
+        return self._snapshot[2]
+
+    def sync(self, store):
+        """Saqlagich versiyasi o'zgargan bo'lsa, fonda qayta qurish (eski indeks ishlashda davom etadi)"""
+        if store.version == self.version or self._rebuilding:
+            return
+        with self._rebuild_lock:
+            if store.version == self.version or self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def rebuild():
+            try:
+                self.build(store.items(), store.version)
+                log.info('semantic_index_rebuilt', extra={'entries': len(self.keys), 'kb_version': store.version})
+            except Exception as e:
+                log.warning('semantic_index_rebuild_failed', extra={'kb_version': store.version, 'error': str(e)})
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=rebuild, name='semantic-index-rebuild', daemon=True).start()
+
+    def search(self, query, top_k=None):
+        """Eng yaqin yozuvlar: [(o'xshashlik, kalit, javob), ...]"""
+        keys, values, matrix = self._snapshot
+        if matrix is None or not len(keys):
+            return []
+        top_k = min(top_k or self.top_k, len(keys))
+
+        query_vector = self.embedder.embed([query])[0]
+        scores = matrix @ query_vector
+        if top_k < len(scores):
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(float(scores[i]), keys[i], values[i]) for i in best]
+
+    def best_match(self, query):
+        """Chegaradan yuqori eng yaqin javob yoki None"""
+        self.queries += 1
+        results = self.search(query, top_k=1)
+        if results and results[0][0] >= self.threshold:
+            self.hits += 1
+            return results[0][2]
+        return None
+
+    def stats(self):
+        keys, _, matrix = self._snapshot
+        return {
+            'embedder': self.embedder.name,
+            'entries': len(keys),
+            'dim': int(matrix.shape[1]) if matrix is not None else 0,
+            'threshold': self.threshold,
+            'queries': self.queries,
+            'hits': self.hits,
+            'hit_rate': round(self.hits / self.queries, 4) if self.queries else 0.0,
+            'kb_version': self.version,
+        }
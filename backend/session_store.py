@@ -0,0 +1,391 @@
+# backend/session_store.py - Foydalanuvchi sessiyalari: ixcham suhbat tarixi, xotira chegarasi va disk
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from structured_log import get_logger
+
+log = get_logger('session_store')
+
+
+class Session:
+    """Bitta foydalanuvchi holati: suhbat tokenlari bitta uzluksiz massivda"""
+    __slots__ = ('user_id', 'tokens', 'turn_lengths', 'messages', 'updated_at', 'loaded_at', 'dirty')
+
+    # Obyekt va massiv sarlavhalari uchun taxminiy qo'shimcha xotira
+    OVERHEAD_BYTES = 256
+
+    def __init__(self, user_id, tokens=None, turn_lengths=None, messages=0, updated_at=None):
+        self.user_id = user_id
+        self.tokens = tokens if tokens is not None else array('I')
+        self.turn_lengths = turn_lengths if turn_lengths is not None else array('I')
+        self.messages = messages
+        self.updated_at = updated_at or time.time()
+        self.loaded_at = time.monotonic()
+        self.dirty = False
+
+    @property
+    def nbytes(self):
+        return (self.OVERHEAD_BYTES + len(self.user_id)
+                + self.tokens.itemsize * len(self.tokens)
+                + self.turn_lengths.itemsize * len(self.turn_lengths))
+
+
+class SQLiteSessionBackend:
+    """Sessiyalarni lokal SQLite faylda saqlash (qayta ishga tushishda va worker'lar orasida).
+
+    WAL rejimida o'qish yozishni kutmaydi; har bir thread o'z ulanishiga ega.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, busy_timeout_s=0.05):
+        self.path = path
+        self.busy_timeout_s = busy_timeout_s
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                user_id TEXT PRIMARY KEY,
+                tokens BLOB NOT NULL,
+                turn_lengths BLOB NOT NULL,
+                messages INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        connection.commit()
+
+    def _connection(self):
+        local = self._local
+        # Fork'dan keyin ota jarayonning ulanishi ishlatilmaydi
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=self.busy_timeout_s, check_same_thread=False)
+            local.connection.execute('PRAGMA synchronous = NORMAL')
+            local.pid = os.getpid()
+        return local.connection
+
+    def load(self, user_id):
+        row = self._connection().execute(
+            'SELECT tokens, turn_lengths, messages, updated_at FROM sessions WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        tokens, turn_lengths = array('I'), array('I')
+        tokens.frombytes(row[0])
+        turn_lengths.frombytes(row[1])
+        return Session(user_id, tokens, turn_lengths, row[2], row[3])
+
+    def save_many(self, sessions):
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO sessions (user_id, tokens, turn_lengths, messages, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(s.user_id, s.tokens.tobytes(), s.turn_lengths.tobytes(), s.messages, s.updated_at)
+                 for s in sessions]
+            )
+
+    def delete_expired(self, before):
+        connection = self._connection()
+        with connection:
+            return connection.execute('DELETE FROM sessions WHERE updated_at < ?', (before,)).rowcount
+
+
+class SessionStore:
+    """user_id bo'yicha sessiyalar: O(1) LRU, umumiy xotira chegarasi va TTL.
+
+    Disk backend berilsa, xotira kesh vazifasini bajaradi. So'rov diskni
+    kutmaydi: o'zgarishlar fon thread'ida yig'ib yoziladi, xotirada yo'q
+    sessiya esa o'sha thread'da yuklanadi (bu so'rov kontekstsiz javob
+    oladi). Eskirgan (refresh_s) nusxa qaytariladi va fonda qayta o'qiladi.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_sessions=10000, ttl_s=86400.0,
+                 max_turns=3, max_tokens=256, backend=None, flush_interval_s=0.5, refresh_s=5.0):
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.backend = backend
+        self.flush_interval_s = flush_interval_s
+        self.refresh_s = refresh_s
+
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Yozilishi kerak bo'lgan sessiyalar; None - faqat qayta yuklash uchun uyg'otish
+        self._dirty = queue.Queue()
+        # Fonda diskdan qayta o'qilishi kerak bo'lgan user_id'lar
+        self._refreshing = set()
+        # Xotirada yo'q, fonda diskdan yuklanishi kerak bo'lgan user_id'lar
+        self._loading = set()
+        self._writer = None
+        self._pid = None
+
+        # Metrikalar
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_reads = 0
+        self.loads = 0
+        self.refreshes = 0
+        self.disk_writes = 0
+        self.disk_errors = 0
+
+    def get(self, user_id):
+        """Sessiya yoki None (muddati o'tgan sessiya o'chiriladi)"""
+        now = time.time()
+        schedule = False
+        with self._lock:
+            cached = self._sessions.get(user_id)
+            if cached is not None and now - cached.updated_at > self.ttl_s:
+                self._remove(user_id)
+                self.expirations += 1
+                cached = None
+            if cached is not None:
+                self._sessions.move_to_end(user_id)
+                self.hits += 1
+                # Boshqa worker yangilagan bo'lishi mumkin: fonda qayta o'qiladi, hozir eski nusxa
+                schedule = (self.backend is not None and not cached.dirty
+                            and time.monotonic() - cached.loaded_at >= self.refresh_s
+                            and user_id not in self._refreshing)
+                if schedule:
+                    self._refreshing.add(user_id)
+            else:
+                self.misses += 1
+                # Xotirada yo'q: diskdan fonda yuklanadi, bu so'rov kontekstsiz davom etadi
+                schedule = self.backend is not None and user_id not in self._loading
+                if schedule:
+                    self._loading.add(user_id)
+
+        if schedule:
+            self._ensure_writer()
+            self._dirty.put(None)
+        return cached
+
+    def _merge_loaded(self, user_id, session, now):
+        """Diskdan o'qilgan sessiyani xotiradagisi bilan birlashtirish (lock ostida); natija yoki None"""
+        self.disk_reads += 1
+        current = self._sessions.get(user_id)
+        if current is not None and (current.dirty or (session is not None and current.updated_at >= session.updated_at)):
+            # Bu jarayondagi nusxa yangiroq (hali diskka yozilmagan)
+            current.loaded_at = time.monotonic()
+            return current
+        if session is None or now - session.updated_at > self.ttl_s:
+            # Diskda yo'q yoki muddati o'tgan (boshqa worker tozalagan)
+            self._remove(user_id)
+            return None
+        self._insert(session)
+        self._evict()
+        return session
+
+    def _refresh(self):
+        """get() rejalashtirgan sessiyalarni diskdan o'qish (yozuvchi thread'ida):
+        xotirada yo'qlari yuklanadi, eskirganlari qayta o'qiladi"""
+        with self._lock:
+            refreshing, self._refreshing = self._refreshing, set()
+            loading, self._loading = self._loading, set()
+        now = time.time()
+        for user_id in loading | refreshing:
+            try:
+                session = self.backend.load(user_id)
+            except sqlite3.Error as e:
+                # Eski nusxa (yoki kontekstsiz javob) qoladi, keyingi get() yana rejalashtiradi
+                self._count_disk_error(e)
+                continue
+            with self._lock:
+                if user_id in loading:
+                    self._merge_loaded(user_id, session, now)
+                    self.loads += 1
+                # Shu orada chiqarilgan sessiya qayta yuklanmaydi (kerak bo'lsa get() rejalashtiradi)
+                elif user_id in self._sessions:
+                    self._merge_loaded(user_id, session, now)
+                    self.refreshes += 1
+
+    def context_ids(self, user_id):
+        """Oldingi savol-javoblar tokenlari (bitta massiv) yoki bo'sh massiv"""
+        session = self.get(user_id)
+        return session.tokens if session is not None else array('I')
+
+    def append_turn(self, user_id, turn_ids):
+        """Savol-javobni tarixga qo'shish.
+
+        Chegaradan oshsa, faqat oxirgi savol-javob qoladi: siljuvchi oyna
+        har safar prefiksni o'zgartirib, KV keshdan foydalanishga yo'l qo'ymasdi.
+        """
+        turn = array('I', turn_ids)
+
+        # O'qish-o'zgartirish-yozish bitta lock ostida: parallel savol-javoblar yo'qolmaydi.
+        # Diskdan o'qilmaydi: get() rejalashtirgan yuklash odatda javob tayyor bo'lguncha
+        # tugaydi, aks holda tarix yangidan boshlanadi (disk band bo'lgandagidek)
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None and time.time() - session.updated_at > self.ttl_s:
+                session = None
+            tokens = array('I', session.tokens) if session else array('I')
+            turn_lengths = array('I', session.turn_lengths) if session else array('I')
+            tokens.extend(turn)
+            turn_lengths.append(len(turn))
+            if len(turn_lengths) > self.max_turns or len(tokens) > self.max_tokens:
+                tokens, turn_lengths = array('I'), array('I')
+                if len(turn) <= self.max_tokens:
+                    tokens, turn_lengths = turn, array('I', [len(turn)])
+
+            # O'qiyotgan thread'lar eski massivlarni ko'radi: yangi obyekt bilan almashtiriladi
+            updated = Session(user_id, tokens, turn_lengths, (session.messages if session else 0) + 1)
+            updated.dirty = self.backend is not None
+            self._insert(updated)
+            self._evict()
+
+        if self.backend is not None:
+            self._ensure_writer()
+            self._dirty.put(updated)
+        return updated
+
+    def _insert(self, session):
+        old = self._sessions.pop(session.user_id, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._sessions[session.user_id] = session
+        self._bytes += session.nbytes
+
+    def _remove(self, user_id):
+        session = self._sessions.pop(user_id, None)
+        if session is not None:
+            self._bytes -= session.nbytes
+
+    def _evict(self):
+        """Eng uzoq ishlatilmagan sessiyalarni chegaraga tushguncha chiqarish.
+
+        Hali yozilmagan sessiya ham chiqarilishi mumkin: yozuvchi navbati
+        obyektning o'zini saqlaydi.
+        """
+        now = time.time()
+        while self._sessions and (self._bytes > self.max_bytes or len(self._sessions) > self.max_sessions):
+            user_id, session = self._sessions.popitem(last=False)
+            self._bytes -= session.nbytes
+            if now - session.updated_at > self.ttl_s:
+                self.expirations += 1
+            else:
+                self.evictions += 1
+
+    def _ensure_writer(self):
+        """Diskka yozuvchi thread'ni kerak bo'lganda ishga tushirish (fork'dan keyin ham)"""
+        pid = os.getpid()
+        if self._writer is not None and self._writer.is_alive() and self._pid == pid:
+            return
+        with self._lock:
+            if self._writer is not None and self._writer.is_alive() and self._pid == pid:
+                return
+            if self._pid is not None and self._pid != pid:
+                # Fork'dan keyin ota jarayonning navbatlari yaroqsiz
+                self._dirty = queue.Queue()
+                self._refreshing = set()
+                self._loading = set()
+            self._pid = pid
+            self._writer = threading.Thread(target=self._write_behind, name='session-writer', daemon=True)
+            self._writer.start()
+
+    def _write_behind(self):
+        last_cleanup = time.monotonic()
+        while True:
+            first = self._dirty.get()
+            # Oyna davomida kelgan o'zgarishlar bitta tranzaksiyada yoziladi (har foydalanuvchining oxirgisi)
+            time.sleep(self.flush_interval_s)
+            pending = {first.user_id: first} if first is not None else {}
+            while True:
+                try:
+                    session = self._dirty.get_nowait()
+                except queue.Empty:
+                    break
+                if session is not None:
+                    pending[session.user_id] = session
+            if pending:
+                self._save(list(pending.values()))
+            # Yozilgandan keyin: bu jarayonning o'zgarishlari diskdagidan eski bo'lib qolmaydi
+            self._refresh()
+
+            if time.monotonic() - last_cleanup > max(self.ttl_s / 10.0, 60.0):
+                last_cleanup = time.monotonic()
+                try:
+                    self.backend.delete_expired(time.time() - self.ttl_s)
+                except sqlite3.Error as e:
+                    self._count_disk_error(e)
+
+    def flush(self):
+        """Xotiradagi barcha yozilmagan sessiyalarni darhol diskka yozish"""
+        if self.backend is None:
+            return
+        with self._lock:
+            sessions = [session for session in self._sessions.values() if session.dirty]
+        if sessions:
+            self._save(sessions)
+
+    def _save(self, sessions):
+        try:
+            self.backend.save_many(sessions)
+        except sqlite3.Error as e:
+            self._count_disk_error(e)
+            # Keyingi oynada qayta urinamiz
+            for session in sessions:
+                self._dirty.put(session)
+            return
+        with self._lock:
+            for session in sessions:
+                session.dirty = False
+                session.loaded_at = time.monotonic()
+            self.disk_writes += len(sessions)
+
+    def _count_disk_error(self, error):
+        with self._lock:
+            self.disk_errors += 1
+        log.warning('session_disk_error', extra={'backend': self.backend.name, 'error': str(error)})
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': self.backend.name if self.backend else 'memory',
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_s': self.ttl_s,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'disk_reads': self.disk_reads,
+                'loads': self.loads,
+                'refreshes': self.refreshes,
+                'pending_loads': len(self._loading),
+                'pending_refreshes': len(self._refreshing),
+                'disk_writes': self.disk_writes,
+                'disk_errors': self.disk_errors,
+                'pending_writes': self._dirty.qsize(),
+            }
+
+
+def create_session_store(backend, db_path, max_mb, max_sessions, ttl_s, max_turns, max_tokens):
+    """Sozlamaga ko'ra sessiyalar saqlagichi"""
+    disk = SQLiteSessionBackend(db_path) if backend == 'sqlite' else None
+    return SessionStore(
+        max_bytes=int(max_mb * 1024 * 1024),
+        max_sessions=max_sessions,
+        ttl_s=ttl_s,
+        max_turns=max_turns,
+        max_tokens=max_tokens,
+        backend=disk
+    )
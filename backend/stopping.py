@@ -0,0 +1,118 @@
+# backend/stopping.py - GPT-2 javobini erta to'xtatish: gap oxiri, yangi qator va noto'g'ri javob
+
+import threading
+
+SENTENCE_END = ('.', '!', '?')
+STOP_REASONS = ('sentence', 'newline', 'rejected')
+# UTF-8 belgi 4 baytgacha: byte-level BPE'da 4 tokendan oshmaydi
+MAX_CHAR_TOKENS = 4
+
+
+class AnswerStoppingCriteria:
+    """transformers StoppingCriteria: batch'dagi har bir qator alohida to'xtatiladi.
+
+    "Answer:" dan keyingi matn har qadamda tekshiriladi: yangi qator yoki
+    tugagan gap - javob tayyor; noto'g'ri javob belgisi chiqsa - qolgan
+    tokenlarni hisoblashning ma'nosi yo'q.
+    """
+
+    def __init__(self, tokenizer, start, is_rejected, stop_at_sentence=True, min_chars=6):
+        # tokenizer: decode_batch(rows) -> matnlar (tokenization.CachedTokenizer)
+        self.tokenizer = tokenizer
+        self.start = start
+        self.is_rejected = is_rejected
+        self.stop_at_sentence = stop_at_sentence
+        self.min_chars = min_chars
+        self.done = None
+        self.texts = None
+        self.decoded = None
+        self._done_mask = None
+        self.reasons = {}
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.done is None:
+            rows = input_ids.shape[0]
+            self.done = [False] * rows
+            self.texts = [''] * rows
+            self.decoded = [0] * rows
+            self._done_mask = input_ids.new_zeros(rows, dtype=bool)
+        # Faqat yangi tokenlar decode qilinadi, to'xtamagan qatorlar bitta decode_batch chaqiruvida
+        pending = [row for row, done in enumerate(self.done) if not done]
+        if not pending:
+            return self._done_mask
+        offset = self.start + min(self.decoded[row] for row in pending)
+        rows = input_ids[:, offset:].tolist()
+        chunks = self.tokenizer.decode_batch([rows[row][self.start + self.decoded[row] - offset:] for row in pending])
+        stopped = False
+        for row, chunk in zip(pending, chunks):
+            new_tokens = input_ids.shape[1] - self.start - self.decoded[row]
+            if chunk.endswith('\ufffd') and new_tokens < MAX_CHAR_TOKENS:
+                # Ko'p baytli belgining qolgan baytlari keyingi tokenlarda
+                continue
+            self.texts[row] += chunk
+            self.decoded[row] += new_tokens
+            reason = self.check(self.texts[row])
+            if reason:
+                self.done[row] = True
+                self.reasons[row] = reason
+                stopped = True
+        if stopped:
+            self._done_mask = input_ids.new_tensor(self.done).bool()
+        return self._done_mask
+
+    def check(self, text):
+        """Javob matni bo'yicha to'xtash sababi yoki None"""
+        answer = text.strip()
+        if not answer:
+            # Javob boshidagi bo'sh qatorlar o'tkazib yuboriladi
+            return None
+        if self.is_rejected(answer):
+            return 'rejected'
+        if '\n' in text.lstrip():
+            return 'newline'
+        if (self.stop_at_sentence and len(answer) >= self.min_chars and answer.endswith(SENTENCE_END)
+                and not (answer.endswith('.') and answer[-2:-1].isdigit())):
+            # "3." kabi o'nli son boshlanishi gap oxiri hisoblanmaydi
+            return 'sentence'
+        return None
+
+
+class GenerationStats:
+    """So'rov bo'yicha yaratilgan tokenlar, urinishlar va to'xtash sabablari"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.accepted = 0
+        self.attempts = 0
+        self.retries = 0
+        self.tokens = 0
+        self.stops = dict.fromkeys(STOP_REASONS + ('length',), 0)
+
+    def record_attempt(self, criteria, rows):
+        """Bitta generate chaqiruvi: to'xtamagan qatorlar max_new_tokens yoki eos'gacha borgan"""
+        with self._lock:
+            for row in range(rows):
+                reason = criteria.reasons.get(row, 'length') if criteria else 'length'
+                self.stops[reason] += 1
+
+    def record_request(self, attempts, tokens, accepted):
+        with self._lock:
+            self.requests += 1
+            self.attempts += attempts
+            self.retries += attempts - 1
+            self.tokens += tokens
+            self.accepted += accepted
+
+    def stats(self):
+        with self._lock:
+            requests = self.requests or 1
+            return {
+                'requests': self.requests,
+                'accepted': self.accepted,
+                'acceptance_rate': round(self.accepted / requests, 4) if self.requests else 0.0,
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'avg_tokens_per_request': round(self.tokens / requests, 2) if self.requests else 0.0,
+                'stops': dict(self.stops),
+            }
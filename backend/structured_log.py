@@ -0,0 +1,71 @@
+# backend/structured_log.py - JSON qatorli loglar, fon thread'ida yoziladi (so'rov I/O kutmaydi)
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+# LogRecord'ning standart maydonlari: qolganlari `extra` orqali berilgan qiymatlar
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Har bir yozuv - bitta JSON qator"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level='INFO', stream=None):
+    """'ai_tutor' loggerini navbat orqali yozadigan qilish (bir marta chaqiriladi)"""
+    global _listener
+    logger = logging.getLogger('ai_tutor')
+    if _listener is not None:
+        return logger
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JSONFormatter())
+
+    # So'rov thread'i faqat navbatga qo'yadi; yozish QueueListener thread'ida
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(level)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(lambda: _listener.stop())
+    # Fork'dan keyin (gunicorn preload) ota jarayonning yozuvchi thread'i bolada yo'q
+    os.register_at_fork(after_in_child=lambda: _restart_listener(log_queue, handler))
+    return logger
+
+
+def _restart_listener(log_queue, handler):
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def get_logger(name=None):
+    return logging.getLogger(f'ai_tutor.{name}' if name else 'ai_tutor')
+
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000.0, 3)
@@ -0,0 +1,26 @@
+# backend/textutils.py - Matnni normallashtirish yordamchilari
+
+import re
+
+# O'zbek lotin yozuvida apostrof turli belgilar bilan yoziladi: o'zbek, oʻzbek, o‘zbek...
+_APOSTROPHES = str.maketrans({
+    '‘': "'", '’': "'", 'ʻ': "'", 'ʼ': "'",
+    '`': "'", '´': "'", '′': "'"
+})
+_WHITESPACE_RE = re.compile(r'\s+')
+_TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+
+
+def normalize_text(text):
+    """Kichik harf, yagona apostrof va bitta bo'sh joy"""
+    return _WHITESPACE_RE.sub(' ', text.lower().translate(_APOSTROPHES)).strip()
+
+
+def tokenize(normalized_text):
+    """Normallashtirilgan matndan so'zlar ro'yxati (apostrofli so'zlar bitta token)"""
+    return _TOKEN_RE.findall(normalized_text)
+
+
+def token_spans(normalized_text):
+    """So'zlar va ularning (boshi, oxiri) pozitsiyalari"""
+    return [(m.group(), m.start(), m.end()) for m in _TOKEN_RE.finditer(normalized_text)]
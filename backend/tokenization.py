@@ -0,0 +1,265 @@
+# backend/tokenization.py - GPT-2 tokenizer: Rust (fast) varianti, moslik tekshiruvi va tokenlash keshi
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from structured_log import get_logger
+
+log = get_logger('tokenization')
+
+# Qisqa matnlarda Rust thread pool'i foyda bermaydi; gunicorn fork'idan keyingi ogohlantirish ham bo'lmaydi
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+# Moslik tekshiruvi matnlari: prompt shabloni, o'zbekcha apostroflar, ifodalar, bo'sh joylar, unicode
+PARITY_SAMPLES = (
+    "Question:",
+    "\n",
+    " Integral nima?\nAnswer:",
+    " O'zbekiston poytaxti qayer?\nAnswer:",
+    "G'ayrat, sho'rva va o‘zbek apostroflari: ʻ ʼ ’",
+    " 2+2*3 = 8, x^2 - 5x + 6 = 0; sin(30°) ≈ 0.5",
+    "  ikki  bo'sh   joy\n\n\tva tab  ",
+    "I'm sure they'll say it's fine, we've done it.",
+    "🤖 Emoji 📚, kirill: Привет, мир! 中文",
+)
+
+
+def _bytes_to_unicode():
+    """GPT-2 byte -> ko'rinadigan unicode belgi jadvali"""
+    printable = (list(range(ord('!'), ord('~') + 1)) + list(range(ord('¡'), ord('¬') + 1))
+                 + list(range(ord('®'), ord('ÿ') + 1)))
+    chars = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            chars.append(256 + extra)
+            extra += 1
+    return dict(zip(printable, map(chr, chars)))
+
+
+class PythonBPE:
+    """GPT-2 byte-level BPE sof Python'da (transformers 4 dagi sekin GPT2Tokenizer algoritmi).
+
+    Faqat moslik tekshiruvi va benchmark uchun: transformers 5 da sekin variant yo'q.
+    """
+
+    PATTERN = r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+
+    def __init__(self, vocab, merges):
+        import regex
+        self.encoder = vocab
+        self.decoder = {token_id: token for token, token_id in vocab.items()}
+        self.byte_encoder = _bytes_to_unicode()
+        self.byte_decoder = {char: byte for byte, char in self.byte_encoder.items()}
+        self.bpe_ranks = {tuple(merge.split()): rank for rank, merge in enumerate(merges)}
+        self.pattern = regex.compile(self.PATTERN)
+        self.cache = {}
+
+    @classmethod
+    def from_pretrained(cls, model_name):
+        from transformers.utils import cached_file
+        with open(cached_file(model_name, 'vocab.json'), encoding='utf-8') as f:
+            vocab = json.load(f)
+        with open(cached_file(model_name, 'merges.txt'), encoding='utf-8') as f:
+            # Birinchi qator: "#version: ..."
+            merges = [line for line in f.read().split('\n')[1:] if line]
+        return cls(vocab, merges)
+
+    def _bpe(self, token):
+        word = self.cache.get(token)
+        if word is not None:
+            return word
+        word = tuple(token)
+        while len(word) > 1:
+            pairs = set(zip(word, word[1:]))
+            bigram = min(pairs, key=lambda pair: self.bpe_ranks.get(pair, float('inf')))
+            if bigram not in self.bpe_ranks:
+                break
+            first, second = bigram
+            merged = []
+            i = 0
+            while i < len(word):
+                if i < len(word) - 1 and word[i] == first and word[i + 1] == second:
+                    merged.append(first + second)
+                    i += 2
+                else:
+                    merged.append(word[i])
+                    i += 1
+            word = tuple(merged)
+        self.cache[token] = word
+        return word
+
+    def encode(self, text):
+        ids = []
+        for piece in self.pattern.findall(text):
+            piece = ''.join(self.byte_encoder[byte] for byte in piece.encode('utf-8'))
+            ids.extend(self.encoder[token] for token in self._bpe(piece))
+        return ids
+
+    def decode(self, token_ids, **kwargs):
+        text = ''.join(self.decoder[token_id] for token_id in token_ids)
+        return bytearray(self.byte_decoder[char] for char in text).decode('utf-8', errors='replace')
+
+
+def slow_tokenizer_class():
+    """transformers'ning sekin GPT2Tokenizer klassi; 5 da u fast'ning taxallusi - None"""
+    import transformers
+    if issubclass(transformers.GPT2Tokenizer, transformers.PreTrainedTokenizerFast):
+        return None
+    return transformers.GPT2Tokenizer
+
+
+def load_reference_tokenizer(model_name):
+    """Sekin (Python) tokenizer: transformers 4 da GPT2Tokenizer, 5 da PythonBPE"""
+    slow_class = slow_tokenizer_class()
+    if slow_class is not None:
+        return slow_class.from_pretrained(model_name)
+    return PythonBPE.from_pretrained(model_name)
+
+
+def check_parity(tokenizer, reference, samples=PARITY_SAMPLES):
+    """Token id'lari yoki qayta tiklangan matni sekin tokenizer'dan farq qiladigan matnlar"""
+    mismatches = []
+    for text in samples:
+        expected = reference.encode(text)
+        ids = tokenizer.encode(text)
+        if ids != expected or (tokenizer.decode(ids, clean_up_tokenization_spaces=False)
+                               != reference.decode(expected, clean_up_tokenization_spaces=False)):
+            mismatches.append(text)
+    return mismatches
+
+
+def load_tokenizer(model_name, kind='fast', parity_check=True, extra_samples=()):
+    """(tokenizer, ma'lumot): 'fast' - Rust tokenizer; sekin tokenizer bilan mos kelmasa 'slow' ga qaytiladi.
+
+    transformers 5 da sekin GPT2Tokenizer yo'q: u holda fast tokenizer qoladi va
+    moslik buzilgani faqat ma'lumotda (parity_ok, slow_available) ko'rsatiladi.
+    """
+    import transformers
+    slow_class = slow_tokenizer_class()
+    info = {'requested': kind, 'parity': None, 'parity_ok': None, 'slow_available': slow_class is not None}
+    if kind == 'fast' or slow_class is None:
+        tokenizer = transformers.GPT2TokenizerFast.from_pretrained(model_name)
+        if parity_check:
+            samples = PARITY_SAMPLES + tuple(extra_samples)
+            mismatches = check_parity(tokenizer, load_reference_tokenizer(model_name), samples)
+            info['parity'] = f"{len(samples) - len(mismatches)}/{len(samples)}"
+            info['parity_ok'] = not mismatches
+            if mismatches:
+                log.warning('tokenizer_parity_failed', extra={
+                    'mismatches': len(mismatches), 'sample': mismatches[0], 'slow_available': slow_class is not None
+                })
+                if slow_class is not None:
+                    print(f"⚠️ Fast tokenizer sekin tokenizer'dan farq qildi ({len(mismatches)} ta matn), sekin variant ishlatiladi")
+                    tokenizer = slow_class.from_pretrained(model_name)
+                else:
+                    print(f"⚠️ Fast tokenizer sekin tokenizer'dan farq qildi ({len(mismatches)} ta matn); "
+                          f"bu transformers versiyasida sekin variant yo'q, fast tokenizer qoldi")
+        if kind != 'fast':
+            log.warning('tokenizer_slow_unavailable', extra={'requested': kind})
+    else:
+        tokenizer = slow_class.from_pretrained(model_name)
+    info['class'] = type(tokenizer).__name__
+    info['fast'] = bool(getattr(tokenizer, 'is_fast', False))
+    return tokenizer, info
+
+
+class CachedTokenizer:
+    """Tokenizer ustida LRU kesh (matn -> token id'lari) va batch encode/decode.
+
+    Prompt shablonining doimiy qismlari va tez-tez keladigan xabarlar qayta
+    tokenlanmaydi. Fast tokenizer'da Rust tokenizer to'g'ridan-to'g'ri chaqiriladi
+    (transformers o'ramining har chaqiruvdagi xarajatisiz). Qaytarilgan
+    ro'yxatlar nusxa - chaqiruvchi o'zgartirishi mumkin.
+    """
+
+    def __init__(self, tokenizer, max_entries=4096):
+        self.tokenizer = tokenizer
+        self.backend = tokenizer.backend_tokenizer if getattr(tokenizer, 'is_fast', False) else None
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, text):
+        with self._lock:
+            ids = self._cache.get(text)
+            if ids is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(text)
+            self.hits += 1
+            return list(ids)
+
+    def _store(self, text, ids):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._cache[text] = tuple(ids)
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def _encode(self, texts):
+        if self.backend is not None:
+            encode_batch = getattr(self.backend, 'encode_batch_fast', self.backend.encode_batch)
+            return [encoding.ids for encoding in encode_batch(texts, add_special_tokens=False)]
+        return [self.tokenizer.encode(text, add_special_tokens=False) for text in texts]
+
+    def encode(self, text):
+        ids = self._lookup(text)
+        if ids is None:
+            if self.backend is not None:
+                ids = self.backend.encode(text, add_special_tokens=False).ids
+            else:
+                ids = self.tokenizer.encode(text, add_special_tokens=False)
+            self._store(text, ids)
+        return ids
+
+    def encode_batch(self, texts):
+        """Bir nechta matn: keshda yo'qlari tokenizer'ning bitta batch chaqiruvida"""
+        results = [self._lookup(text) for text in texts]
+        missing = {}
+        for i, (text, ids) in enumerate(zip(texts, results)):
+            if ids is None:
+                missing.setdefault(text, []).append(i)
+        if missing:
+            encoded = self._encode(list(missing))
+            for (text, positions), ids in zip(missing.items(), encoded):
+                self._store(text, ids)
+                for i in positions:
+                    results[i] = list(ids)
+        return results
+
+    def decode(self, token_ids):
+        if self.backend is not None:
+            return self.backend.decode(token_ids, skip_special_tokens=True)
+        return self.tokenizer.decode(token_ids, skip_special_tokens=True)
+
+    def decode_batch(self, rows):
+        if not rows:
+            return []
+        if self.backend is not None:
+            return self.backend.decode_batch(rows, skip_special_tokens=True)
+        return self.tokenizer.batch_decode(rows, skip_special_tokens=True)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._cache),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,317 @@
+# backend/web_search.py - Web qidiruv: ulanishlar pool'i, kesh, circuit breaker va provayderlar
+
+import asyncio
+import json
+import threading
+import time
+
+import requests
+from lxml import etree
+from requests.adapters import HTTPAdapter
+
+from response_cache import TTLCache, cache_key
+from structured_log import get_logger
+
+log = get_logger('web_search')
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class SearchProvider:
+    """Qidiruv provayderi interfeysi: so'rovni tuzish va javobni tahlil qilish.
+
+    `parse` javob tanasini bo'laklar (bytes) ketma-ketligi sifatida oladi,
+    shuning uchun yetarli natija topilgach, qolgan sahifa o'qilmaydi.
+    """
+
+    name = None
+
+    def build_request(self, query):
+        """(url, params, headers)"""
+        raise NotImplementedError
+
+    def parse(self, chunks, max_results):
+        """Natija matnlari ro'yxati"""
+        raise NotImplementedError
+
+
+class GoogleProvider(SearchProvider):
+    """Google qidiruv sahifasi (HTML) - lxml bilan oqimli tahlil"""
+
+    name = 'google'
+    RESULT_CLASS = 'BVG0Nb'
+
+    def __init__(self, base_url='https://www.google.com/search', language='uz'):
+        self.base_url = base_url
+        self.language = language
+
+    def build_request(self, query):
+        return self.base_url, {'q': query, 'hl': self.language}, {'User-Agent': USER_AGENT}
+
+    def parse(self, chunks, max_results):
+        parser = etree.HTMLPullParser(events=('end',), tag='div')
+        results = []
+        for chunk in chunks:
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                classes = (element.get('class') or '').split()
+                if self.RESULT_CLASS not in classes:
+                    continue
+                text = ''.join(element.itertext())
+                if len(text) > 50:
+                    results.append(text[:200] + "...")
+                    if len(results) >= max_results:
+                        # Qolgan sahifani o'qish shart emas
+                        return results
+        return results
+
+
+class JSONProvider(SearchProvider):
+    """JSON qaytaruvchi qidiruv xizmati: GET <url>?q=... -> {"results": ["...", ...]}.
+
+    Lokal stub server yoki ichki qidiruv xizmati uchun.
+    """
+
+    name = 'json'
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def build_request(self, query):
+        return self.base_url, {'q': query}, {'Accept': 'application/json'}
+
+    def parse(self, chunks, max_results):
+        data = json.loads(b''.join(chunks).decode('utf-8'))
+        return [str(item)[:200] for item in data.get('results', [])[:max_results]]
+
+
+class CircuitBreaker:
+    """Ketma-ket xatoliklardan keyin upstream'ga so'rovlarni vaqtincha to'xtatish"""
+
+    def __init__(self, failure_threshold=3, reset_timeout_s=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout_s:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """So'rov yuborish mumkinmi (half-open holatda faqat bitta sinov so'rovi)"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release_probe(self):
+        """Sinov so'rovi natijasiz tugadi (bekor qilindi): keyingi so'rov sinov bo'lishi mumkin"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class WebSearchClient:
+    """Pool'dagi HTTP sessiya, natijalar keshi, parallel so'rovlar chegarasi va circuit breaker"""
+
+    CHUNK_SIZE = 16 * 1024
+
+    def __init__(self, provider, timeout_s=3.0, max_concurrency=4, cache_ttl_s=300.0,
+                 cache_size=1000, breaker_failures=3, breaker_reset_s=30.0, max_bytes=1024 * 1024):
+        self.provider = provider
+        self.timeout_s = timeout_s
+        self.cache_ttl_s = cache_ttl_s
+        self.max_bytes = max_bytes
+        self.max_concurrency = max_concurrency
+
+        # Keep-alive ulanishlar qayta ishlatiladi
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(max_concurrency, 1), max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.cache = TTLCache(cache_size)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_s)
+        self._slots = threading.BoundedSemaphore(max(max_concurrency, 1))
+        self._async_client = None
+        self._async_loop = None
+
+        # Metrikalar
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rejected_busy = 0
+        self.rejected_open = 0
+        self.total_latency_s = 0.0
+
+    def search(self, query, max_results=3):
+        """Natijalar ro'yxati; upstream band yoki ishlamayotgan bo'lsa, None (kutmasdan)"""
+        key, cached = self._admit(query, max_results)
+        if key is None:
+            return cached
+
+        started = time.perf_counter()
+        try:
+            results = self._fetch(query, max_results)
+        except Exception as e:
+            return self._record_failure(e)
+        except BaseException:
+            # Masalan, asyncio.CancelledError: upstream haqida xulosa yo'q
+            self.breaker.release_probe()
+            raise
+        finally:
+            self._release(started)
+        return self._record_success(key, results)
+
+    async def search_async(self, query, max_results=3):
+        """search() ning asyncio varianti (httpx orqali, event loop'ni bloklamaydi)"""
+        key, cached = self._admit(query, max_results)
+        if key is None:
+            return cached
+
+        started = time.perf_counter()
+        try:
+            results = await asyncio.wait_for(self._fetch_async(query, max_results), self.timeout_s)
+        except Exception as e:
+            return self._record_failure(e)
+        except BaseException:
+            # Masalan, asyncio.CancelledError: upstream haqida xulosa yo'q
+            self.breaker.release_probe()
+            raise
+        finally:
+            self._release(started)
+        return self._record_success(key, results)
+
+    def _admit(self, query, max_results):
+        """(kalit, None) - so'rov yuborish mumkin (slot olingan); (None, natija) - keshdan yoki rad etildi"""
+        key = (self.provider.name, cache_key(query), max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return None, cached
+
+        # Sekin upstream barcha worker'larni band qilmasligi uchun kutilmaydi.
+        # Slot breaker'dan oldin olinadi: rad etilgan so'rov half-open sinovini band qilib qolmaydi
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected_busy')
+            return None, None
+
+        if not self.breaker.allow():
+            self._slots.release()
+            self._count('rejected_open')
+            return None, None
+        return key, None
+
+    def _release(self, started):
+        self._slots.release()
+        with self._stats_lock:
+            self.requests += 1
+            self.total_latency_s += time.perf_counter() - started
+
+    def _record_failure(self, error):
+        self.breaker.record_failure()
+        self._count('errors')
+        log.warning('web_search_failed', extra={'error': str(error) or type(error).__name__})
+        return None
+
+    def _record_success(self, key, results):
+        self.breaker.record_success()
+        self.cache.set(key, results, self.cache_ttl_s)
+        return results
+
+    def _fetch(self, query, max_results):
+        url, params, headers = self.provider.build_request(query)
+        deadline = time.monotonic() + self.timeout_s
+        with self.session.get(url, params=params, headers=headers, timeout=self.timeout_s, stream=True) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            return self.provider.parse(self._iter_body(response, deadline), max_results)
+
+    async def _fetch_async(self, query, max_results):
+        url, params, headers = self.provider.build_request(query)
+        async with self._get_async_client().stream('GET', url, params=params, headers=headers) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            # parse() sinxron iterator kutadi: tana hajm chegarasigacha o'qiladi
+            chunks = []
+            received = 0
+            async for chunk in response.aiter_bytes(self.CHUNK_SIZE):
+                received += len(chunk)
+                if received > self.max_bytes:
+                    break
+                chunks.append(chunk)
+        return self.provider.parse(chunks, max_results)
+
+    def _get_async_client(self):
+        """Event loop'ga bog'langan httpx klienti (keep-alive ulanishlar pool'i bilan)"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                timeout=self.timeout_s,
+                limits=httpx.Limits(max_connections=max(self.max_concurrency, 1), max_keepalive_connections=4)
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    def _iter_body(self, response, deadline):
+        """Javob tanasini bo'laklab o'qish (umumiy vaqt va hajm chegarasi bilan)"""
+        received = 0
+        for chunk in response.iter_content(self.CHUNK_SIZE):
+            received += len(chunk)
+            if received > self.max_bytes:
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError("Web search javobi juda sekin")
+            yield chunk
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {
+                'provider': self.provider.name,
+                'requests': self.requests,
+                'errors': self.errors,
+                'rejected_busy': self.rejected_busy,
+                'rejected_open': self.rejected_open,
+                'avg_latency_ms': round(self.total_latency_s / self.requests * 1000.0, 3) if self.requests else 0.0,
+                'max_concurrency': self.max_concurrency,
+            }
+        stats['breaker_state'] = self.breaker.state
+        stats['cache'] = self.cache.stats()
+        return stats
+
+
+def create_provider(name, url=None):
+    """Sozlamaga ko'ra provayder yaratish"""
+    if name == 'json':
+        if not url:
+            raise ValueError("JSON provayder uchun URL kerak (AI_TUTOR_WEB_SEARCH_URL)")
+        return JSONProvider(url)
+    return GoogleProvider(url) if url else GoogleProvider()
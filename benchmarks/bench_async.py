@@ -0,0 +1,205 @@
+# benchmarks/bench_async.py - Aralash yuklama: og'ir so'rovlar paytida arzon yo'llar kechikishi (WSGI va ASGI)
+#
+# Ishlatish (loyiha ildizidan):
+#     python benchmarks/bench_async.py [--servers wsgi,asgi] [--heavy 16] [--duration 20] [--model gpt2]
+#
+# Har bir server alohida jarayonda bitta worker bilan ishga tushadi:
+#   wsgi - gunicorn gthread (gunicorn.conf.py, AI_TUTOR_WORKER_THREADS thread)
+#   asgi - uvicorn asgi:app
+# `--heavy` ta klient to'xtovsiz GPT-2 va sekin web qidiruv (stub) so'rovlarini yuboradi,
+# bitta o'lchov klienti esa /api/status, /api/quiz va bilimlar bazasi savollarini ketma-ket
+# yuborib, ularning kechikishini yozadi.
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BACKEND_DIR = os.path.join(ROOT, 'backend')
+
+CHEAP_REQUESTS = [
+    ('status', 'GET', '/api/status', None),
+    ('quiz', 'POST', '/api/quiz', {'topic': 'fizika', 'difficulty': 'easy'}),
+    ('kb', 'POST', '/api/chat', {'message': 'Integral nima?'}),
+]
+
+
+class SlowSearchHandler(BaseHTTPRequestHandler):
+    """Sekin qidiruv xizmati (JSON provayder formatida)"""
+
+    latency_s = 1.0
+
+    def do_GET(self):
+        time.sleep(self.latency_s)
+        body = json.dumps({'results': [f"Stub natija {i}" for i in range(1, 4)]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def request(port, method, path, payload, timeout=120.0):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body else {}
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def start_server(kind, port, env):
+    if kind == 'wsgi':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', 'app:app']
+        env = dict(env, AI_TUTOR_WORKERS='1')
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{kind} server ishga tushmadi (kod {process.returncode})")
+        try:
+            if request(port, 'GET', '/api/ready', None, timeout=2.0) == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError(f"{kind} server tayyor bo'lmadi")
+
+
+def tag(n):
+    """Raqamsiz noyob qo'shimcha (raqamlar savolni matematika yo'liga burib yuboradi)"""
+    letters = ''
+    while True:
+        n, digit = divmod(n, 26)
+        letters += chr(ord('a') + digit)
+        if not n:
+            return letters
+
+
+def run_mixed_load(port, heavy_clients, duration_s):
+    stop = threading.Event()
+    heavy_done = [0]
+    heavy_errors = [0]
+    lock = threading.Lock()
+
+    def heavy(client_id):
+        i = 0
+        while not stop.is_set():
+            i += 1
+            if i % 2:
+                payload = {'message': f"Tell me a story about the sea {tag(client_id)} {tag(i)}", 'user_id': f"heavy-{client_id}"}
+            else:
+                payload = {'message': f"bugungi yangiliklar {tag(client_id)} {tag(i)}"}
+            try:
+                status = request(port, 'POST', '/api/chat', payload)
+            except OSError:
+                status = 0
+            with lock:
+                heavy_done[0] += 1
+                heavy_errors[0] += status != 200
+
+    threads = [threading.Thread(target=heavy, args=(n,), daemon=True) for n in range(heavy_clients)]
+    for thread in threads:
+        thread.start()
+    # Og'ir so'rovlar navbatga tushishi uchun
+    time.sleep(1.0)
+
+    latencies = {name: [] for name, _, _, _ in CHEAP_REQUESTS}
+    started = time.monotonic()
+    while time.monotonic() - started < duration_s:
+        for name, method, path, payload in CHEAP_REQUESTS:
+            probe_started = time.perf_counter()
+            request(port, method, path, payload)
+            latencies[name].append(time.perf_counter() - probe_started)
+
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=120)
+    elapsed = time.monotonic() - started
+    return latencies, heavy_done[0] / elapsed, heavy_errors[0]
+
+
+def summarize(values):
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000.0
+
+    return {'count': len(ordered), 'mean_ms': statistics.mean(ordered) * 1000.0,
+            'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Og'ir yuklama paytida arzon yo'llar kechikishi")
+    parser.add_argument('--servers', default='wsgi,asgi')
+    parser.add_argument('--heavy', type=int, default=16, help="og'ir so'rov yuboruvchi klientlar")
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--search-latency-ms', type=float, default=1000.0)
+    parser.add_argument('--model', help="AI_TUTOR_MODEL_NAME (standart - config'dagi)")
+    args = parser.parse_args()
+
+    SlowSearchHandler.latency_s = args.search_latency_ms / 1000.0
+    stub = ThreadingHTTPServer(('127.0.0.1', 0), SlowSearchHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    env = dict(os.environ)
+    env.update({
+        'AI_TUTOR_WEB_SEARCH_PROVIDER': 'json',
+        'AI_TUTOR_WEB_SEARCH_URL': f"http://127.0.0.1:{stub.server_address[1]}/search",
+        'AI_TUTOR_LOG_LEVEL': 'WARNING',
+    })
+    if args.model:
+        env['AI_TUTOR_MODEL_NAME'] = args.model
+
+    results = {}
+    for kind in [name.strip() for name in args.servers.split(',') if name.strip()]:
+        port = free_port()
+        process = start_server(kind, port, env)
+        try:
+            latencies, heavy_rps, heavy_errors = run_mixed_load(port, args.heavy, args.duration)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        results[kind] = {
+            'heavy_rps': heavy_rps,
+            'heavy_errors': heavy_errors,
+            'cheap': {name: summarize(values) for name, values in latencies.items() if values},
+        }
+
+    stub.shutdown()
+    print(f"Og'ir klientlar: {args.heavy}, web stub: {args.search_latency_ms:.0f} ms, davomiylik: {args.duration:.0f} s")
+    print(f"{'server':<7}{'route':<8}{'count':>7}{'p50_ms':>9}{'p95_ms':>9}{'p99_ms':>9}{'heavy_rps':>11}{'err':>5}")
+    for kind, r in results.items():
+        for name, s in r['cheap'].items():
+            print(f"{kind:<7}{name:<8}{s['count']:>7}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}"
+                  f"{r['heavy_rps']:>11.2f}{r['heavy_errors']:>5}")
+
+
+if __name__ == '__main__':
+    main()
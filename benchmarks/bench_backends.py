@@ -0,0 +1,160 @@
+# benchmarks/bench_backends.py - GPT-2 inference backend'larini solishtirish (tezlik, xotira, aniqlik)
+#
+# Ishlatish (loyiha ildizidan):
+#     python benchmarks/bench_backends.py [--backends eager,int8,compile] [--model gpt2] [--threads 1]
+#
+# Har bir backend alohida jarayonda ishlaydi, shuning uchun peak RSS bir-biriga aralashmaydi.
+# Aniqlik eager (float32) natijalariga nisbatan: greedy tokenlar va keyingi token top-1 mosligi.
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+PROMPTS = [
+    "Question: What is physics?\nAnswer:",
+    "Question: Tell me about the history of Samarkand.\nAnswer:",
+    "Question: How do plants make food?\nAnswer:",
+    "Question: Explain integrals in simple words.\nAnswer:",
+    "Question: What is artificial intelligence?\nAnswer:",
+    "Question: Why is the sky blue?\nAnswer:",
+    "Question: Who wrote Xamsa?\nAnswer:",
+    "Question: What is inflation in economics?\nAnswer:",
+]
+
+
+def peak_rss_mb():
+    # Linux'da ru_maxrss kilobaytda
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def current_rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024.0 / 1024.0
+
+
+def run_worker(args):
+    """Bitta backend'ni o'lchash; natija stdout'ga JSON qatori sifatida chiqadi"""
+    import torch
+    from transformers import GPT2LMHeadModel, GPT2Tokenizer
+    from inference_backends import prepare_model, model_nbytes
+
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+
+    started = time.perf_counter()
+    tokenizer = GPT2Tokenizer.from_pretrained(args.model)
+    model = GPT2LMHeadModel.from_pretrained(args.model)
+    model, backend = prepare_model(model, args.worker, torch.device('cpu'))
+    load_s = time.perf_counter() - started
+
+    encoded = [tokenizer.encode(prompt, return_tensors='pt') for prompt in PROMPTS]
+
+    def generate(input_ids):
+        return model.generate(
+            input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=args.new_tokens,
+            min_new_tokens=args.new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.eos_token_id
+        )
+
+    with torch.inference_mode():
+        # Birinchi chaqiruv (torch.compile uchun kompilyatsiya) o'lchovga kirmaydi
+        started = time.perf_counter()
+        generate(encoded[0])
+        first_call_s = time.perf_counter() - started
+
+        greedy = []
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            greedy = [generate(ids)[0, ids.shape[1]:].tolist() for ids in encoded]
+        elapsed = time.perf_counter() - started
+
+        next_token_top1 = [int(model(ids).logits[0, -1].argmax()) for ids in encoded]
+
+    generated = args.repeat * len(encoded) * args.new_tokens
+    print(json.dumps({
+        'backend': backend,
+        'load_s': round(load_s, 2),
+        'first_call_s': round(first_call_s, 2),
+        'tokens_per_s': round(generated / elapsed, 1),
+        'ms_per_token': round(elapsed / generated * 1000.0, 2),
+        'model_mb': round(model_nbytes(model) / 1024 / 1024, 1),
+        'rss_mb': round(current_rss_mb(), 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'greedy': greedy,
+        'next_token_top1': next_token_top1,
+    }))
+
+
+def agreement(result, baseline):
+    """Eager natijalari bilan moslik: (greedy token ulushi, top-1 ulushi)"""
+    same = total = 0
+    for tokens, expected in zip(result['greedy'], baseline['greedy']):
+        # Birinchi farqgacha mos kelgan tokenlar (keyingilari boshqa kontekstda hisoblanadi)
+        for a, b in zip(tokens, expected):
+            if a != b:
+                break
+            same += 1
+        total += len(expected)
+    top1 = sum(a == b for a, b in zip(result['next_token_top1'], baseline['next_token_top1']))
+    return same / total if total else 0.0, top1 / len(baseline['next_token_top1'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPT-2 inference backend'larini solishtirish")
+    parser.add_argument('--backends', default='eager,int8,compile')
+    parser.add_argument('--model', default='gpt2')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--new-tokens', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    if 'eager' not in backends:
+        backends.insert(0, 'eager')
+
+    results = {}
+    for name in backends:
+        command = [
+            sys.executable, os.path.abspath(__file__), '--worker', name,
+            '--model', args.model, '--threads', str(args.threads),
+            '--new-tokens', str(args.new_tokens), '--repeat', str(args.repeat),
+        ]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        lines = [line for line in completed.stdout.splitlines() if line.startswith('{')]
+        if completed.returncode != 0 or not lines:
+            print(f"❌ {name}: {completed.stderr.strip().splitlines()[-1:] or completed.returncode}")
+            continue
+        results[name] = json.loads(lines[-1])
+
+    baseline = results.get('eager')
+    if not baseline:
+        print("❌ Eager (asosiy) natija olinmadi")
+        return
+
+    print(f"Model: {args.model}, thread'lar: {args.threads}, {args.new_tokens} token x {len(PROMPTS)} prompt x {args.repeat}")
+    print(f"{'backend':<14}{'tok/s':>8}{'speedup':>9}{'ms/tok':>8}{'model_mb':>10}{'rss_mb':>9}{'peak_mb':>9}"
+          f"{'load_s':>8}{'1st_s':>7}{'greedy':>8}{'top1':>6}")
+    for name, r in results.items():
+        greedy, top1 = agreement(r, baseline)
+        print(f"{name:<14}{r['tokens_per_s']:>8.1f}{r['tokens_per_s'] / baseline['tokens_per_s']:>8.2f}x"
+              f"{r['ms_per_token']:>8.2f}{r['model_mb']:>10.1f}{r['rss_mb']:>9.1f}{r['peak_rss_mb']:>9.1f}"
+              f"{r['load_s']:>8.2f}{r['first_call_s']:>7.2f}{greedy:>8.2f}{top1:>6.2f}")
+
+
+if __name__ == '__main__':
+    main()
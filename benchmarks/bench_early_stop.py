@@ -0,0 +1,88 @@
+# benchmarks/bench_early_stop.py - Erta to'xtatish va qayta urinishdan oldin/keyin: so'rov boshiga tokenlar
+#
+# Ishlatish (loyiha ildizidan):
+#     python benchmarks/bench_early_stop.py [--model gpt2] [--repeat 3] [--retries 1]
+#
+# Bir xil savollar va seed bilan ikki rejim solishtiriladi:
+#   before - har doim max_new_tokens gacha generatsiya, keyin is_gibberish (qayta urinishsiz)
+#   after  - gap oxiri / yangi qatorda to'xtash, noto'g'ri javobda darhol to'xtash va qayta urinish
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+QUESTIONS = [
+    "What is physics?", "Tell me about the history of Samarkand.", "How do plants make food?",
+    "Explain integrals in simple words.", "What is artificial intelligence?", "Why is the sky blue?",
+    "Who wrote Xamsa?", "What is inflation in economics?", "How does the heart work?",
+    "What is a computer program?",
+]
+
+
+def run_mode(tutor, torch, early_stop, retries, repeat, seed):
+    import config
+    from stopping import GenerationStats
+
+    tutor.early_stop = early_stop
+    config.GENERATION_RETRIES = retries
+    tutor.generation_stats = GenerationStats()
+    torch.manual_seed(seed)
+
+    latencies = []
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            started = time.perf_counter()
+            tutor.generate_ai_response(question)
+            latencies.append(time.perf_counter() - started)
+
+    stats = tutor.generation_stats.stats()
+    latencies.sort()
+    stats['mean_ms'] = statistics.mean(latencies) * 1000.0
+    stats['p95_ms'] = latencies[int(len(latencies) * 0.95) - 1] * 1000.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Erta to'xtatishdan oldin va keyin tokenlar soni")
+    parser.add_argument('--model', help="AI_TUTOR_MODEL_NAME (standart - config'dagi)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--retries', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ['AI_TUTOR_MODEL_LOAD_MODE'] = 'eager'
+    os.environ['AI_TUTOR_BATCH_ENABLED'] = '0'
+    if args.model:
+        os.environ['AI_TUTOR_MODEL_NAME'] = args.model
+
+    import enhanced_ai_model
+    tutor = enhanced_ai_model.EnhancedAITutor(warmup=False)
+    if tutor.generator is None:
+        print("❌ Model yuklanmadi")
+        sys.exit(2)
+    # Javoblar keshi va kontekst natijaga ta'sir qilmasligi uchun
+    tutor.response_cache = None
+
+    results = {
+        'before': run_mode(tutor, enhanced_ai_model.torch, False, 0, args.repeat, args.seed),
+        'after': run_mode(tutor, enhanced_ai_model.torch, True, args.retries, args.repeat, args.seed),
+    }
+
+    print(f"Model: {tutor.model.config.name_or_path}, max_new_tokens: {tutor.max_new_tokens}, "
+          f"so'rovlar: {len(QUESTIONS) * args.repeat}")
+    print(f"{'mode':<8}{'tok/req':>9}{'accept':>8}{'retries':>9}{'mean_ms':>9}{'p95_ms':>9}  stops")
+    for mode, r in results.items():
+        print(f"{mode:<8}{r['avg_tokens_per_request']:>9.1f}{r['acceptance_rate']:>8.2f}{r['retries']:>9}"
+              f"{r['mean_ms']:>9.1f}{r['p95_ms']:>9.1f}  {r['stops']}")
+    before, after = results['before'], results['after']
+    if before['avg_tokens_per_request']:
+        change = after['avg_tokens_per_request'] / before['avg_tokens_per_request'] - 1
+        print(f"So'rov boshiga tokenlar: {change:+.1%}")
+
+
+if __name__ == '__main__':
+    main()
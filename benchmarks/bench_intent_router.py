@@ -0,0 +1,91 @@
+# benchmarks/bench_intent_router.py - Xabarni marshrutlash narxi: ketma-ket skanerlar va bitta o'tishli router
+#
+# Ishlatish (loyiha ildizidan):
+#     python benchmarks/bench_intent_router.py [--sizes 0,100,1000,10000] [--min-time 0.5]
+#
+# Web kalit so'zlar ro'yxatiga sun'iy kalit so'zlar qo'shiladi va har bir o'lchamda:
+#   chained - avvalgi usul: har bir tekshiruv .lower() qiladi va ro'yxatni alohida skanerlaydi
+#   router  - intent_router: bitta normallashtirish, bitta avtomat va bitta regex
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from intent_router import CAPABILITY_PHRASES, WEB_KEYWORDS, create_router  # noqa: E402
+from math_engine import MATH_PROBLEM_RE  # noqa: E402
+from textutils import normalize_text  # noqa: E402
+
+MESSAGES = [
+    "Integral nima?", "Bugungi yangiliklar qanday?", "2+2 nechi?", "Amir Temur kim edi?",
+    "Nima qila olasan?", "Fotosintez jarayonini tushuntirib ber", "x + 5 = 10 tenglamani yech",
+    "So'nggi texnologiya xabarlari", "Tell me a story about the sea", "Salom, yordam kerak",
+]
+FALLBACK_KEYWORDS = ['salom', 'test', 'ai', 'internet', 'matematik', 'kuchli']
+
+
+def synthetic_keywords(count, seed):
+    rng = random.Random(seed)
+    # Haqiqiy so'zlarga mos kelmasligi uchun 'q' bilan boshlanadi
+    return ['q' + ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(count)]
+
+
+def chained_scans(web_keywords):
+    """Avvalgi generate_response + search_fallback_knowledge tekshiruvlari ketma-ketligi"""
+    def route(message):
+        normalize_text(message)                                        # bilimlar bazasi
+        is_math = MATH_PROBLEM_RE.search(message.lower()) is not None  # is_math_problem
+        message_lower = message.lower()                                # should_search_web
+        wants_web = any(keyword in message_lower for keyword in web_keywords)
+        message_lower = message.lower()                                # generate_default_response
+        capabilities = any(phrase in message_lower for phrase in CAPABILITY_PHRASES)
+        message_lower = message.lower()                                # search_fallback_knowledge
+        fallback = next((keyword for keyword in FALLBACK_KEYWORDS if keyword in message_lower), None)
+        return is_math, wants_web, capabilities, fallback
+    return route
+
+
+def per_message_us(route, min_time_s):
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        for message in MESSAGES:
+            route(message)
+        calls += len(MESSAGES)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time_s:
+            return elapsed / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Marshrutlash narxi kalit so'zlar soniga qarab")
+    parser.add_argument('--sizes', default='0,100,1000,10000', help="qo'shimcha web kalit so'zlar soni")
+    parser.add_argument('--min-time', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'keywords':>9}{'chained_us':>12}{'router_us':>11}{'speedup':>9}")
+    for size in [int(value) for value in args.sizes.split(',')]:
+        web_keywords = list(WEB_KEYWORDS) + synthetic_keywords(size, args.seed)
+        router = create_router({'web': web_keywords, 'fallback': FALLBACK_KEYWORDS})
+
+        chained = chained_scans(web_keywords)
+        # Natijalar bir xil bo'lishi kerak
+        for message in MESSAGES:
+            intent = router.route(message)
+            expected = chained(message)
+            actual = (intent.is_math, intent.wants_web, intent.asks_capabilities, intent.first('fallback'))
+            assert actual == expected, (message, actual, expected)
+
+        chained_us = per_message_us(chained, args.min_time)
+        router_us = per_message_us(router.route, args.min_time)
+        total = len(router)
+        print(f"{total:>9}{chained_us:>12.2f}{router_us:>11.2f}{chained_us / router_us:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+# benchmarks/bench_model_server.py - Har bir worker'da model va bitta model server: xotira va o'tkazuvchanlik
+#
+# Ishlatish (loyiha ildizidan):
+#     python benchmarks/bench_model_server.py [--workers 2] [--clients 8] [--duration 20] [--model gpt2]
+#
+# Ikkala rejimda ham gunicorn.conf.py bilan bir xil worker soni ishga tushadi:
+#   per_process  - model master'da yuklanadi, worker'lar fork orqali oladi (har biri o'z torch pool'i bilan)
+#   model_server - worker'lar klient, model bitta model_server.py jarayonida (umumiy micro-batch)
+# Xotira jarayonlar daraxti bo'yicha PSS (umumiy sahifalar jarayonlar orasida bo'linadi) va RSS.
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_async import BACKEND_DIR, free_port, request, summarize, tag
+
+
+def process_tree(root_pid):
+    """root_pid va uning barcha avlodlari"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def memory_mb(pids):
+    """Jarayonlar bo'yicha (PSS, RSS) yig'indisi, MB"""
+    pss = rss = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        pss += int(line.split()[1])
+                    elif line.startswith('Rss:'):
+                        rss += int(line.split()[1])
+        except OSError:
+            continue
+    return pss / 1024.0, rss / 1024.0
+
+
+def start_gunicorn(layout, port, workers, env):
+    env = dict(env, AI_TUTOR_WORKERS=str(workers))
+    if layout == 'model_server':
+        env['AI_TUTOR_MODEL_SERVER_SOCKET'] = os.path.join(tempfile.mkdtemp(), 'model.sock')
+    else:
+        env.pop('AI_TUTOR_MODEL_SERVER_SOCKET', None)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    # Model tayyor: ikkala rejimda ham javob GPT-2 dan keladi ('ai' yo'li)
+    deadline = time.monotonic() + 300
+    probe = 0
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{layout}: gunicorn ishga tushmadi (kod {process.returncode})")
+        try:
+            if request(port, 'GET', '/api/ready', None, timeout=2.0) == 200 and model_ready(port, probe):
+                return process
+        except OSError:
+            pass
+        probe += 1
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError(f"{layout}: model tayyor bo'lmadi")
+
+
+def model_ready(port, probe):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request('POST', '/api/chat', body=json.dumps({'message': f"Warm up story {tag(probe)}"}),
+                           headers={'Content-Type': 'application/json'})
+        return json.loads(connection.getresponse().read()).get('response', '').startswith('🤖')
+    finally:
+        connection.close()
+
+
+def run_load(port, clients, duration_s):
+    stop = threading.Event()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client(client_id):
+        i = 0
+        while not stop.is_set():
+            i += 1
+            payload = {'message': f"Tell me a story about the forest {tag(client_id)} {tag(i)}"}
+            started = time.perf_counter()
+            try:
+                status = request(port, 'POST', '/api/chat', payload)
+            except OSError:
+                status = 0
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                errors[0] += status != 200
+
+    threads = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration_s)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=120)
+    return len(latencies) / (time.monotonic() - started), latencies, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Har bir worker'da model va model server rejimlarini solishtirish")
+    parser.add_argument('--layouts', default='per_process,model_server')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--model', help="AI_TUTOR_MODEL_NAME (standart - config'dagi)")
+    args = parser.parse_args()
+
+    env = dict(os.environ, AI_TUTOR_LOG_LEVEL='WARNING', AI_TUTOR_RESPONSE_CACHE_ENABLED='0')
+    if args.model:
+        env['AI_TUTOR_MODEL_NAME'] = args.model
+
+    results = {}
+    for layout in [name.strip() for name in args.layouts.split(',') if name.strip()]:
+        port = free_port()
+        process = start_gunicorn(layout, port, args.workers, env)
+        try:
+            idle_pss, idle_rss = memory_mb(process_tree(process.pid))
+            rps, latencies, errors = run_load(port, args.clients, args.duration)
+            pss, rss = memory_mb(process_tree(process.pid))
+            processes = len(process_tree(process.pid))
+        finally:
+            process.terminate()
+            process.wait(timeout=60)
+        results[layout] = dict(summarize(latencies), rps=rps, errors=errors, idle_pss=idle_pss,
+                               pss=pss, rss=rss, processes=processes)
+
+    print(f"Worker'lar: {args.workers}, klientlar: {args.clients}, davomiylik: {args.duration:.0f} s")
+    print(f"{'layout':<14}{'procs':>6}{'idle_pss':>10}{'pss_mb':>8}{'rss_mb':>8}{'req/s':>8}"
+          f"{'p50_ms':>9}{'p95_ms':>9}{'err':>5}")
+    for layout, r in results.items():
+        print(f"{layout:<14}{r['processes']:>6}{r['idle_pss']:>10.0f}{r['pss']:>8.0f}{r['rss']:>8.0f}{r['rps']:>8.2f}"
+              f"{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['errors']:>5}")
+
+
+if __name__ == '__main__':
+    main()
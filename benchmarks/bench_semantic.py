@@ -0,0 +1,146 @@
+# benchmarks/bench_semantic.py - Kalit so'z qidiruvi va ma'noviy qidiruvni solishtirish
+#
+# Ishlatish (loyiha ildizidan):
+#     python benchmarks/bench_semantic.py [--embedder hashing|gpt2] [--threshold 0.40]
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+import config
+from kb_index import KnowledgeIndex
+from kb_store import load_json_knowledge
+from semantic_index import SemanticIndex, HashingEmbedder, GPT2Embedder
+from textutils import normalize_text
+
+# Parafraza qilingan savollar va ular mos kelishi kerak bo'lgan kalit
+PARAPHRASES = [
+    ("Einstein nazariyasi haqida gapir", "nisbiylik nazariyasi"),
+    ("issiqlik va energiya qonunlari", "termodinamika"),
+    ("irsiyat qonunlari nima", "genetika"),
+    ("narxlar oshishi nima deyiladi", "inflyatsiya"),
+    ("Samarqand va Buxoro orqali o'tgan savdo yo'li", "ipak yo'li"),
+    ("Xamsa asarini kim yozgan", "alisher navoiy"),
+    ("Mehrobdan chayon romani muallifi", "abdulla qodiriy"),
+    ("funksiya ostidagi yuza qanday hisoblanadi", "integral"),
+    ("DNK va RNK nima", "genetika"),
+    ("uglerod birikmalari haqida", "organik kimyo"),
+    ("atom va subatom zarrachalar", "kvant fizika"),
+    ("kompyuter inson kabi o'ylashi", "sun'iy intellekt"),
+    ("dollar va yevro", "valyuta"),
+    ("talab va taklif qanday ishlaydi", "bozor iqtisodiyoti"),
+    ("temuriylar imperiyasi", "timurid davlati"),
+    ("Amudaryo va Sirdaryo orasidagi hudud", "movarounahr"),
+    ("ko'zga ko'rinmas organizmlar", "mikrobiologiya"),
+    ("organizmlar va atrof-muhit", "ekologiya"),
+    ("tirik mavjudotlar vaqt davomida qanday o'zgaradi", "evolyutsiya"),
+    ("elektr va magnit maydonlar", "elektromagnetizm"),
+]
+
+# Bilimlar bazasida javobi yo'q savollar (javob berilmasligi kerak)
+UNRELATED = [
+    "salom", "qalaysan", "nima qila olasan", "bugungi ob-havo qanday",
+    "menga she'r yoz", "futbol o'yini natijasi", "2+2 nechaga teng",
+    "kitob tavsiya qil", "rahmat", "seni kim yaratgan",
+    # Umumiy savollar: javob matnidagi bitta so'z boshqa mavzuga olib bormasligi kerak
+    "kompyuter nima", "samarqand haqida",
+]
+
+
+def legacy_scan(knowledge, query):
+    """Avvalgi chiziqli qidiruv (solishtirish uchun)"""
+    query_lower = query.lower()
+    if query_lower in knowledge:
+        return query_lower
+    for key in knowledge:
+        if key in query_lower or any(word in query_lower for word in key.split()):
+            return key
+    return None
+
+
+def measure(name, find_key, repeat):
+    """Hit rate, aniqlik, noto'g'ri javoblar va kechikish"""
+    latencies = []
+    hits = correct = false_hits = 0
+
+    for query, expected in PARAPHRASES:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            key = find_key(query)
+            latencies.append(time.perf_counter() - started)
+        if key is not None:
+            hits += 1
+            correct += key == expected
+
+    for query in UNRELATED:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            key = find_key(query)
+            latencies.append(time.perf_counter() - started)
+        false_hits += key is not None
+
+    latencies.sort()
+    return {
+        'method': name,
+        'hit_rate': hits / len(PARAPHRASES),
+        'accuracy': correct / len(PARAPHRASES),
+        'false_hit_rate': false_hits / len(UNRELATED),
+        'mean_us': statistics.mean(latencies) * 1e6,
+        'p95_us': latencies[int(len(latencies) * 0.95) - 1] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kalit so'z va ma'noviy qidiruvni solishtirish")
+    parser.add_argument('--embedder', default='hashing', choices=['hashing', 'gpt2'])
+    parser.add_argument('--threshold', type=float, default=config.SEMANTIC_THRESHOLD)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    knowledge = load_json_knowledge(config.KB_JSON_PATH)
+    index = KnowledgeIndex(knowledge)
+
+    if args.embedder == 'gpt2':
+        from transformers import GPT2LMHeadModel, GPT2Tokenizer
+        tokenizer = GPT2Tokenizer.from_pretrained('gpt2')
+        tokenizer.pad_token = tokenizer.eos_token
+        model = GPT2LMHeadModel.from_pretrained('gpt2')
+        embedder = GPT2Embedder(model, tokenizer, 'cpu')
+    else:
+        embedder = HashingEmbedder()
+
+    started = time.perf_counter()
+    semantic = SemanticIndex(embedder, threshold=args.threshold)
+    semantic.build(knowledge.items())
+    build_ms = (time.perf_counter() - started) * 1000.0
+
+    def keyword_index(query):
+        key_id = index.match(normalize_text(query))
+        return index.keys[key_id] if key_id is not None else None
+
+    def keyword_then_semantic(query):
+        key = keyword_index(query)
+        if key is not None:
+            return key
+        results = semantic.search(query, top_k=1)
+        return results[0][1] if results and results[0][0] >= args.threshold else None
+
+    results = [
+        measure('legacy_scan', lambda q: legacy_scan(knowledge, q), args.repeat),
+        measure('keyword_index', keyword_index, args.repeat),
+        measure(f'keyword+semantic({args.embedder})', keyword_then_semantic, args.repeat),
+    ]
+
+    print(f"Semantik indeks: {len(knowledge)} yozuv, qurish {build_ms:.1f} ms, chegara {args.threshold}")
+    print(f"{'method':<28}{'hit':>7}{'acc':>7}{'false':>7}{'mean_us':>10}{'p95_us':>10}")
+    for r in results:
+        print(f"{r['method']:<28}{r['hit_rate']:>7.2f}{r['accuracy']:>7.2f}{r['false_hit_rate']:>7.2f}"
+              f"{r['mean_us']:>10.1f}{r['p95_us']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/bench_tokenizer.py - Bitta so'rovdagi tokenlash narxi: sekin BPE, fast tokenizer, kesh va batch
+#
+# Ishlatish (loyiha ildizidan):
+#     python benchmarks/bench_tokenizer.py [--model gpt2] [--requests 2000] [--steps 40] [--batch 8]
+#
+# Har bir so'rov: prompt'ni tokenlash, erta to'xtatish mezoni uchun har qadamda javobni decode qilish
+# va tayyor javobni decode qilish. Xabarlar Zipf taqsimotida takrorlanadi (tez-tez so'raladigan savollar).
+#   slow    - avvalgi yo'l: sekin Python BPE (transformers 4 GPT2Tokenizer; 5 da tokenization.PythonBPE),
+#             har qadamda javobning butun prefiksi decode qilinadi
+#   fast    - xuddi shu yo'l, faqat GPT2TokenizerFast (transformers o'rami orqali)
+#   cached  - CachedTokenizer (Rust tokenizer to'g'ridan-to'g'ri + kesh) va faqat yangi tokenlarni decode
+#             qiladigan AnswerStoppingCriteria
+#   batched - cached, --batch so'rov birga: encode_batch, qadam boshiga bitta decode_batch (micro-batch yo'li)
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from stopping import AnswerStoppingCriteria  # noqa: E402
+from tokenization import CachedTokenizer, check_parity, load_reference_tokenizer  # noqa: E402
+
+TOPICS = [
+    "Integral nima?", "Fotosintez jarayonini tushuntirib ber", "Amir Temur kim edi?",
+    "O'zbekiston poytaxti qayer?", "Tell me a story about the sea", "Kvant fizikasi haqida gapirib ber",
+    "Nyutonning ikkinchi qonuni qanday?", "Dasturlashni qayerdan boshlash kerak?",
+]
+ANSWER = ("Bu savolga qisqa javob: mavzu asosiy tushunchalardan boshlanadi, keyin misollar bilan "
+          "mustahkamlanadi va oxirida o'z-o'zini tekshirish uchun savollar beriladi.")
+
+
+def make_messages(count, seed):
+    """Zipf taqsimotidagi xabarlar: bir nechtasi tez-tez, qolganlari noyob"""
+    rng = random.Random(seed)
+    variants = [f"{topic} ({n})" if n else topic for n in range(200) for topic in TOPICS]
+    weights = [1.0 / (rank + 1) for rank in range(len(variants))]
+    return rng.choices(variants, weights, k=count)
+
+
+class FullDecodeCriteria(AnswerStoppingCriteria):
+    """Avvalgi mezon: har qadamda har bir qatorning butun javob prefiksi alohida decode qilinadi"""
+
+    def __init__(self, decode, start):
+        super().__init__(None, start, lambda text: False, stop_at_sentence=False)
+        self.decode = decode
+
+    def __call__(self, input_ids, scores, **kwargs):
+        rows = input_ids[:, self.start:].tolist()
+        if self.done is None:
+            self.done = [False] * len(rows)
+        for row, token_ids in enumerate(rows):
+            if self.done[row]:
+                continue
+            reason = self.check(self.decode(token_ids))
+            if reason:
+                self.done[row] = True
+                self.reasons[row] = reason
+        return input_ids.new_tensor(self.done).bool()
+
+
+def per_request_old(encode, decode, messages, answer, steps):
+    """Avvalgi yo'l (µs/so'rov): prompt encode, FullDecodeCriteria, javob decode"""
+    encode_s = decode_s = 0.0
+    for message in messages:
+        started = time.perf_counter()
+        encode("Question:") + encode(f" {message}\nAnswer:")
+        encode_s += time.perf_counter() - started
+
+        started = time.perf_counter()
+        criteria = FullDecodeCriteria(decode, 0)
+        for step in range(1, steps + 1):
+            criteria(answer[:, :step], None)
+        decode(answer[0, :steps].tolist())
+        decode_s += time.perf_counter() - started
+    return encode_s / len(messages) * 1e6, decode_s / len(messages) * 1e6
+
+
+def per_request_cached(cached, messages, answer, steps, batch=1):
+    """Yangi yo'l: kesh, bir nechta so'rov birga va faqat yangi tokenlarni decode qiladigan mezon"""
+    answer = answer.repeat(batch, 1)
+    encode_s = decode_s = 0.0
+    for i in range(0, len(messages), batch):
+        group = messages[i:i + batch]
+        started = time.perf_counter()
+        cached.encode("Question:")
+        if batch == 1:
+            cached.encode(f" {group[0]}\nAnswer:")
+        else:
+            cached.encode_batch([f" {message}\nAnswer:" for message in group])
+        encode_s += time.perf_counter() - started
+
+        started = time.perf_counter()
+        criteria = AnswerStoppingCriteria(cached, 0, lambda text: False, stop_at_sentence=False)
+        rows = answer[:len(group)]
+        for step in range(1, steps + 1):
+            criteria(rows[:, :step], None)
+        cached.decode_batch(rows[:, :steps].tolist())
+        decode_s += time.perf_counter() - started
+    return encode_s / len(messages) * 1e6, decode_s / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenlash narxi: sekin va fast tokenizer, kesh va batch")
+    parser.add_argument('--model', default=os.environ.get('AI_TUTOR_MODEL_NAME', 'gpt2'))
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--steps', type=int, default=40, help="erta to'xtatish decode qadamlari")
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    import torch
+    import transformers
+    fast = transformers.GPT2TokenizerFast.from_pretrained(args.model)
+    slow = load_reference_tokenizer(args.model)
+    messages = make_messages(args.requests, args.seed)
+
+    mismatches = check_parity(fast, slow, list(dict.fromkeys(messages)) + [ANSWER])
+    print(f"Sekin tokenizer: {type(slow).__name__}, moslik: {'ok' if not mismatches else mismatches[:3]}")
+    answer = torch.tensor([fast.encode(ANSWER)])
+    steps = min(args.steps, answer.shape[1])
+
+    cached = CachedTokenizer(fast)
+    results = {
+        'slow': per_request_old(slow.encode, lambda ids: slow.decode(ids, skip_special_tokens=True),
+                                messages, answer, steps),
+        'fast': per_request_old(fast.encode, lambda ids: fast.decode(ids, skip_special_tokens=True),
+                                messages, answer, steps),
+        'cached': per_request_cached(cached, messages, answer, steps),
+    }
+    cache_stats = cached.stats()
+    results['batched'] = per_request_cached(CachedTokenizer(fast), messages, answer, steps, args.batch)
+
+    print(f"So'rovlar: {args.requests} ({len(set(messages))} xil), decode qadamlari: {steps}, "
+          f"batch: {args.batch}, kesh hit rate: {cache_stats['hit_rate']:.1%}")
+    baseline = sum(results['slow'])
+    print(f"{'mode':<12}{'encode_us':>11}{'decode_us':>11}{'total_us':>10}{'speedup':>9}")
+    for mode, (encode_us, decode_us) in results.items():
+        total = encode_us + decode_us
+        print(f"{mode:<12}{encode_us:>11.1f}{decode_us:>11.1f}{total:>10.1f}{baseline / total:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+# benchmarks/run_benchmarks.py - Chat va quiz endpoint'lari uchun yuklama testi va mikrobenchmarklar
+#
+# Ishlatish (loyiha ildizidan):
+#     python benchmarks/run_benchmarks.py [--concurrency 1,4,16] [--requests 200] [--model gpt2]
+#     python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+#     python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json [--tolerance 0.25]
+#
+# So'rovlar app.test_client() orqali (HTTP server va tarmoqsiz) yuboriladi. Web qidiruv
+# lokal stub serverga yo'naltiriladi, shuning uchun natijalar internetga bog'liq emas.
+# Baseline bir xil mashinada olinganda solishtirish ma'noli; --compare regressiya
+# topilsa 1 kodi bilan chiqadi.
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+# Ish yuklamasi savollari
+KB_QUESTIONS = [
+    "Integral nima?", "fizika", "Alisher Navoiy kim?", "sun'iy intellekt", "genetika",
+    "termodinamika", "ipak yo'li", "inflyatsiya", "kvant fizika", "ekologiya",
+]
+MATH_QUESTIONS = [
+    "2 + 2", "15 * 7 - 3", "(12 + 8) / 4", "2x + 3 = 11", "sqrt(144) + 3^2",
+    "sin(30) + cos(60)", "x/4 - 2 = 5", "12 x 3", "100 / 8 + 0.5", "3(x - 1) = 2x + 4",
+]
+WEB_QUESTIONS = [
+    "bugungi yangiliklar", "eng yangi telefonlar 2025", "so'nggi sport xabarlari",
+    "hozir qanday voqealar bor", "bugun ob-havo yangiliklar",
+]
+GENERATIVE_QUESTIONS = [
+    "Tell me about the ocean", "How do birds fly", "Why is music important",
+    "Describe a good teacher", "What makes a city beautiful", "Explain how rain forms",
+]
+QUIZ_TOPICS = ['matematika', 'fizika', 'kimyo']
+
+# So'rov turlari va ularning ulushi
+WORKLOAD = [
+    ('kb', 0.35),
+    ('math', 0.25),
+    ('web', 0.10),
+    ('ai', 0.15),
+    ('quiz', 0.15),
+]
+
+STUB_LATENCY_S = 0.05
+
+
+class StubSearchHandler(BaseHTTPRequestHandler):
+    """JSON qidiruv provayderi o'rnida: belgilangan kechikish bilan soxta natijalar"""
+
+    latency_s = STUB_LATENCY_S
+
+    def do_GET(self):
+        time.sleep(self.latency_s)
+        body = json.dumps({'results': [f"Stub natija {i} ({self.path})" for i in range(1, 4)]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(latency_s):
+    StubSearchHandler.latency_s = latency_s
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSearchHandler)
+    threading.Thread(target=server.serve_forever, name='stub-search', daemon=True).start()
+    return server
+
+
+def peak_rss_mb():
+    # Linux'da ru_maxrss kilobaytda
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def current_rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024.0 / 1024.0
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def latency_summary(latencies):
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.mean(ordered) * 1000.0 if ordered else 0.0,
+        'p50_ms': percentile(ordered, 0.50) * 1000.0,
+        'p95_ms': percentile(ordered, 0.95) * 1000.0,
+        'p99_ms': percentile(ordered, 0.99) * 1000.0,
+    }
+
+
+def build_schedule(total, seed, offset=0):
+    """Ulushlarga ko'ra aralashtirilgan so'rovlar ro'yxati (bir xil seed - bir xil ketma-ketlik).
+
+    `offset` web va generativ savollarni darajalar orasida farqlaydi: aks holda
+    keyingi daraja oldingisining javob keshidan foydalanib qolardi.
+    """
+    rng = random.Random(seed)
+    kinds = [kind for kind, _ in WORKLOAD]
+    weights = [weight for _, weight in WORKLOAD]
+    schedule = []
+    for i, kind in enumerate(rng.choices(kinds, weights=weights, k=total), offset):
+        if kind == 'kb':
+            schedule.append((kind, '/api/chat', {'message': rng.choice(KB_QUESTIONS)}))
+        elif kind == 'math':
+            schedule.append((kind, '/api/chat', {'message': rng.choice(MATH_QUESTIONS)}))
+        elif kind == 'web':
+            # Web kesh har safar ishlamasligi uchun so'rovlar farqlanadi
+            schedule.append((kind, '/api/chat', {'message': f"{rng.choice(WEB_QUESTIONS)} {i}"}))
+        elif kind == 'ai':
+            schedule.append((kind, '/api/chat', {'message': f"{rng.choice(GENERATIVE_QUESTIONS)} {i}",
+                                                 'user_id': f"bench-{i % 8}"}))
+        else:
+            schedule.append((kind, '/api/quiz', {'topic': rng.choice(QUIZ_TOPICS), 'difficulty': 'medium'}))
+    return schedule
+
+
+def run_load(app, schedule, concurrency):
+    """`concurrency` ta thread bitta umumiy navbatdan so'rov oladi"""
+    position = iter(range(len(schedule)))
+    lock = threading.Lock()
+    latencies = {kind: [] for kind, _ in WORKLOAD}
+    errors = [0]
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                return
+            kind, path, payload = schedule[index]
+            started = time.perf_counter()
+            response = client.post(path, json=payload)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[kind].append(elapsed)
+                if response.status_code != 200:
+                    errors[0] += 1
+
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    everything = [value for values in latencies.values() for value in values]
+    return {
+        'concurrency': concurrency,
+        'requests': len(schedule),
+        'errors': errors[0],
+        'duration_s': elapsed,
+        'throughput_rps': len(schedule) / elapsed if elapsed else 0.0,
+        'latency': latency_summary(everything),
+        'by_kind': {kind: latency_summary(values) for kind, values in latencies.items() if values},
+        'rss_mb': current_rss_mb(),
+        'rss_growth_mb': current_rss_mb() - rss_before,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def microbench(func, inputs, min_time_s, repeats=5):
+    """Funksiyani kirishlar ro'yxati bo'yicha aylantirib, bitta chaqiruv vaqti (us, eng yaxshi/median)"""
+    loops = 1
+    # Bitta o'lchov kamida min_time_s davom etadigan takrorlar soni
+    while True:
+        started = time.perf_counter()
+        for i in range(loops):
+            func(inputs[i % len(inputs)])
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time_s or loops >= 1 << 20:
+            break
+        loops *= 2
+
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for i in range(loops):
+            func(inputs[i % len(inputs)])
+        samples.append((time.perf_counter() - started) / loops * 1e6)
+    return {'loops': loops, 'best_us': min(samples), 'median_us': statistics.median(samples)}
+
+
+def run_microbenchmarks(tutor, min_time_s):
+    gibberish_inputs = [
+        "Integral funksiya ostidagi yuzani hisoblaydi.",
+        "nibik babad kevlar kovlar",
+        "Bu juda yaxshi savol, keling birga ko'rib chiqamiz.",
+        "!!!??? ###",
+    ]
+    kb_inputs = KB_QUESTIONS + ["bu bilimlar bazasida yo'q savol", "salom qalaysan"]
+    return {
+        'search_knowledge_base': microbench(tutor.search_knowledge_base, kb_inputs, min_time_s),
+        'is_math_problem': microbench(tutor.is_math_problem, MATH_QUESTIONS + KB_QUESTIONS, min_time_s),
+        'solve_math': microbench(tutor.solve_math, MATH_QUESTIONS, min_time_s),
+        'is_gibberish': microbench(tutor.is_gibberish, gibberish_inputs, min_time_s),
+        'generate_quiz': microbench(lambda topic: tutor.generate_quiz(topic, 'medium', 5), QUIZ_TOPICS, min_time_s),
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Baseline'dan `tolerance` ulushidan ko'proq yomonlashgan ko'rsatkichlar ro'yxati"""
+    regressions = []
+    for name, result in current['micro'].items():
+        old = baseline.get('micro', {}).get(name)
+        if old and result['median_us'] > old['median_us'] * (1 + tolerance):
+            regressions.append(f"micro/{name}: {old['median_us']:.2f} -> {result['median_us']:.2f} us")
+
+    old_levels = {level['concurrency']: level for level in baseline.get('load', [])}
+    for level in current['load']:
+        old = old_levels.get(level['concurrency'])
+        if not old:
+            continue
+        name = f"load/c{level['concurrency']}"
+        if level['throughput_rps'] < old['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name} throughput: {old['throughput_rps']:.1f} -> {level['throughput_rps']:.1f} rps")
+        if level['latency']['p95_ms'] > old['latency']['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name} p95: {old['latency']['p95_ms']:.1f} -> {level['latency']['p95_ms']:.1f} ms")
+        if level['errors'] > old['errors']:
+            regressions.append(f"{name} errors: {old['errors']} -> {level['errors']}")
+    return regressions
+
+
+def print_report(results):
+    print(f"Model: {results['config']['model']} ({results['config']['inference_backend']}), "
+          f"so'rovlar: {results['config']['requests']}, stub web: {results['config']['stub_latency_ms']:.0f} ms")
+    print(f"{'conc':>5}{'rps':>9}{'p50_ms':>9}{'p95_ms':>9}{'p99_ms':>9}{'err':>5}{'rss_mb':>9}{'peak_mb':>9}")
+    for level in results['load']:
+        latency = level['latency']
+        print(f"{level['concurrency']:>5}{level['throughput_rps']:>9.1f}{latency['p50_ms']:>9.2f}"
+              f"{latency['p95_ms']:>9.2f}{latency['p99_ms']:>9.2f}{level['errors']:>5}"
+              f"{level['rss_mb']:>9.1f}{level['peak_rss_mb']:>9.1f}")
+    for level in results['load']:
+        kinds = ', '.join(f"{kind} {summary['p95_ms']:.1f}" for kind, summary in level['by_kind'].items())
+        print(f"  c{level['concurrency']} p95 ms: {kinds}")
+
+    print(f"{'microbenchmark':<24}{'best_us':>10}{'median_us':>11}{'loops':>9}")
+    for name, result in results['micro'].items():
+        print(f"{name:<24}{result['best_us']:>10.2f}{result['median_us']:>11.2f}{result['loops']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat va quiz endpoint'lari uchun benchmarklar")
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--requests', type=int, default=200, help="har bir parallellik darajasi uchun")
+    parser.add_argument('--model', help="AI_TUTOR_MODEL_NAME (standart - config'dagi)")
+    parser.add_argument('--stub-latency-ms', type=float, default=STUB_LATENCY_S * 1000.0)
+    parser.add_argument('--micro-time', type=float, default=0.2, help="bitta mikro o'lchov davomiyligi (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--output', metavar='PATH', help="natijalarni JSON faylga yozish")
+    args = parser.parse_args()
+
+    stub = start_stub_server(args.stub_latency_ms / 1000.0)
+    # config import qilinishidan oldin: web qidiruv stub'ga, model sinxron yuklanadi
+    os.environ['AI_TUTOR_WEB_SEARCH_PROVIDER'] = 'json'
+    os.environ['AI_TUTOR_WEB_SEARCH_URL'] = f"http://127.0.0.1:{stub.server_address[1]}/search"
+    os.environ['AI_TUTOR_MODEL_LOAD_MODE'] = 'eager'
+    os.environ.setdefault('AI_TUTOR_LOG_LEVEL', 'WARNING')
+    if args.model:
+        os.environ['AI_TUTOR_MODEL_NAME'] = args.model
+
+    import config
+    import app as app_module
+
+    tutor = app_module.ai_tutor
+    if tutor is None:
+        print("❌ AI yordamchi yaratilmadi, benchmark to'xtatildi")
+        sys.exit(2)
+    tutor.ready.wait()
+
+    results = {
+        'config': {
+            'model': config.MODEL_NAME,
+            'inference_backend': getattr(tutor, 'inference_backend', None),
+            'requests': args.requests,
+            'stub_latency_ms': args.stub_latency_ms,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'load': [],
+        'micro': {},
+    }
+
+    if not args.skip_load:
+        levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+        # Birinchi (isitish) o'tish natijaga kirmaydi
+        run_load(app_module.app, build_schedule(min(args.requests, 20), args.seed + 1, offset=-100), 1)
+        for number, level in enumerate(levels):
+            schedule = build_schedule(args.requests, args.seed, offset=number * args.requests)
+            results['load'].append(run_load(app_module.app, schedule, level))
+
+    if not args.skip_micro:
+        results['micro'] = run_microbenchmarks(tutor, args.micro_time)
+
+    stub.shutdown()
+    print_report(results)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 Natijalar saqlandi: {path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Regressiya ({args.tolerance:.0%} dan ortiq):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"✅ Baseline bilan solishtirildi: regressiya yo'q ({args.tolerance:.0%} chegara)")
+
+
+if __name__ == '__main__':
+    main()
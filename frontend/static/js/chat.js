@@ -1,5 +1,18 @@
 let currentUserId = 'user_' + Math.random().toString(36).substr(2, 9);
 
+// Kutilayotgan so'rov: bir xil savol qayta yuborilmaydi, yangi savol eskisini bekor qiladi
+let activeRequest = null;
+
+// Deterministik javoblar (bilimlar bazasi, matematika...) keshi: server cache_ttl_s ni beradi
+const ANSWER_CACHE_KEY = 'ai_tutor_answers';
+const ANSWER_CACHE_MAX = 200;
+const answerCache = new Map(Object.entries(readStorage(ANSWER_CACHE_KEY) || {}));
+
+// Quiz'lar mavzu bo'yicha oldindan olinadi: bir so'rov - bir nechta test
+const QUIZ_BATCH_SIZE = 3;
+const quizQueues = new Map();
+const quizRequests = new Map();
+
 // Enter tugmasi bosilganda xabar yuborish
 document.addEventListener('DOMContentLoaded', function() {
     const messageInput = document.getElementById('messageInput');
@@ -22,56 +35,218 @@ function sendMessage() {
         return;
     }
     
-    // Send tugmasini vaqtincha o'chirish
-    const sendBtn = document.getElementById('sendBtn');
-    sendBtn.disabled = true;
-    sendBtn.innerHTML = 'Yuborilmoqda...';
+    const key = normalizeMessage(message);
+    if (activeRequest && activeRequest.key === key) {
+        // Xuddi shu savolga javob allaqachon kutilmoqda
+        input.value = '';
+        return;
+    }
     
     // Foydalanuvchi xabarini ko'rsatish
     addMessage(message, 'user');
     input.value = '';
     
+    // Oldingi savolga javob endi kerak emas: server generatsiyani to'xtatadi
+    if (activeRequest) {
+        cancelRequest(activeRequest);
+    }
+    
+    const cached = getCachedAnswer(key);
+    if (cached) {
+        addMessage(cached, 'bot');
+        input.focus();
+        return;
+    }
+    
+    const sendBtn = document.getElementById('sendBtn');
+    sendBtn.innerHTML = 'Yuborilmoqda...';
+    
     // Loading ko'rsatish
     const loadingId = addMessage('Javob tayyorlanmoqda...', 'bot loading', true);
     
-    // Serverga yuborish
-    fetch('/api/chat', {
+    // Serverga yuborish (javob token-token keladi)
+    const request = {
+        key: key,
+        requestId: 'req_' + Date.now() + Math.random().toString(36).substr(2, 5),
+        controller: new AbortController(),
+        botMessageId: null
+    };
+    activeRequest = request;
+    let streamedText = '';
+    
+    fetch('/api/chat/stream', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
         body: JSON.stringify({
             message: message,
-            user_id: currentUserId
-        })
+            user_id: currentUserId,
+            request_id: request.requestId
+        }),
+        signal: request.controller.signal
     })
     .then(response => {
         if (!response.ok) {
             throw new Error('Server xatoligi');
         }
-        return response.json();
-    })
-    .then(data => {
-        // Loading'ni olib tashlash
-        removeMessage(loadingId);
-        
-        // AI javobini ko'rsatish
-        addMessage(data.response, 'bot');
-        
-        // Suggested topics olib tashlandi
+        return readEventStream(response, (event, data) => {
+            if (event === 'error') {
+                throw new Error(data.error || 'Server xatoligi');
+            }
+            
+            if (event === 'done') {
+                // Yakuniy javob (stream bo'lmasa ham to'liq ko'rinishi uchun)
+                streamedText = data.response;
+                cacheAnswer(key, data.response, data.cache_ttl_s);
+            } else if (data.token) {
+                streamedText += data.token;
+            } else {
+                return;
+            }
+            
+            // Birinchi token kelganda loading'ni almashtirish
+            if (!request.botMessageId) {
+                removeMessage(loadingId);
+                request.botMessageId = addMessage(streamedText, 'bot');
+            } else {
+                updateMessage(request.botMessageId, streamedText);
+            }
+        });
     })
     .catch(error => {
         removeMessage(loadingId);
+        if (error.name === 'AbortError') {
+            // Yangi savol yuborildi: chala javob belgilanadi
+            if (request.botMessageId) {
+                markCancelled(request.botMessageId);
+            }
+            return;
+        }
         addMessage('❌ Xatolik yuz berdi: ' + error.message + '. Qayta urinib ko\'ring.', 'bot error');
     })
     .finally(() => {
-        // Send tugmasini qayta yoqish
-        sendBtn.disabled = false;
-        sendBtn.innerHTML = 'Yuborish';
-        input.focus();
+        removeMessage(loadingId);
+        // Bekor qilingan so'rov yangisining holatiga tegmaydi
+        if (activeRequest === request || !activeRequest) {
+            activeRequest = null;
+            sendBtn.innerHTML = 'Yuborish';
+            input.focus();
+        }
     });
 }
 
+// So'rovni to'xtatish: fetch uziladi va server bekor qilish haqida xabar oladi
+// (proxy ortida ulanish uzilishi serverga yetmasligi mumkin)
+function cancelRequest(request) {
+    activeRequest = null;
+    request.controller.abort();
+    
+    const payload = JSON.stringify({ user_id: currentUserId, request_id: request.requestId });
+    const body = new Blob([payload], { type: 'application/json' });
+    if (!(navigator.sendBeacon && navigator.sendBeacon('/api/chat/cancel', body))) {
+        fetch('/api/chat/cancel', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: payload,
+            keepalive: true
+        }).catch(() => {});
+    }
+}
+
+function markCancelled(messageId) {
+    const message = document.getElementById(messageId);
+    if (message) {
+        message.classList.add('cancelled');
+        message.textContent += ' … (bekor qilindi)';
+    }
+}
+
+// Kesh kaliti: katta-kichik harf va ortiqcha bo'sh joylar farq qilmaydi
+function normalizeMessage(message) {
+    return message.toLowerCase().replace(/\s+/g, ' ').trim();
+}
+
+function getCachedAnswer(key) {
+    const entry = answerCache.get(key);
+    if (!entry) {
+        return null;
+    }
+    if (entry.expires <= Date.now()) {
+        answerCache.delete(key);
+        writeStorage(ANSWER_CACHE_KEY, Object.fromEntries(answerCache));
+        return null;
+    }
+    return entry.response;
+}
+
+function cacheAnswer(key, response, ttlSeconds) {
+    // GPT-2 javoblari tasodifiy: server ularga 0 beradi va ular saqlanmaydi
+    if (!response || !(ttlSeconds > 0)) {
+        return;
+    }
+    answerCache.delete(key);
+    answerCache.set(key, { response: response, expires: Date.now() + ttlSeconds * 1000 });
+    // Eng eski yozuvlar chiqariladi (Map qo'shilish tartibini saqlaydi)
+    while (answerCache.size > ANSWER_CACHE_MAX) {
+        answerCache.delete(answerCache.keys().next().value);
+    }
+    writeStorage(ANSWER_CACHE_KEY, Object.fromEntries(answerCache));
+}
+
+// sessionStorage o'chirilgan yoki to'lgan bo'lishi mumkin: u holda faqat xotiradagi kesh ishlaydi
+function readStorage(name) {
+    try {
+        return JSON.parse(sessionStorage.getItem(name));
+    } catch (error) {
+        return null;
+    }
+}
+
+function writeStorage(name, value) {
+    try {
+        sessionStorage.setItem(name, JSON.stringify(value));
+    } catch (error) {
+        // Kesh majburiy emas
+    }
+}
+
+// Server-Sent Events oqimini o'qish (POST so'rov uchun EventSource ishlamaydi)
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Har bir xabar bo'sh qator bilan tugaydi
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+            
+            if (data) {
+                onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+}
+
 function addMessage(text, className, isLoading = false) {
     const messages = document.getElementById('messages');
     const messageDiv = document.createElement('div');
@@ -92,6 +267,15 @@ function addMessage(text, className, isLoading = false) {
     return messageId;
 }
 
+function updateMessage(messageId, text) {
+    const message = document.getElementById(messageId);
+    if (message) {
+        message.textContent = text;
+        const messages = document.getElementById('messages');
+        messages.scrollTop = messages.scrollHeight;
+    }
+}
+
 function removeMessage(messageId) {
     const message = document.getElementById(messageId);
     if (message) {
@@ -101,27 +285,72 @@ function removeMessage(messageId) {
 
 // Ortiqcha funksiyalar olib tashlandi
 
-// Quiz funksiyasi
+// Quiz funksiyasi: oldindan olingan test bo'lsa darhol ko'rsatiladi
 function requestQuiz(topic = 'matematika') {
+    if (quizQueue(topic).length) {
+        displayQuiz(takeQuiz(topic));
+        return;
+    }
+    
     addMessage('Test savollar yaratyapman...', 'bot');
     
-    fetch('/api/quiz', {
+    fetchQuizzes(topic)
+    .then(() => {
+        const quiz = takeQuiz(topic);
+        if (!quiz) {
+            throw new Error('Test topilmadi');
+        }
+        displayQuiz(quiz);
+    })
+    .catch(error => {
+        addMessage('Test yaratishda xatolik: ' + error.message, 'bot error');
+    });
+}
+
+function quizQueue(topic) {
+    if (!quizQueues.has(topic)) {
+        quizQueues.set(topic, readStorage('ai_tutor_quiz_' + topic) || []);
+    }
+    return quizQueues.get(topic);
+}
+
+function takeQuiz(topic) {
+    const queue = quizQueue(topic);
+    const quiz = queue.shift();
+    writeStorage('ai_tutor_quiz_' + topic, queue);
+    return quiz;
+}
+
+// Bir nechta testni bitta so'rovda olish; bir vaqtdagi bosishlar bitta so'rovni kutadi
+function fetchQuizzes(topic) {
+    if (quizRequests.has(topic)) {
+        return quizRequests.get(topic);
+    }
+    const promise = fetch('/api/quiz/batch', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
         body: JSON.stringify({
             topic: topic,
-            difficulty: 'medium'
+            difficulty: 'medium',
+            count: QUIZ_BATCH_SIZE
         })
     })
     .then(response => response.json())
     .then(data => {
-        displayQuiz(data);
+        if (data.error) {
+            throw new Error(data.error);
+        }
+        const queue = quizQueue(topic);
+        queue.push(...data.quizzes);
+        writeStorage('ai_tutor_quiz_' + topic, queue);
     })
-    .catch(error => {
-        addMessage('Test yaratishda xatolik: ' + error.message, 'bot error');
+    .finally(() => {
+        quizRequests.delete(topic);
     });
+    quizRequests.set(topic, promise);
+    return promise;
 }
 
 function displayQuiz(quizData) {